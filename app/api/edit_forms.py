@@ -12,6 +12,7 @@ from app.database.model import (
 )
 from app.database.types import CutTiming, FertClass, LegumeType, NminType, ResidueType
 from app.extensions import db
+from app.model import update_soil_index
 
 from .forms import (
     BaseFieldForm,
@@ -106,6 +107,8 @@ class EditFieldForm(FieldForm):
         self.model_data.red_region = self.red_region.data
         self.model_data.field_type = self.field_type.data
         db.session.commit()
+        update_soil_index([self.base_id])
+        db.session.commit()
 
 
 class EditCultivationForm(CultivationForm):
@@ -146,6 +149,7 @@ class EditFertilizationForm(FertilizationForm):
         self.get_data(id)
         field_id = self.model_data.field.id
         super().__init__(field_id)
+        self.fertilization_id = id
 
     def populate(self, id: int):
         super().populate(id)
@@ -171,6 +175,11 @@ class EditFertilizationForm(FertilizationForm):
     def save(self):
         cultivation = Cultivation.query.get(self.cultivation_id.data)
         fertilizer = Fertilizer.query.get(self.fertilizer_id.data)
+        # recheck if an organic fertilization is added or removed
+        organic = FertClass.organic in (
+            fertilizer.fert_class,
+            self.model_data.fertilizer.fert_class,
+        )
         self.model_data.measure = self.measure_type.data
         self.model_data.amount = self.amount.data
         self.model_data.cut_timing = self.get(self.cut_timing, CutTiming.none)
@@ -178,6 +187,8 @@ class EditFertilizationForm(FertilizationForm):
         self.model_data.cultivation = cultivation
         self.model_data.fertilizer = fertilizer
         db.session.commit()
+        if organic:
+            self.flash_violations(self.model_data.field)
 
 
 class EditFertilizerForm(FertilizerForm):
@@ -288,6 +299,8 @@ class EditSoilForm(SoilForm):
         self.model_data.soil_type = self.soil_type.data
         self.model_data.humus = self.humus_type.data
         db.session.commit()
+        update_soil_index([self.base_id])
+        db.session.commit()
 
 
 class EditModifierForm(ModifierForm):
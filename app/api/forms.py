@@ -3,13 +3,16 @@ from __future__ import annotations
 from typing import Any, Union
 
 import wtforms
+from flask import flash
 from flask_bootstrap import SwitchField
 from flask_login import current_user
 from flask_wtf import FlaskForm
 from loguru import logger
+from markupsafe import escape
 from wtforms import BooleanField, DecimalField, IntegerField, SelectField, StringField
 from wtforms.validators import InputRequired, Length, NumberRange, Optional
 
+from app.database.choices import crop_choices, fertilizer_choices
 from app.database.model import (
     BaseField,
     Crop,
@@ -51,6 +54,15 @@ from app.database.types import (
     UsedCultivationType,
 )
 from app.extensions import db
+from app.model import (
+    ComplianceReport,
+    PlannedFertilization,
+    check_compliance,
+    get_blocking_period,
+    is_fall_forage,
+    max_fall_amount,
+    update_soil_index,
+)
 
 __all__ = [
     "create_form",
@@ -327,6 +339,8 @@ class FieldForm(FormHelper, FlaskForm):
         field.base_field = base_field
         db.session.add(field)
         db.session.commit()
+        update_soil_index([self.base_id])
+        db.session.commit()
         return field
 
 
@@ -400,8 +414,8 @@ class CultivationForm(FormHelper, FlaskForm):
                 legume_type = LegumeType
 
             residue_type = MainCropResidueType
-            crop_choices = current_user.get_crops(
-                crop_class=CropClass.main_crop, field_type=field_type
+            crops = crop_choices(
+                current_user.id, crop_class=CropClass.main_crop, field_type=field_type
             )
 
             crop = Crop.query.filter(
@@ -415,7 +429,7 @@ class CultivationForm(FormHelper, FlaskForm):
             del self.crop_protein
             legume_type = CatchCropLegumeType
             residue_type = CatchCropResidueType
-            crop_choices = current_user.get_crops(crop_class=CropClass.catch_crop)
+            crops = crop_choices(current_user.id, crop_class=CropClass.catch_crop)
 
             crop = Crop.query.filter(
                 Crop.user_id == current_user.id,
@@ -425,7 +439,7 @@ class CultivationForm(FormHelper, FlaskForm):
             if crop is None:
                 reset_form_data()
 
-        self.crop_id.choices = [(crop.id, crop.name) for crop in crop_choices]
+        self.crop_id.choices = crops
         self.residues.choices = [(e.name, e.value) for e in residue_type]
         self.legume_rate.choices = [(e.name, e.value) for e in legume_type]
 
@@ -520,11 +534,15 @@ class FertilizationForm(FormHelper, FlaskForm):
         "Select a fertilizer:", validators=[InputRequired()], render_kw={"class": "reload"}
     )
     month = IntegerField("Month:", validators=[InputRequired(), NumberRange(min=1, max=12)])
-    amount = DecimalField("Amount:", validators=[InputRequired(), NumberRange(min=0)])
+    amount = DecimalField(
+        "Amount:", validators=[InputRequired(), NumberRange(min=0)], render_kw={"class": "reload"}
+    )
 
     def __init__(self, field_id):
         super().__init__()
         self.field_id = field_id
+        # fertilization that is edited and replaced by the form data
+        self.fertilization_id: int | None = None
 
     def update_fields(self):
         def reset_form_data():
@@ -565,13 +583,11 @@ class FertilizationForm(FormHelper, FlaskForm):
                 fert_type = FertType.from_measure(MeasureType[self.measure_type.data])
                 if not FertType.is_mineral(fert_type):
                     reset_form_data()
-                    choices = current_user.get_fertilizers(fert_class=FertClass.mineral)
+                    choices = fertilizer_choices(current_user.id, fert_class=FertClass.mineral)
                 else:
-                    choices = Fertilizer.query.filter(
-                        Fertilizer.fert_type.in_([e.name for e in fert_type])
-                    )
+                    choices = fertilizer_choices(current_user.id, fert_types=fert_type)
             else:
-                choices = current_user.get_fertilizers(fert_class=FertClass.mineral)
+                choices = fertilizer_choices(current_user.id, fert_class=FertClass.mineral)
         elif self.fert_class.data == FertClass.organic.name:
             self.amount.places = 0
             measure_type = OrganicMeasureType
@@ -579,20 +595,56 @@ class FertilizationForm(FormHelper, FlaskForm):
                 fert_type = FertType.from_measure(MeasureType[self.measure_type.data])
                 if not FertType.is_organic(fert_type):
                     reset_form_data()
-            choices = current_user.get_fertilizers(
-                fert_class=FertClass.organic, year=cultivation.field.year
+            choices = fertilizer_choices(
+                current_user.id, fert_class=FertClass.organic, years=[cultivation.field.year]
             )
         # no fert_class option selected
         else:
             measure_type = MeasureType
-            choices = current_user.get_fertilizers()
+            choices = fertilizer_choices(current_user.id)
 
         if self.fertilizer_id.data:
             fertilizer = Fertilizer.query.get(self.fertilizer_id.data)
             self.amount.label.text = f"Amount in {fertilizer.unit.value}/ha:"
 
         self.measure_type.choices = [(measure.name, measure.value) for measure in measure_type]
-        self.fertilizer_id.choices = [(fertilizer.id, fertilizer.name) for fertilizer in choices]
+        self.fertilizer_id.choices = choices
+
+        report = self.planned_compliance()
+        if report is not None and not report.valid:
+            self.amount.description = escape(
+                "; ".join(violation.message for violation in report.violations)
+            )
+
+    def planned_compliance(self) -> ComplianceReport | None:
+        """
+        Organic nitrogen checks of the field as if the form data was saved,
+        `None` if no organic fertilization is entered yet.
+        """
+        if (
+            self.fert_class.data != FertClass.organic.name
+            or not self.fertilizer_id.data
+            or self.amount.data is None
+        ):
+            return None
+        field = Field.query.get(self.field_id)
+        planned = PlannedFertilization(
+            field_id=field.id,
+            fertilizer_id=int(self.fertilizer_id.data),
+            amount=self.amount.data,
+            measure=MeasureType._member_map_.get(self.measure_type.data),
+        )
+        exclude = [self.fertilization_id] if self.fertilization_id is not None else []
+        return check_compliance(
+            current_user.id, field.year, field_ids=[field.id], planned=[planned], exclude=exclude
+        )
+
+    @staticmethod
+    def flash_violations(field: Field) -> None:
+        """Re-evaluate the organic nitrogen checks of a saved field and show its violations."""
+        report = check_compliance(current_user.id, field.year, field_ids=[field.id])
+        for violation in report.violations:
+            flash(violation.message, "warning")
 
     def validate_measure_type(self, measure_type):
         """
@@ -611,6 +663,34 @@ class FertilizationForm(FormHelper, FlaskForm):
                 self.measure_type.errors.append("Measure already exists for cultivation.")
                 return False
 
+    def validate_month(self, month) -> bool:
+        """
+        Verifies that the month is not within a blocking period of the fertilizer, months
+        that are blocked in part are only warned about.
+        """
+        fertilizer = Fertilizer.query.get(self.fertilizer_id.data)
+        cultivation = Cultivation.query.get(self.cultivation_id.data)
+        if fertilizer is None or cultivation is None:
+            return True
+        field = cultivation.field
+        period = get_blocking_period(
+            fertilizer.fert_type,
+            field.field_type,
+            field.red_region,
+            cultivation.crop.crop_type,
+            month.data,
+            partial=True,
+        )
+        if period is None:
+            return True
+        message = f"{fertilizer.fert_type.value} is blocked from {period.label} on this field."
+        if period.covers(month.data):
+            self.month.errors.append(message)
+            return False
+        # only some days of the month are blocked
+        flash(f"{message} Check the day of the application.", "warning")
+        return True
+
     def validate_amount(self, amount, edit_value=False) -> bool:
         """
         Verifies that amount of fertilizer is within the organic fall fertilization limit.
@@ -636,32 +716,21 @@ class FertilizationForm(FormHelper, FlaskForm):
             if fertilization.measure is MeasureType.org_fall:
                 n += fertilization.fertilizer.n * fertilization.amount
                 nh4 += fertilization.fertilizer.nh4 * fertilization.amount
-        fert_n = fertilizer.n * fert_amount
-        fert_nh4 = fertilizer.nh4 * fert_amount
-        sum_n = n + fert_n
-        sum_nh4 = nh4 + fert_nh4
-
-        if sum_n <= 60 and sum_nh4 <= 30:
+        forage = is_fall_forage(
+            field.field_type,
+            cultivation.cultivation_type,
+            cultivation.crop.feedable,
+            [cultivation.cultivation_type for cultivation in field.cultivations],
+        )
+        fert_amount = max_fall_amount(
+            fertilizer.n, fertilizer.nh4, fert_amount, n, nh4, forage, field.red_region
+        )
+        if fert_amount is None:
             return True
-        # Grassland or perennial field forage have a different limit.
-        cultivations = [cultivation.cultivation_type for cultivation in field.cultivations]
-        if (
-            field.field_type is FieldType.grassland
-            or cultivation.cultivation_type is CultivationType.main_crop
-            and cultivation.crop.feedable
-            and (
-                CultivationType.second_main_crop not in cultivations
-                or CultivationType.second_crop not in cultivations
-            )
-        ):
-            if sum_n < (80 if not field.red_region else 60):
-                return True
-            else:
-                fert_amount = ((80 if not field.red_region else 60) - n) // fertilizer.n
-        else:
-            fert_amount = min((30 - nh4) // fertilizer.nh4, (60 - n) // fertilizer.n)
+        if edit_value:
+            fert_amount += self.model_data.amount
         self.amount.errors.append(
-            f"Maximum amount for fall fertilizations: {(fert_amount if not edit_value else fert_amount + self.model_data.amount)} {fertilizer.unit.value}/ha"
+            f"Maximum amount for fall fertilizations: {fert_amount} {fertilizer.unit.value}/ha"
         )
         return False
 
@@ -680,6 +749,8 @@ class FertilizationForm(FormHelper, FlaskForm):
         field.fertilizations.append(fertilization)
         db.session.add(fertilization)
         db.session.commit()
+        if fertilizer.fert_class is FertClass.organic:
+            self.flash_violations(field)
 
 
 class FertilizerForm(FormHelper, FlaskForm):
@@ -956,6 +1027,8 @@ class SoilForm(FormHelper, FlaskForm):
         soil_sample.base_field = base_field
         db.session.add(soil_sample)
         db.session.commit()
+        update_soil_index([self.base_id])
+        db.session.commit()
 
 
 class ModifierForm(FormHelper, FlaskForm):
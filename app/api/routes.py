@@ -1,10 +1,14 @@
+import io
+
 from flask import Request, jsonify, render_template, request
 from flask_login import current_user, login_required
 from loguru import logger
 
 from app.api import Form, bp, create_edit_form, create_form
 from app.database import confirm_id, delete_database_entry
-from app.extensions import login
+from app.extensions import db, login
+from app.jobs import UnknownJobError, runner
+from app.model import SoilImportError, get_changes, import_soil_samples, roll_over
 
 
 def accept_request(request: Request) -> list[str | int]:
@@ -98,3 +102,87 @@ def submit_data():
     else:
         logger.error(f"Not valid: {request.form}")
         return jsonify(rendered_form(form, form_type, modal_type, id)), 206
+
+
+@bp.route("/soil/import", methods=["POST"])
+@login_required
+def import_soil():
+    file = request.files.get("file")
+    if file is None:
+        return jsonify("No file uploaded."), 400
+    lines = io.TextIOWrapper(file.stream, encoding="utf-8-sig", newline="")
+    try:
+        report = import_soil_samples(lines, current_user.id)
+    except (SoilImportError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return jsonify(str(e)), 400
+    db.session.commit()
+    status = 201 if report.imported else 400
+    return jsonify(report.to_dict()), status
+
+
+@bp.route("/fields/rollover", methods=["POST"])
+@login_required
+def rollover_fields():
+    year = request.form.get("year", current_user.year, type=int)
+    try:
+        report = roll_over(
+            current_user.id,
+            year,
+            cultivations=bool(request.form.get("cultivations")),
+            fertilizations=bool(request.form.get("fertilizations")),
+        )
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(str(e)), 400
+    db.session.commit()
+    job_id = None
+    if report.fields:
+        # warm the balance caches of the new year in the background
+        job_id = runner.submit("balances", current_user.id, year=report.year)
+    if request.headers.get("HX-Request"):
+        job = runner.status(job_id) if job_id else None
+        return render_template("_fields_rollover.html", report=report, job=job), 201
+    return jsonify({**report.to_dict(), "job_id": job_id}), 201
+
+
+def job_response(job_id: int, status: int = 200):
+    job = runner.status(job_id)
+    if job is None or job["user_id"] != current_user.id:
+        return jsonify("Job not found."), 404
+    if request.headers.get("HX-Request"):
+        return render_template("_job_status.html", job=job), status
+    return jsonify({**job, "status": job["status"].name}), status
+
+
+@bp.route("/jobs/<name>", methods=["POST"])
+@login_required
+def submit_job(name: str):
+    try:
+        job_id = runner.submit(name, current_user.id)
+    except UnknownJobError as e:
+        return jsonify(e.message), 404
+    return job_response(job_id, 202)
+
+
+@bp.route("/jobs/<int:job_id>", methods=["GET"])
+@login_required
+def job_status(job_id: int):
+    return job_response(job_id)
+
+
+@bp.route("/jobs/<int:job_id>/cancel", methods=["POST"])
+@login_required
+def cancel_job(job_id: int):
+    job = runner.status(job_id)
+    if job is None or job["user_id"] != current_user.id:
+        return jsonify("Job not found."), 404
+    runner.cancel(job_id)
+    return job_response(job_id)
+
+
+@bp.route("/api/sync", methods=["GET"])
+@login_required
+def sync():
+    since = request.args.get("since", 0, type=int)
+    return jsonify(get_changes(current_user.id, since).to_dict())
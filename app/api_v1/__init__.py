@@ -0,0 +1,7 @@
+from flask import Blueprint
+
+from .resources import RESOURCES, Page, Resource, fetch_page
+
+bp = Blueprint("api_v1", __name__)
+
+from app.api_v1 import routes
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import base64
+import binascii
+from dataclasses import dataclass, field
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import InstrumentedAttribute
+
+import app.database.model as db
+from app.extensions import db as _db
+from app.model import get_saldo_field_ids, guidelines, recompute_saldos
+from app.utils import json_value
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+@dataclass(frozen=True)
+class Resource:
+    """
+    Read-only resource of the API. Every field of the resource is one column, only the
+    requested columns are selected. Rows are paginated by their `key` column and belong
+    to the user through the `joins` up to their `BaseField`.
+    """
+
+    columns: dict[str, InstrumentedAttribute]
+    key: InstrumentedAttribute
+    joins: tuple[type[db.Base], ...] = ()
+    year: InstrumentedAttribute | None = None
+
+    def select(
+        self,
+        user_id: int,
+        fields: list[str],
+        year: int | None = None,
+        after: int | None = None,
+        limit: int = DEFAULT_LIMIT,
+    ) -> Select:
+        """Projected query of `fields` of the rows after the key `after`."""
+        query = select(self.key, *(self.columns[name] for name in fields)).select_from(
+            self.key.class_
+        )
+        for join in self.joins:
+            query = query.join(join)
+        query = query.where(db.BaseField.user_id == user_id)
+        if year is not None and self.year is not None:
+            query = query.where(self.year == year)
+        if after is not None:
+            query = query.where(self.key > after)
+        return query.order_by(self.key).limit(limit)
+
+
+RESOURCES: dict[str, Resource] = {
+    "base_fields": Resource(
+        columns={
+            "id": db.BaseField.id,
+            "prefix": db.BaseField.prefix,
+            "suffix": db.BaseField.suffix,
+            "name": db.BaseField.name,
+        },
+        key=db.BaseField.id,
+    ),
+    "fields": Resource(
+        columns={
+            "id": db.Field.id,
+            "base_id": db.Field.base_id,
+            "partition": db.Field.partition,
+            "year": db.Field.year,
+            "area": db.Field.area,
+            "field_type": db.Field.field_type,
+            "red_region": db.Field.red_region,
+            "demand_p2o5": db.Field.demand_p2o5,
+            "demand_k2o": db.Field.demand_k2o,
+            "demand_mgo": db.Field.demand_mgo,
+        },
+        key=db.Field.id,
+        joins=(db.BaseField,),
+        year=db.Field.year,
+    ),
+    "cultivations": Resource(
+        columns={
+            "id": db.Cultivation.id,
+            "field_id": db.Cultivation.field_id,
+            "year": db.Field.year,
+            "cultivation_type": db.Cultivation.cultivation_type,
+            "crop_id": db.Cultivation.crop_id,
+            "crop_yield": db.Cultivation.crop_yield,
+            "crop_protein": db.Cultivation.crop_protein,
+            "residues": db.Cultivation.residues,
+            "legume_rate": db.Cultivation.legume_rate,
+            "nmin_30": db.Cultivation.nmin_30,
+            "nmin_60": db.Cultivation.nmin_60,
+            "nmin_90": db.Cultivation.nmin_90,
+        },
+        key=db.Cultivation.id,
+        joins=(db.Field, db.BaseField),
+        year=db.Field.year,
+    ),
+    "fertilizations": Resource(
+        columns={
+            "id": db.Fertilization.id,
+            "field_id": db.Fertilization.field_id,
+            "year": db.Field.year,
+            "cultivation_id": db.Fertilization.cultivation_id,
+            "fertilizer_id": db.Fertilization.fertilizer_id,
+            "cut_timing": db.Fertilization.cut_timing,
+            "amount": db.Fertilization.amount,
+            "measure": db.Fertilization.measure,
+            "month": db.Fertilization.month,
+        },
+        key=db.Fertilization.id,
+        joins=(db.Field, db.BaseField),
+        year=db.Field.year,
+    ),
+    "soil_samples": Resource(
+        columns={
+            "id": db.SoilSample.id,
+            "base_id": db.SoilSample.base_id,
+            "year": db.SoilSample.year,
+            "ph": db.SoilSample.ph,
+            "p2o5": db.SoilSample.p2o5,
+            "k2o": db.SoilSample.k2o,
+            "mg": db.SoilSample.mg,
+            "soil_type": db.SoilSample.soil_type,
+            "humus": db.SoilSample.humus,
+        },
+        key=db.SoilSample.id,
+        joins=(db.BaseField,),
+        year=db.SoilSample.year,
+    ),
+    "balances": Resource(
+        columns={
+            "field_id": db.Saldo.field_id,
+            "year": db.Field.year,
+            "n": db.Saldo.n,
+            "p2o5": db.Saldo.p2o5,
+            "k2o": db.Saldo.k2o,
+            "mgo": db.Saldo.mgo,
+            "s": db.Saldo.s,
+            "cao": db.Saldo.cao,
+            "n_total": db.Saldo.n_total,
+        },
+        key=db.Saldo.field_id,
+        joins=(db.Field, db.BaseField),
+        year=db.Field.year,
+    ),
+}
+
+
+@dataclass
+class Page:
+    """Rows of one page of a resource and the cursor of the following page."""
+
+    data: list[dict] = field(default_factory=list)
+    next_cursor: str | None = None
+
+    def to_dict(self) -> dict:
+        return {"data": self.data, "next_cursor": self.next_cursor}
+
+
+def fetch_page(
+    name: str,
+    user_id: int,
+    fields: list[str] | None = None,
+    year: int | None = None,
+    cursor: str | None = None,
+    limit: int = DEFAULT_LIMIT,
+    *,
+    guidelines: guidelines = guidelines,
+) -> Page:
+    """
+    Page of the rows of a resource of the user, ordered by their key. Balances that are
+    dirty or missing are recomputed before they are read.
+
+    :param fields:
+        Fields of the resource to return, all fields by default.
+    :param year:
+        Only return rows of this year, ignored by resources without a year.
+    :param cursor:
+        `next_cursor` of the previous page, the first page by default.
+    :raises ValueError:
+        Unknown resource or field, invalid cursor or limit.
+    """
+    if name not in RESOURCES:
+        raise ValueError(f"Unknown resource: {name}")
+    resource = RESOURCES[name]
+    fields = fields or list(resource.columns)
+    unknown = [column for column in fields if column not in resource.columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"Limit has to be between 1 and {MAX_LIMIT}.")
+
+    if name == "balances":
+        field_years = get_saldo_field_ids(year=year, user_id=user_id)
+        if field_years:
+            recompute_saldos(field_years, guidelines=guidelines)
+
+    # one row more than the limit tells if there is a following page
+    query = resource.select(user_id, fields, year, decode_cursor(cursor), limit + 1)
+    rows = _db.session.execute(query).all()
+    page = Page(
+        data=[
+            {column: json_value(value) for column, value in zip(fields, row[1:])}
+            for row in rows[:limit]
+        ]
+    )
+    if len(rows) > limit:
+        page.next_cursor = encode_cursor(rows[limit - 1][0])
+    return page
+
+
+def encode_cursor(key: int) -> str:
+    return base64.urlsafe_b64encode(str(key).encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> int | None:
+    """Key of the last row of the previous page."""
+    if not cursor:
+        return None
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor.")
@@ -0,0 +1,31 @@
+from flask import jsonify, request
+from flask_login import current_user, login_required
+
+from app.api_v1 import RESOURCES, bp, fetch_page
+from app.api_v1.resources import DEFAULT_LIMIT
+
+
+@bp.route("/", methods=["GET"])
+@login_required
+def index():
+    return jsonify({name: list(resource.columns) for name, resource in RESOURCES.items()})
+
+
+@bp.route("/<name>", methods=["GET"])
+@login_required
+def resource(name: str):
+    if name not in RESOURCES:
+        return jsonify("Resource not found."), 404
+    fields = [field for value in request.args.getlist("fields") for field in value.split(",")]
+    try:
+        page = fetch_page(
+            name,
+            current_user.id,
+            fields=[field for field in fields if field],
+            year=request.args.get("year", type=int),
+            cursor=request.args.get("cursor"),
+            limit=request.args.get("limit", DEFAULT_LIMIT, type=int),
+        )
+    except ValueError as e:
+        return jsonify(str(e)), 400
+    return jsonify(page.to_dict())
@@ -1,14 +1,15 @@
 """The app module, containing the app factory function."""
+
 import logging
 import os
 from logging.handlers import RotatingFileHandler, SMTPHandler
 
 from flask import Flask
 
-from app import api, auth, cli, errors, main
+from app import api, api_v1, auth, cli, errors, main
 from app.database.model import BaseField, User
 from app.extensions import bootstrap, csrf_protection, db, login, migrate
-from app.model import Soil
+from app.model import Soil, soil_classes
 from app.utils import fertilization_sorting, format_number
 from config import Config
 
@@ -49,6 +50,7 @@ def register_blueprints(app: Flask):
     app.register_blueprint(auth.bp, url_prefix="/auth")
     app.register_blueprint(main.bp)
     app.register_blueprint(api.bp)
+    app.register_blueprint(api_v1.bp, url_prefix="/api/v1")
 
 
 def register_errorhandlers(app: Flask):
@@ -74,6 +76,7 @@ def register_commands(app: Flask):
 def register_custom_filters(app: Flask):
     app.jinja_env.filters["format_number"] = format_number
     app.jinja_env.globals.update(Soil=Soil)
+    app.jinja_env.globals.update(soil_classes=soil_classes)
     app.jinja_env.globals.update(fertilization_sorting=fertilization_sorting)
     app.jinja_env.trim_blocks = True
     app.jinja_env.lstrip_blocks = True
@@ -81,7 +84,7 @@ def register_custom_filters(app: Flask):
 
 def configure_logger(app: Flask):
     """Configure loggers."""
-    if not app.debug and not app.testing:
+    if not app.debug and not app.testing and not app.config.get("WORKER"):
         if app.config["MAIL_SERVER"]:
             auth_creds = None
             if app.config["MAIL_USERNAME"] or app.config["MAIL_PASSWORD"]:
@@ -5,7 +5,21 @@ import os
 import click
 from loguru import logger
 
+from app.database.model import BaseField
 from app.database.setup import setup_database
+from app.extensions import db
+from app.model import (
+    EXPORT_COLUMNS,
+    SoilImportError,
+    compact_changes,
+    export_csv,
+    get_saldo_field_ids,
+    import_soil_samples,
+    reclassify_soil_samples,
+    recompute_saldos,
+    roll_over,
+    update_soil_index,
+)
 from app.utils import load_json, save_json
 from app.utils.utils import renew_dict
 
@@ -56,6 +70,138 @@ def register(app):
         seed = [fields, fertilizers, crops]
         setup_database(seed=seed)
 
+    @app.cli.group()
+    def soil():
+        """Maintain soil sample data."""
+
+    @soil.command()
+    @click.option("--user", "user_id", type=int, help="Only index the fields of this user.")
+    def index(user_id: int):
+        """Rebuild the effective soil sample index of all field-years."""
+        base_ids = None
+        if user_id is not None:
+            base_ids = [
+                base_id
+                for (base_id,) in db.session.execute(
+                    db.select(BaseField.id).where(BaseField.user_id == user_id)
+                )
+            ]
+        count = update_soil_index(base_ids)
+        db.session.commit()
+        print(f"Indexed soil samples for {count} field-years.")
+
+    @soil.command()
+    def classify():
+        """Recompute soil classes that are outdated after a guidelines update."""
+        count = reclassify_soil_samples()
+        db.session.commit()
+        print(f"Updated soil classes of {count} base fields.")
+
+    @soil.command("import")
+    @click.argument("path")
+    @click.option("--user", "user_id", type=int, required=True, help="Owner of the fields.")
+    @click.option("--delimiter", default=";", show_default=True)
+    @click.option("--dry-run", is_flag=True, help="Only validate the file.")
+    def import_(path: str, user_id: int, delimiter: str, dry_run: bool):
+        """Import soil samples from a lab results csv file."""
+        try:
+            with open(path, "r", encoding="utf-8-sig", newline="") as f:
+                report = import_soil_samples(f, user_id, delimiter=delimiter)
+        except (FileNotFoundError, SoilImportError) as e:
+            logger.error(e)
+            return
+        for line, error in report.errors:
+            print(f"Line {line}: {error}")
+        if dry_run:
+            db.session.rollback()
+            print(f"{report.imported} of {report.rows} soil samples are valid.")
+        else:
+            db.session.commit()
+            print(f"Imported {report.imported} of {report.rows} soil samples.")
+
+    @app.cli.group()
+    def balances():
+        """Maintain the stored field balances."""
+
+    @balances.command()
+    @click.option("--year", type=int, help="Only recompute this year.")
+    @click.option("--user", "user_id", type=int, help="Only recompute the fields of this user.")
+    @click.option("--all", "all_", is_flag=True, help="Recompute clean field-years as well.")
+    @click.option(
+        "--workers", default=os.cpu_count(), show_default=True, help="Process pool size."
+    )
+    def recompute(year: int, user_id: int, all_: bool, workers: int):
+        """Recompute the balances of all dirty field-years into the saldo table."""
+        field_years = get_saldo_field_ids(year, user_id, only_dirty=not all_)
+        if not field_years:
+            print("All balances are up to date.")
+            return
+        report = recompute_saldos(field_years, workers=workers)
+        for field_id in report.failed:
+            print(f"Failed to compute field {field_id}")
+        print(
+            f"Recomputed {report.fields} balances in {report.seconds:.2f}s "
+            f"({report.throughput:.1f} fields/s), {len(report.failed)} failed."
+        )
+
+    @app.cli.group()
+    def fields():
+        """Maintain the fields of the users."""
+
+    @fields.command()
+    @click.option("--user", "user_id", type=int, required=True, help="Owner of the fields.")
+    @click.option("--year", type=int, required=True, help="Copy the fields of this year.")
+    @click.option("--cultivations", is_flag=True, help="Copy the cultivations too.")
+    @click.option("--fertilizations", is_flag=True, help="Copy the fertilizations too.")
+    def rollover(user_id: int, year: int, cultivations: bool, fertilizations: bool):
+        """Copy all fields of a year into the next year and compute their balances."""
+        try:
+            report = roll_over(user_id, year, cultivations, fertilizations)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        db.session.commit()
+        print(
+            f"Copied {report.fields} fields, {report.cultivations} cultivations and "
+            f"{report.fertilizations} fertilizations into {report.year}, "
+            f"{report.skipped} existed already."
+        )
+        if report.fields:
+            recompute_saldos(get_saldo_field_ids(report.year, user_id))
+
+    @app.cli.group()
+    def changes():
+        """Maintain the change log the clients sync from."""
+
+    @changes.command()
+    @click.option("--user", "user_id", type=int, help="Only compact the changes of this user.")
+    def compact(user_id: int):
+        """Delete the change log entries of rows that changed again later."""
+        deleted = compact_changes(user_id)
+        db.session.commit()
+        print(f"Deleted {deleted} change log entries.")
+
+    @app.cli.group("export")
+    def export_():
+        """Export field data."""
+
+    @export_.command()
+    @click.argument("kind", type=click.Choice(list(EXPORT_COLUMNS)))
+    @click.option("--user", "user_id", type=int, required=True, help="Owner of the fields.")
+    @click.option("--year", "years", type=int, multiple=True, required=True)
+    @click.option("--output", type=click.Path(dir_okay=False), help="Print to stdout by default.")
+    @click.option("--delimiter", default=";", show_default=True)
+    @click.option("--decimal", default=",", show_default=True)
+    def csv(kind: str, user_id: int, years: tuple, output: str, delimiter: str, decimal: str):
+        """Export fields, cultivations, fertilizations or balances of years as csv."""
+        lines = export_csv(kind, user_id, years, delimiter=delimiter, decimal=decimal)
+        if output is None:
+            for line in lines:
+                click.echo(line, nl=False)
+            return
+        with open(output, "w", encoding="utf-8-sig", newline="") as f:
+            f.writelines(lines)
+        print(f"Exported {kind} to {output}.")
+
     @app.cli.command("pytest")
     @click.option("--cov", is_flag=True)
     @click.option("--log", is_flag=True)
@@ -2,6 +2,7 @@ from loguru import logger
 
 from app.extensions import db
 
+from . import events
 from .model import *
 
 MODEL_HIERACHIE = {
@@ -0,0 +1,127 @@
+"""
+Per-user cache of the select choices of the forms.
+
+Crops, fertilizers and the years with fields are read per user and process, only with
+their ids, names and the columns they are filtered by, and filtered in memory afterwards.
+Entries are kept with the latest `ChangeLog` version of their table and user and are read
+again once it changed, so writes of other processes and of the cli are seen as soon as
+they are committed. Checking the version is a single indexed query.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from enum import Enum
+from threading import Lock
+
+from sqlalchemy import Connection, Select, func, select
+
+from app.database.model import BaseField, ChangeLog, Crop, Fertilizer, Field
+from app.database.types import CropClass, FertClass, FieldType
+from app.extensions import db
+
+# tables the choices are read from, writes to them are versioned by the `ChangeLog`
+CHOICE_TABLES = (Crop.__tablename__, Fertilizer.__tablename__, Field.__tablename__)
+# set on a connection whose transaction wrote to `CHOICE_TABLES`, see `events`
+WRITTEN_KEY = "choices_written"
+
+_cache: dict[tuple[int, str], tuple[int, list[tuple]]] = {}
+_lock = Lock()
+
+
+def crop_choices(
+    user_id: int, crop_class: CropClass | None = None, field_type: FieldType | None = None
+) -> list[tuple[int, str]]:
+    """Ids and names of the crops of the user, optionally of one class and field type."""
+    return [
+        (id, name)
+        for id, name, class_, type_ in _load(user_id, Crop.__tablename__)
+        if (crop_class is None or class_ is crop_class)
+        and (field_type is None or type_ is field_type)
+    ]
+
+
+def fertilizer_choices(
+    user_id: int,
+    fert_class: FertClass | None = None,
+    years: Iterable[int] | None = None,
+    fert_types: type[Enum] | None = None,
+) -> list[tuple[int, str]]:
+    """
+    Ids and names of the fertilizers of the user.
+
+    :param years:
+        Only fertilizers of these years.
+    :param fert_types:
+        Only fertilizers of the types of this enum, e.g. `FertType.from_measure`.
+    """
+    years = None if years is None else set(years)
+    return [
+        (id, name)
+        for id, name, class_, type_, year in _load(user_id, Fertilizer.__tablename__)
+        if (fert_class is None or class_ is fert_class)
+        and (years is None or year in years)
+        and (fert_types is None or type_.name in fert_types._member_names_)
+    ]
+
+
+def year_choices(user_id: int) -> list[int]:
+    """Years the user has fields in, the latest first."""
+    return [year for (year,) in _load(user_id, Field.__tablename__)]
+
+
+def mark_written(connection: Connection) -> None:
+    """Flag a transaction that wrote to one of the `CHOICE_TABLES` until it ends."""
+    connection.info[WRITTEN_KEY] = True
+
+
+def clear_choices() -> None:
+    """Drop all cached choices, e.g. when the tables are dropped and versions restart."""
+    with _lock:
+        _cache.clear()
+
+
+def _load(user_id: int, table: str) -> list[tuple]:
+    connection = db.session.connection()
+    version = connection.execute(
+        select(func.max(ChangeLog.id)).where(
+            ChangeLog.user_id == user_id, ChangeLog.table == table
+        )
+    ).scalar()
+    cached = _cache.get((user_id, table))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    rows = [tuple(row) for row in connection.execute(_QUERIES[table](user_id))]
+    # uncommitted writes may be rolled back and their version used again
+    if not connection.info.get(WRITTEN_KEY):
+        with _lock:
+            _cache[(user_id, table)] = (version, rows)
+    return rows
+
+
+def _crops(user_id: int) -> Select:
+    query = select(Crop.id, Crop.name, Crop.crop_class, Crop.field_type)
+    return query.where(Crop.user_id == user_id).order_by(Crop.id)
+
+
+def _fertilizers(user_id: int) -> Select:
+    query = select(
+        Fertilizer.id,
+        Fertilizer.name,
+        Fertilizer.fert_class,
+        Fertilizer.fert_type,
+        Fertilizer.year,
+    )
+    return query.where(Fertilizer.user_id == user_id).order_by(Fertilizer.id)
+
+
+def _years(user_id: int) -> Select:
+    query = select(Field.year).join(BaseField).where(BaseField.user_id == user_id)
+    return query.distinct().order_by(Field.year.desc())
+
+
+_QUERIES: dict[str, Callable[[int], Select]] = {
+    Crop.__tablename__: _crops,
+    Fertilizer.__tablename__: _fertilizers,
+    Field.__tablename__: _years,
+}
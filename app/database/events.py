@@ -0,0 +1,233 @@
+"""Session event hooks that keep derived tables in sync with their source data."""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Iterable
+
+from sqlalchemy import (
+    Connection,
+    Engine,
+    and_,
+    delete,
+    event,
+    insert,
+    inspect,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.orm import Session
+
+from app.database.choices import CHOICE_TABLES, WRITTEN_KEY, clear_choices, mark_written
+from app.database.model import (
+    BaseField,
+    ChangeLog,
+    Crop,
+    Cultivation,
+    FarmBalance,
+    Fertilization,
+    Fertilizer,
+    Field,
+    LimeBalance,
+    Modifier,
+    Saldo,
+    SoilSample,
+)
+from app.database.types import ChangeType
+
+# models of the user data whose changes are written to the `ChangeLog`
+LOGGED_MODELS = (
+    BaseField,
+    Field,
+    Cultivation,
+    Crop,
+    Fertilization,
+    Fertilizer,
+    SoilSample,
+    Modifier,
+)
+
+
+@event.listens_for(Session, "before_flush")
+def invalidate_balances(session: Session, flush_context, instances) -> None:
+    """
+    Flag the `Saldo` and drop the cached `LimeBalance` of every field-year whose balance
+    inputs change in this flush, including all following years of the base field,
+    which carry the lime balance forward. The `FarmBalance` of their users is dropped
+    from the first changed year on. The soil classes of changed soil samples lose their
+    guidelines version, so `update_soil_index` classifies them again.
+    """
+    changes = [*session.new, *session.deleted]
+    changes += [obj for obj in session.dirty if session.is_modified(obj)]
+    if not changes:
+        return
+
+    starts: dict[int, int] = {}
+    field_ids, fertilizer_ids, crop_ids = set(), set(), set()
+    with session.no_autoflush:
+        for obj in changes:
+            if isinstance(obj, (Field, SoilSample)):
+                _add_start(starts, obj.base_id, obj.year)
+                if isinstance(obj, SoilSample) and session.is_modified(
+                    obj, include_collections=False
+                ):
+                    for indexed in (*obj.classifications, *obj.field_soils):
+                        indexed.version = None
+            elif isinstance(obj, (Cultivation, Fertilization, Modifier)):
+                if obj.field_id is not None:
+                    field_ids.add(obj.field_id)
+                elif obj.field is not None:
+                    _add_start(starts, obj.field.base_id, obj.field.year)
+            elif isinstance(obj, Fertilizer) and obj.id is not None:
+                fertilizer_ids.add(obj.id)
+            elif isinstance(obj, Crop) and obj.id is not None:
+                crop_ids.add(obj.id)
+
+    connection = session.connection()
+    queries = []
+    if field_ids:
+        queries.append(select(Field.base_id, Field.year).where(Field.id.in_(field_ids)))
+    if fertilizer_ids:
+        queries.append(
+            select(Field.base_id, Field.year)
+            .join(Fertilization)
+            .where(Fertilization.fertilizer_id.in_(fertilizer_ids))
+        )
+    if crop_ids:
+        queries.append(
+            select(Field.base_id, Field.year)
+            .join(Cultivation)
+            .where(Cultivation.crop_id.in_(crop_ids))
+        )
+    for query in queries:
+        for base_id, year in connection.execute(query):
+            _add_start(starts, base_id, year)
+    invalidate_field_years(connection, starts)
+
+
+def invalidate_field_years(connection: Connection, starts: dict[int, int]) -> None:
+    """
+    Flag the `Saldo` and drop the cached `LimeBalance` of the field-years of every base field
+    from its first changed year on, and the `FarmBalance` of their users from the first
+    changed year. Statements that bypass the ORM, e.g. bulk inserts, call it themselves.
+
+    :param starts:
+        First changed year by base field id.
+    """
+    if not starts:
+        return
+    # one condition per start year, bulk changes of many base fields start in the same year
+    base_ids = defaultdict(list)
+    for base_id, year in starts.items():
+        base_ids[year].append(base_id)
+    affected = select(Field.id).where(
+        or_(*(and_(Field.base_id.in_(ids), Field.year >= year) for year, ids in base_ids.items()))
+    )
+    connection.execute(update(Saldo).where(Saldo.field_id.in_(affected)).values(dirty=True))
+    connection.execute(delete(LimeBalance).where(LimeBalance.field_id.in_(affected)))
+    connection.execute(
+        delete(FarmBalance).where(
+            FarmBalance.user_id.in_(select(BaseField.user_id).where(BaseField.id.in_(starts))),
+            FarmBalance.year >= min(starts.values()),
+        )
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def log_changes(session: Session, flush_context) -> None:
+    """
+    Write an entry to the `ChangeLog` for every row of the `LOGGED_MODELS` that is
+    created, updated or deleted in this flush. New rows have their ids by now, their
+    users are resolved through the foreign keys, new rows aren't loaded yet.
+    """
+    changes = [(obj, ChangeType.created) for obj in session.new]
+    changes += [(obj, ChangeType.deleted) for obj in session.deleted]
+    changes += [(obj, ChangeType.updated) for obj in session.dirty if session.is_modified(obj)]
+    changes = [(obj, change) for obj, change in changes if isinstance(obj, LOGGED_MODELS)]
+    if not changes:
+        return
+
+    connection = session.connection()
+    users: dict[int, int] = {}
+    bases: dict[int, int] = {}
+    for obj, _ in changes:
+        if isinstance(obj, BaseField):
+            users[obj.id] = obj.user_id
+        elif isinstance(obj, Field):
+            bases[obj.id] = _parent_id(obj, "base_id")
+    field_ids = {
+        _parent_id(obj, "field_id")
+        for obj, _ in changes
+        if isinstance(obj, (Cultivation, Fertilization, Modifier))
+    }
+    field_ids -= {None, *bases}
+    if field_ids:
+        query = select(Field.id, Field.base_id).where(Field.id.in_(field_ids))
+        bases.update(connection.execute(query).all())
+    base_ids = {_parent_id(obj, "base_id") for obj, _ in changes if isinstance(obj, SoilSample)}
+    base_ids = {*base_ids, *bases.values()} - {None, *users}
+    if base_ids:
+        query = select(BaseField.id, BaseField.user_id).where(BaseField.id.in_(base_ids))
+        users.update(connection.execute(query).all())
+
+    rows = []
+    for obj, change in changes:
+        if obj.id is None:
+            continue
+        if isinstance(obj, (BaseField, Crop, Fertilizer)):
+            user_id = obj.user_id
+        elif isinstance(obj, (Field, SoilSample)):
+            user_id = users.get(_parent_id(obj, "base_id"))
+        else:
+            user_id = users.get(bases.get(_parent_id(obj, "field_id")))
+        rows.append((user_id, obj.__tablename__, obj.id, change))
+    log_rows(connection, rows)
+
+
+def log_rows(
+    connection: Connection, rows: Iterable[tuple[int | None, str, int, ChangeType]]
+) -> None:
+    """
+    Write `ChangeLog` entries, given as tuples of user id, table name, row id and change,
+    in one statement.
+    """
+    rows = [
+        {"user_id": user_id, "table_name": table, "row_id": row_id, "change": change}
+        for user_id, table, row_id, change in rows
+    ]
+    if rows:
+        connection.execute(insert(ChangeLog), rows)
+    if any(row["table_name"] in CHOICE_TABLES for row in rows):
+        mark_written(connection)
+
+
+@event.listens_for(Engine, "commit")
+@event.listens_for(Engine, "rollback")
+def end_choices_written(connection: Connection) -> None:
+    connection.info.pop(WRITTEN_KEY, None)
+
+
+@event.listens_for(Field.metadata, "after_drop")
+def drop_choices(target, connection: Connection, **kwargs) -> None:
+    """Versions of the cached choices start again with new tables."""
+    clear_choices()
+
+
+def _add_start(starts: dict[int, int], base_id: int | None, year: int | None) -> None:
+    if base_id is None or year is None:
+        return
+    starts[base_id] = min(year, starts.get(base_id, year))
+
+
+def _parent_id(obj, attribute: str) -> int | None:
+    """
+    Foreign key of a flushed row to its parent. Keys that are blanked in this flush, e.g.
+    of the children of a deleted parent, are read from the state before the flush.
+    """
+    value = getattr(obj, attribute)
+    if value is None:
+        value = next(
+            (key for key in inspect(obj).attrs[attribute].history.deleted if key is not None), None
+        )
+    return value
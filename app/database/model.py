@@ -1,15 +1,30 @@
 from __future__ import annotations
 
+from datetime import UTC, datetime
+from decimal import Decimal
 from time import time
 
 from flask import current_app
 from flask_login import UserMixin
 from jwt import InvalidSignatureError, decode, encode
-from sqlalchemy import Boolean, Column, Enum, Float, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    false,
+)
 from sqlalchemy.orm import Query, backref, relationship
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from app.database.types import (
+    ChangeType,
     CropClass,
     CropType,
     CultivationType,
@@ -19,11 +34,13 @@ from app.database.types import (
     FertType,
     FieldType,
     HumusType,
+    JobStatus,
     LegumeType,
     MeasureType,
     NminType,
     NutrientType,
     ResidueType,
+    SoilClass,
     SoilType,
     UnitType,
 )
@@ -38,7 +55,13 @@ __all__ = [
     "Fertilizer",
     "Modifier",
     "SoilSample",
+    "FieldSoil",
+    "SoilClassification",
     "Saldo",
+    "LimeBalance",
+    "FarmBalance",
+    "Job",
+    "ChangeLog",
     "User",
 ]
 
@@ -52,6 +75,8 @@ UniqueConstraint: UniqueConstraint = db.UniqueConstraint  # noqa: F811
 Float: Float = db.Float  # noqa: F811
 Boolean: Boolean = db.Boolean  # noqa: F811
 Enum: Enum = db.Enum  # noqa: F811
+DateTime: DateTime = db.DateTime  # noqa: F811
+Text: Text = db.Text  # noqa: F811
 backref: backref = db.backref  # noqa: F811
 
 
@@ -163,8 +188,16 @@ class Field(Base):
     base_field = relationship("BaseField", back_populates="fields")
     cultivations = relationship("Cultivation", back_populates="field")
     fertilizations = relationship("Fertilization", back_populates="field")
-    saldo = relationship("Saldo", back_populates="field", uselist=False)
+    saldo = relationship(
+        "Saldo", back_populates="field", uselist=False, cascade="all, delete-orphan"
+    )
     modifiers = relationship("Modifier", back_populates="field")
+    soil = relationship(
+        "FieldSoil", back_populates="field", uselist=False, cascade="all, delete-orphan"
+    )
+    lime_balance = relationship(
+        "LimeBalance", back_populates="field", uselist=False, cascade="all, delete-orphan"
+    )
 
     @property
     def soil_samples(self):
@@ -342,11 +375,27 @@ class SoilSample(Base):
     humus = Column("humus", Enum(HumusType))
 
     base_field = relationship("BaseField", back_populates="soil_samples")
+    # index entries fall back to a full search of the soil samples once removed
+    field_soils = relationship(
+        "FieldSoil", back_populates="soil_sample", cascade="all, delete-orphan"
+    )
+    classifications = relationship(
+        "SoilClassification",
+        back_populates="soil_sample",
+        cascade="all, delete-orphan",
+        lazy="selectin",
+    )
 
     @property
     def fields(self):
         return self.base_field.fields
 
+    def get_classification(self, field_type: FieldType) -> SoilClassification | None:
+        for classification in self.classifications:
+            if classification.field_type is field_type:
+                return classification
+        return None
+
     def __repr__(self):
         return (
             f"SoilSample(id='{self.id}', year='{self.year}', "
@@ -355,6 +404,77 @@ class SoilSample(Base):
         )
 
 
+class SoilClassification(Base):
+    """
+    Soil classes of a soil sample for a field type, computed at write time
+    with the guidelines identified by `version`.
+    """
+
+    __tablename__ = "soil_classification"
+
+    sample_id = Column("sample_id", Integer, ForeignKey("soil_sample.sample_id"), primary_key=True)
+    field_type = Column("field_type", Enum(FieldType), primary_key=True)
+    version = Column("version", String(12), index=True)
+    class_ph = Column("class_ph", Enum(SoilClass), index=True)
+    class_p2o5 = Column("class_p2o5", Enum(SoilClass), index=True)
+    class_k2o = Column("class_k2o", Enum(SoilClass), index=True)
+    class_mg = Column("class_mg", Enum(SoilClass), index=True)
+
+    soil_sample = relationship("SoilSample", back_populates="classifications")
+
+    @property
+    def classes(self) -> dict[str, SoilClass | str]:
+        return {
+            "ph": self.class_ph or "",
+            "p2o5": self.class_p2o5 or "",
+            "k2o": self.class_k2o or "",
+            "mg": self.class_mg or "",
+        }
+
+    def __repr__(self):
+        return (
+            f"SoilClassification(sample_id='{self.sample_id}', field_type='{self.field_type}', "
+            f"version='{self.version}', classes='{self.class_ph}, {self.class_p2o5}, "
+            f"{self.class_k2o}, {self.class_mg}')"
+        )
+
+
+class FieldSoil(Base):
+    """
+    Effective soil sample of a field-year and its soil classes, copied from the
+    matching `SoilClassification` together with its guidelines `version`. Maintained by
+    `app.model.soil_index.update_soil_index` whenever soil samples or fields are written.
+    """
+
+    __tablename__ = "field_soil"
+
+    field_id = Column("field_id", Integer, ForeignKey("field.field_id"), primary_key=True)
+    sample_id = Column("sample_id", Integer, ForeignKey("soil_sample.sample_id"), index=True)
+    version = Column("version", String(12))
+    class_ph = Column("class_ph", Enum(SoilClass))
+    class_p2o5 = Column("class_p2o5", Enum(SoilClass))
+    class_k2o = Column("class_k2o", Enum(SoilClass))
+    class_mg = Column("class_mg", Enum(SoilClass))
+
+    field = relationship("Field", back_populates="soil")
+    soil_sample = relationship("SoilSample", back_populates="field_soils")
+
+    @property
+    def classes(self) -> dict[str, SoilClass | str]:
+        return {
+            "ph": self.class_ph or "",
+            "p2o5": self.class_p2o5 or "",
+            "k2o": self.class_k2o or "",
+            "mg": self.class_mg or "",
+        }
+
+    def __repr__(self):
+        return (
+            f"FieldSoil(field_id='{self.field_id}', sample_id='{self.sample_id}', "
+            f"classes='{self.class_ph}, {self.class_p2o5}, {self.class_k2o}, {self.class_mg}')"
+        )
+
+
 class Modifier(Base):
     __tablename__ = "modifier"
 
@@ -377,6 +497,112 @@ class Saldo(Base):
     mgo = Column("mgo", Float(asdecimal=True, decimal_return_scale=2))
     s = Column("s", Float(asdecimal=True, decimal_return_scale=2))
     cao = Column("cao", Float(asdecimal=True, decimal_return_scale=2))
+    # organic N before storage losses
     n_total = Column("nges", Float(asdecimal=True, decimal_return_scale=2))
+    # set by `app.database.events` whenever the inputs of the balance change
+    dirty = Column("dirty", Boolean, default=False, server_default=false())
 
     field = relationship("Field", back_populates="saldo")
+
+
+class LimeBalance(Base):
+    """
+    Cached running lime (CaO) balance of a field-year at the end of the year, accumulated
+    since the last soil sample. Entries of changed field-years and all following years
+    are removed by `app.database.events` and written again by `recompute_saldos`.
+    """
+
+    __tablename__ = "lime_balance"
+
+    field_id = Column("field_id", Integer, ForeignKey("field.field_id"), primary_key=True)
+    cao = Column("cao", Float(asdecimal=True, decimal_return_scale=2))
+
+    field = relationship("Field", back_populates="lime_balance")
+
+
+class FarmBalance(Base):
+    """
+    Cached farm-level nutrient comparison of a user and year, aggregated from the `Saldo`
+    of all field-years. Entries of changed years and all following years are removed by
+    `app.database.events` and lazily recalculated.
+    """
+
+    __tablename__ = "farm_balance"
+
+    user_id = Column("user_id", Integer, ForeignKey("user.user_id"), primary_key=True)
+    year = Column("year", Integer, primary_key=True)
+    fields = Column("fields", Integer)
+    area = Column("area", Float(asdecimal=True, decimal_return_scale=2))
+    n = Column("n", Float(asdecimal=True, decimal_return_scale=2))
+    p2o5 = Column("p2o5", Float(asdecimal=True, decimal_return_scale=2))
+    # organic N after storage losses, the basis of the limits of `check_compliance`
+    n_organic = Column("n_organic", Float(asdecimal=True, decimal_return_scale=2))
+
+    @property
+    def n_per_ha(self) -> Decimal:
+        return self.n / self.area if self.area else Decimal()
+
+    @property
+    def p2o5_per_ha(self) -> Decimal:
+        return self.p2o5 / self.area if self.area else Decimal()
+
+    @property
+    def n_organic_per_ha(self) -> Decimal:
+        return self.n_organic / self.area if self.area else Decimal()
+
+    def __repr__(self):
+        return (
+            f"FarmBalance(user_id='{self.user_id}', year='{self.year}', area='{self.area}', "
+            f"n='{self.n}', p2o5='{self.p2o5}', n_organic='{self.n_organic}')"
+        )
+
+
+class Job(Base):
+    """
+    Background job of a user, executed by `app.jobs.runner`.
+    Live progress is held by the runner and written here with its heartbeat, which shows
+    that the process running the job is still alive.
+    """
+
+    __tablename__ = "job"
+
+    id = Column("job_id", Integer, primary_key=True)
+    user_id = Column("user_id", Integer, ForeignKey("user.user_id"), index=True)
+    name = Column("name", String(64))
+    status = Column("status", Enum(JobStatus), default=JobStatus.queued, index=True)
+    progress = Column("progress", Integer, default=0)
+    message = Column("message", String(256))
+    result = Column("result", Text)
+    created_at = Column("created_at", DateTime, default=lambda: datetime.now(UTC))
+    finished_at = Column("finished_at", DateTime)
+    heartbeat_at = Column("heartbeat_at", DateTime)
+
+    user = relationship("User")
+
+    def __repr__(self):
+        return (
+            f"Job(id='{self.id}', name='{self.name}', status='{self.status}', "
+            f"progress='{self.progress}')"
+        )
+
+
+class ChangeLog(Base):
+    """
+    Change feed of the data of the users, one entry per created, updated or deleted row.
+    Written by `app.database.events` on every flush, the id is the version that clients
+    sync from. Bulk writes that bypass the session must call `log_rows` themselves.
+    """
+
+    __tablename__ = "change_log"
+
+    id = Column("version", Integer, primary_key=True)
+    user_id = Column("user_id", Integer, ForeignKey("user.user_id"), index=True)
+    table = Column("table_name", String(32))
+    row_id = Column("row_id", Integer)
+    change = Column("change", Enum(ChangeType))
+
+    def __repr__(self):
+        return (
+            f"ChangeLog(id='{self.id}', table='{self.table}', row_id='{self.row_id}', "
+            f"change='{self.change}')"
+        )
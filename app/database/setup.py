@@ -33,6 +33,7 @@ from app.database.types import (
     UnitType,
 )
 from app.extensions import db
+from app.model import update_soil_index
 
 
 def setup_database(seed: list[dict] = None) -> None:
@@ -409,5 +410,7 @@ def seed_database(data: list[dict]) -> None:
                 soil_sample.base_field = base_field
             update_session(soil_sample)
 
+    db.session.commit()
+    update_soil_index()
     db.session.commit()
     logger.info("Seeded sample data successfully.")
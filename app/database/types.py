@@ -39,10 +39,16 @@ __all__ = [
     "UnitType",
     "DemandType",
     "NutrientType",
+    "JobStatus",
+    "ChangeType",
 ]
 
 
 class BaseType(enum.Enum):
+    def __init__(self, *args) -> None:
+        # position in definition order, precomputed for sorting without `_member_names_.index`
+        self._ordinal_: int = len(self.__class__._member_names_)
+
     @classmethod
     def from_sub_type(cls, sub_type: enum.Enum):
         """
@@ -64,13 +70,43 @@ class BaseType(enum.Enum):
         except KeyError:
             raise KeyError(f"{sub_type.name} doesn't exist.")
 
+    @property
+    def ordinal(self) -> int:
+        """Position of the member in the order of definition."""
+        return self._ordinal_
+
+    def is_any(self, *members: BaseType) -> bool:
+        """
+        Identity based membership check for the model layer, e.g.
+        `field_type.is_any(FieldType.cropland, FieldType.grassland)`.
+        Avoids the `__eq__` calls of `field_type in (...)` for non-matching members.
+        """
+        for member in members:
+            if self is member:
+                return True
+        return False
+
     def __eq__(self, other: object) -> bool:
+        # members are singletons, so identity decides all enum to enum comparisons
+        if self is other:
+            return True
         if isinstance(other, str):
-            return self.name == other
-        return super().__eq__(other)
+            return self._name_ == other
+        if isinstance(other, enum.Enum):
+            return False
+        return NotImplemented
+
+    def __ne__(self, other: object) -> bool:
+        # explicit to skip the second dispatch of the default `__ne__` through `__eq__`
+        if self is other:
+            return False
+        if isinstance(other, str):
+            return self._name_ != other
+        if isinstance(other, enum.Enum):
+            return True
+        return NotImplemented
 
-    def __hash__(self) -> int:
-        return super().__hash__()
+    __hash__ = enum.Enum.__hash__
 
     def __str__(self) -> str:
         return self.value
@@ -428,8 +464,8 @@ class MeasureType(BaseType):
         Sorts fertilizations based on their measure types.
         Use with fertilizations and not measures directly.
         """
-        index1 = cls._member_names_.index(item1.measure.name)
-        index2 = cls._member_names_.index(item2.measure.name)
+        index1 = item1.measure._ordinal_
+        index2 = item2.measure._ordinal_
         if index1 < index2:
             return -1
         elif index1 > index2:
@@ -437,6 +473,13 @@ class MeasureType(BaseType):
         else:
             return 0
 
+    @staticmethod
+    def sort_key(item) -> int:
+        """
+        Key function equivalent of `sorting`, use with `sorted(..., key=MeasureType.sort_key)`.
+        """
+        return item.measure._ordinal_
+
 
 OrganicMeasureType: enum.Enum = enum.Enum(
     "OrganicMeasureType", [(e.name, e.value) for e in MeasureType if "org_" in e.name]
@@ -520,3 +563,25 @@ class SoilClass(BaseType):
     C = "C"
     D = "D"
     E = "E"
+
+
+class JobStatus(BaseType):
+    """States of background jobs: `queued`, `running`, `done` etc."""
+
+    queued = "Wartend"
+    running = "Läuft"
+    done = "Fertig"
+    failed = "Fehlgeschlagen"
+    cancelled = "Abgebrochen"
+
+    @property
+    def finished(self) -> bool:
+        return self.is_any(JobStatus.done, JobStatus.failed, JobStatus.cancelled)
+
+
+class ChangeType(BaseType):
+    """Kinds of changes in the change log: `created`, `updated` and `deleted`"""
+
+    created = "Erstellt"
+    updated = "Geändert"
+    deleted = "Gelöscht"
@@ -0,0 +1,271 @@
+"""
+Local background jobs for long running farm computations.
+
+Jobs are registered by name with `runner.task` and started with `runner.submit`.
+They run in a bounded thread pool inside their own app context, their state is
+persisted in the `job` table and the live progress is kept in memory. A heartbeat
+writes the progress of the jobs of a process to the table, so every process can report
+them, and jobs without a recent heartbeat were interrupted, e.g. by a restart.
+With `JOB_WORKERS = 0` jobs run eagerly inside the request, e.g. for testing.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from threading import Event, Lock, Thread
+
+from flask import Flask, current_app
+from loguru import logger
+from sqlalchemy import update
+
+from app.database.model import BaseField, Job
+from app.database.types import JobStatus
+from app.extensions import db
+from app.model import get_saldo_field_ids, recompute_saldos, update_soil_index
+
+# seconds between the heartbeats of a process
+HEARTBEAT_INTERVAL = 30
+# unfinished jobs without a heartbeat for this long are failed
+HEARTBEAT_TIMEOUT = timedelta(seconds=3 * HEARTBEAT_INTERVAL)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class UnknownJobError(KeyError):
+    def __init__(self, name) -> None:
+        self.message = f"Unknown job: '{name}'"
+        super().__init__(self.message)
+
+
+@dataclass
+class _JobState:
+    progress: int = 0
+    message: str = ""
+    cancel: Event = field(default_factory=Event)
+
+
+class JobContext:
+    """
+    Handle passed to every job function to report progress and check for cancellation.
+    """
+
+    def __init__(self, job: Job, state: _JobState):
+        self.id: int = job.id
+        self.user_id: int = job.user_id
+        self._state = state
+
+    @property
+    def cancelled(self) -> bool:
+        return self._state.cancel.is_set()
+
+    def progress(self, done: int, total: int = 100, message: str = "") -> None:
+        """
+        Update the progress of the job.
+
+        :raises JobCancelled:
+            Cancellation of the job was requested.
+        """
+        if self.cancelled:
+            raise JobCancelled()
+        self._state.progress = min(100, int(done * 100 / total)) if total else 100
+        if message:
+            self._state.message = message
+
+
+class JobRunner:
+    def __init__(self):
+        self.tasks: dict[str, Callable] = {}
+        self._states: dict[int, _JobState] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._stop_heartbeat = Event()
+        self._lock = Lock()
+
+    def task(self, name: str):
+        """
+        Register a job function `func(job: JobContext, **kwargs)` under `name`.
+        The return value has to be json serializable and is stored as result.
+        """
+
+        def decorator(func: Callable) -> Callable:
+            self.tasks[name] = func
+            return func
+
+        return decorator
+
+    def submit(self, name: str, user_id: int, **kwargs) -> int:
+        """
+        Queue a registered job, its keyword arguments have to be json serializable.
+
+        :raises UnknownJobError:
+            No job is registered under `name`.
+        :return:
+            Id of the job.
+        """
+        if name not in self.tasks:
+            raise UnknownJobError(name)
+        job = Job(
+            user_id=user_id,
+            name=name,
+            status=JobStatus.queued,
+            progress=0,
+            heartbeat_at=datetime.now(UTC),
+        )
+        db.session.add(job)
+        db.session.commit()
+        state = self._states[job.id] = _JobState()
+
+        app = current_app._get_current_object()
+        workers = app.config.get("JOB_WORKERS", 2)
+        if workers:
+            self._get_executor(app, workers).submit(self._run, app, job.id, state, kwargs)
+        else:
+            self._run(app, job.id, state, kwargs)
+        logger.info(f"Submitted job '{name}' with id={job.id}")
+        return job.id
+
+    def status(self, job_id: int) -> dict | None:
+        """
+        Persisted job state merged with the live progress of running jobs.
+        Unfinished jobs without a recent heartbeat were interrupted, e.g. by a restart.
+        """
+        # the job is written by another session, skip the identity map
+        job = db.session.get(Job, job_id, populate_existing=True)
+        if job is None:
+            return None
+        state = self._states.get(job_id)
+        if state is None and not job.status.finished and _is_stale(job):
+            job.status = JobStatus.failed
+            job.message = "Interrupted by restart."
+            job.finished_at = datetime.now(UTC)
+            db.session.commit()
+        info = {
+            "id": job.id,
+            "user_id": job.user_id,
+            "name": job.name,
+            "status": job.status,
+            "progress": job.progress,
+            "message": job.message or "",
+            "result": json.loads(job.result) if job.result else None,
+        }
+        if state is not None and not job.status.finished:
+            info.update(progress=state.progress, message=state.message)
+        return info
+
+    def cancel(self, job_id: int) -> bool:
+        """Request cancellation, the job stops at its next progress update."""
+        state = self._states.get(job_id)
+        if state is None:
+            return False
+        state.cancel.set()
+        return True
+
+    def heartbeat(self) -> None:
+        """Write the heartbeat and live progress of the unfinished jobs of this process."""
+        now = datetime.now(UTC)
+        for job_id, state in list(self._states.items()):
+            db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.finished_at.is_(None))
+                .values(heartbeat_at=now, progress=state.progress, message=state.message[:256])
+            )
+        db.session.commit()
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._stop_heartbeat.set()
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self, app: Flask, workers: int) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(workers, thread_name_prefix="job")
+                self._stop_heartbeat = Event()
+                Thread(target=self._beat, args=(app, self._stop_heartbeat), daemon=True).start()
+            return self._executor
+
+    def _beat(self, app: Flask, stop: Event) -> None:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            with app.app_context():
+                try:
+                    self.heartbeat()
+                except Exception as e:  # noqa: BLE001
+                    logger.exception(e)
+                finally:
+                    db.session.remove()
+
+    def _run(self, app: Flask, job_id: int, state: _JobState, kwargs: dict) -> None:
+        with app.app_context():
+            job = db.session.get(Job, job_id)
+            if state.cancel.is_set():
+                self._finish(job, JobStatus.cancelled, state)
+                return
+            job.status = JobStatus.running
+            job.heartbeat_at = datetime.now(UTC)
+            db.session.commit()
+            try:
+                result = self.tasks[job.name](JobContext(job, state), **kwargs)
+            except JobCancelled:
+                db.session.rollback()
+                self._finish(job, JobStatus.cancelled, state)
+            except Exception as e:  # noqa: BLE001
+                logger.exception(e)
+                db.session.rollback()
+                state.message = str(e)
+                self._finish(job, JobStatus.failed, state)
+            else:
+                state.progress = 100
+                job.result = json.dumps(result) if result is not None else None
+                self._finish(job, JobStatus.done, state)
+            finally:
+                db.session.remove()
+
+    def _finish(self, job: Job, status: JobStatus, state: _JobState) -> None:
+        job.status = status
+        job.progress = state.progress
+        job.message = state.message[:256]
+        job.finished_at = datetime.now(UTC)
+        db.session.commit()
+        self._states.pop(job.id, None)
+        logger.info(f"Finished job '{job.name}' with id={job.id}: {status.name}")
+
+
+def _is_stale(job: Job) -> bool:
+    heartbeat = job.heartbeat_at or job.created_at
+    # sqlite returns naive datetimes, they are stored in utc
+    if heartbeat.tzinfo is None:
+        heartbeat = heartbeat.replace(tzinfo=UTC)
+    return datetime.now(UTC) - heartbeat > HEARTBEAT_TIMEOUT
+
+
+runner = JobRunner()
+
+
+@runner.task("soil_index")
+def rebuild_soil_index(job: JobContext, chunk_size: int = 50) -> int:
+    """Rebuild the soil index of all fields of the user, committed per chunk of base fields."""
+    base_ids = [
+        base_id
+        for (base_id,) in db.session.execute(
+            db.select(BaseField.id).where(BaseField.user_id == job.user_id)
+        )
+    ]
+    count = 0
+    for start in range(0, len(base_ids), chunk_size):
+        count += update_soil_index(base_ids[start : start + chunk_size])
+        db.session.commit()
+        job.progress(start + chunk_size, len(base_ids), f"Indexed {count} field-years.")
+    return count
+
+
+@runner.task("balances")
+def recompute_balances(job: JobContext, year: int | None = None) -> dict:
+    """Recompute the dirty balances of the user in this process."""
+    report = recompute_saldos(get_saldo_field_ids(year, job.user_id), progress=job.progress)
+    return {"fields": report.fields, "failed": report.failed, "seconds": report.seconds}
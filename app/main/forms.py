@@ -12,6 +12,7 @@ from wtforms.validators import DataRequired, Email, InputRequired, ValidationErr
 
 from app.api.forms import FormHelper
 from app.database import Field, User, confirm_id
+from app.database.choices import fertilizer_choices, year_choices
 from app.database.model import BaseField, Crop, Cultivation, Fertilization, Fertilizer
 from app.database.types import DemandType, FertClass, NutrientType
 from app.extensions import db
@@ -56,7 +57,7 @@ class YearForm(FlaskForm):
     def validate_year(self, year):
         year = int(year.data)
         if year != current_user.year:
-            if year not in current_user.get_years():
+            if year not in year_choices(current_user.id):
                 raise ValidationError("Invalid year selected.")
 
 
@@ -154,9 +155,7 @@ class ListForm(FormHelper, FlaskForm):
         super().__init__(*args, **kwargs)
         self.user_id = user_id
         # self.list_type.data = "all"
-        self.year.choices = sorted(
-            list(set((field.year for field in Field.query.all()))), reverse=True
-        )
+        self.year.choices = year_choices(user_id)
         fields = (
             Field.query.join(BaseField)
             .filter(BaseField.user_id == current_user.id, Field.year == current_user.year)
@@ -174,10 +173,7 @@ class ListForm(FormHelper, FlaskForm):
             Crop.query.join(Cultivation).join(Field).filter(Field.year == current_user.year).all()
         )
         self.crops.choices = sorted([(crop.id, crop.name) for crop in crops], key=lambda x: x[1])
-        fertilizers = Fertilizer.query.filter(
-            Fertilizer.user_id == current_user.id, Fertilizer.year.in_([current_user.year, 0])
-        ).all()
-        self.fertilizers.choices = [(fertilizer.id, fertilizer.name) for fertilizer in fertilizers]
+        self.fertilizers.choices = fertilizer_choices(user_id, years=[current_user.year, 0])
 
     def update_choices(self):
         if self.year.data:
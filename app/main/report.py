@@ -0,0 +1,159 @@
+"""
+Printable documentation of the fertilizer demand calculation of all fields of a year.
+
+The report is streamed field by field. Fields are batch loaded and rendered in chunks,
+with `REPORT_WORKERS` the chunks are rendered in a process pool while the finished ones
+are already sent. The pool is started with the first report and reused by later ones.
+Templates are looked up once per renderer and soil tables, which are the same for all
+partitions of a base field, are rendered once.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from threading import Lock
+from types import SimpleNamespace
+
+from flask import current_app
+from loguru import logger
+from markupsafe import Markup
+from sqlalchemy import select
+
+import app.database.model as db
+from app.extensions import db as _db
+from app.model import FieldLoader, guidelines, soil_classes
+from app.model.field import Field
+
+# field-years that are loaded and rendered at a time
+REPORT_CHUNK_SIZE = 20
+
+_executors: dict[tuple[str, int], ProcessPoolExecutor] = {}
+_lock = Lock()
+
+
+def report_field_ids(user_id: int, year: int) -> list[int]:
+    """Ids of all field-years of the user in `year`, in the order of the report."""
+    query = (
+        select(db.Field.id)
+        .join(db.BaseField)
+        .where(db.BaseField.user_id == user_id, db.Field.year == year)
+        .order_by(db.BaseField.prefix, db.BaseField.suffix, db.Field.partition)
+    )
+    return _db.session.execute(query).scalars().all()
+
+
+def render_report(
+    field_ids: list[int],
+    workers: int = 0,
+    chunk_size: int = REPORT_CHUNK_SIZE,
+    *,
+    guidelines: guidelines = guidelines,
+) -> Iterator[Markup]:
+    """
+    Rendered section of every field-year, in the order of `field_ids`. With `workers` the
+    chunks are rendered in a process pool, `0` renders them in this process.
+    """
+    chunks = [field_ids[i : i + chunk_size] for i in range(0, len(field_ids), chunk_size)]
+    if not workers or len(chunks) < 2:
+        renderer = _ReportRenderer(guidelines)
+        for chunk in chunks:
+            yield from renderer.render(chunk)
+        return
+
+    key = (current_app.config["SQLALCHEMY_DATABASE_URI"], workers)
+    # results come back in order, a chunk is sent as soon as it and all before are done
+    results = _get_executor(*key).map(_render_chunk, chunks)
+    try:
+        for sections in results:
+            yield from (Markup(section) for section in sections)
+    except BrokenProcessPool:
+        # a worker died, the next report starts a new pool
+        with _lock:
+            _executors.pop(key, None)
+        raise
+    finally:
+        # cancels the chunks that aren't rendered yet, e.g. if the client disconnected
+        results.close()
+
+
+def shutdown_report_pools(wait: bool = True) -> None:
+    """Stop the worker processes of the reports, the next report starts them again."""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class _ReportRenderer:
+    """Renders the sections of many fields with shared templates and fragments."""
+
+    def __init__(self, guidelines: guidelines = guidelines):
+        self._loader = FieldLoader(guidelines=guidelines)
+        self._soil_classes = partial(soil_classes, guidelines=guidelines)
+        self._section = current_app.jinja_env.get_template("report/_report_field.html")
+        self._soil = current_app.jinja_env.get_template("field/_field_soil.html")
+        self._soil_tables: dict[tuple, Markup] = {}
+
+    def render(self, field_ids: list[int]) -> Iterator[Markup]:
+        for db_field, field in self._loader.load_rows(field_ids):
+            yield self._render_field(db_field, field)
+
+    def _render_field(self, db_field: db.Field, field: Field) -> Markup:
+        try:
+            field.create_balances()
+            total = field.total_balance()
+        except Exception as e:  # noqa: BLE001
+            logger.warning(f"Report of field_id={field.id} failed: {e!r}")
+            field, total = None, None
+        return Markup(
+            self._section.render(
+                db_field=db_field, field=field, total=total, soil_table=self._soil_table(db_field)
+            )
+        )
+
+    def _soil_table(self, db_field: db.Field) -> Markup:
+        sample_id = db_field.soil.sample_id if db_field.soil else None
+        key = (db_field.base_id, db_field.year, db_field.field_type, sample_id)
+        if key not in self._soil_tables:
+            self._soil_tables[key] = Markup(
+                self._soil.render(
+                    db=SimpleNamespace(field=db_field), soil_classes=self._soil_classes
+                )
+            )
+        return self._soil_tables[key]
+
+
+def _get_executor(database_uri: str, workers: int) -> ProcessPoolExecutor:
+    with _lock:
+        if (database_uri, workers) not in _executors:
+            _executors[(database_uri, workers)] = ProcessPoolExecutor(
+                workers, initializer=_init_worker, initargs=(database_uri,)
+            )
+        return _executors[(database_uri, workers)]
+
+
+def _init_worker(database_uri: str) -> None:
+    """Create an app with its own database engine in every worker process."""
+    from app.app import create_app
+    from config import Config
+
+    global _worker_context, _worker_renderer
+    # the app of the main process logs to the files
+    config = type(
+        "WorkerConfig", (Config,), {"SQLALCHEMY_DATABASE_URI": database_uri, "WORKER": True}
+    )
+    # a request context to build the urls of the templates
+    _worker_context = create_app(config).test_request_context()
+    _worker_context.push()
+    _worker_renderer = _ReportRenderer()
+
+
+def _render_chunk(field_ids: list[int]) -> list[str]:
+    sections = [str(section) for section in _worker_renderer.render(field_ids)]
+    # ends the read transaction, the next chunk sees later commits
+    _db.session.rollback()
+    return sections
@@ -1,19 +1,57 @@
+import hashlib
+import itertools
 import re
 from dataclasses import asdict
-from functools import cmp_to_key
-
-from flask import flash, jsonify, make_response, redirect, render_template, request, url_for
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from flask import (
+    Response,
+    current_app,
+    flash,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    stream_template,
+    stream_with_context,
+    url_for,
+)
 from flask_login import current_user, login_required
+from flask_wtf.csrf import generate_csrf
+from loguru import logger
+from sqlalchemy import select
 
 from app.api.edit_forms import EditFieldForm
 from app.api.forms import FieldForm
 from app.database import BaseField, User
 from app.database.model import Cultivation, Fertilization, Field
-from app.database.types import MeasureType
+from app.database.types import CultivationType, CutTiming, FertClass, MeasureType
 from app.extensions import db, login
 from app.main import bp
 from app.main.forms import DemandForm, EditProfileForm, ListForm, YearForm
-from app.model import create_field
+from app.main.report import render_report, report_field_ids
+from app.model import (
+    EXPORT_COLUMNS,
+    Crop,
+    FieldLoader,
+    Scenario,
+    bulk_fertilize,
+    check_blocking_periods,
+    check_compliance,
+    compare_demand_options,
+    create_field,
+    demand_grid,
+    export_csv,
+    field_demand_grids,
+    get_version,
+    grid_range,
+    nutrient_comparison,
+    plan_manure_distribution,
+    plan_rotations,
+    propose_fertilization,
+)
 
 current_user: User
 
@@ -152,15 +190,22 @@ def field(id):
             field.create_balances()
         form = YearForm()
         demand_form = DemandForm()
-        return render_template(
-            "field.html",
-            title=db_field.base_field.name,
-            db_field=db_field,
-            sidebar=sidebar,
-            form=form,
-            demand_form=demand_form,
-            field=field,
+        response = make_response(
+            render_template(
+                "field.html",
+                title=db_field.base_field.name,
+                db_field=db_field,
+                sidebar=sidebar,
+                form=form,
+                demand_form=demand_form,
+                field=field,
+                fertilizers=current_user.get_fertilizers(),
+                measures=list(MeasureType),
+            )
         )
+        # the service worker replaces its cached copy when the version changes
+        response.headers["X-Field-Version"] = str(get_version(current_user.id))
+        return response
     else:
         return jsonify("Invalid request."), 503
 
@@ -169,7 +214,163 @@ def field(id):
 @login_required
 def field_data(id):
     field = create_field(id)
-    return asdict(field.total_balance())
+    balance = field.total_balance()
+    response = make_response(asdict(balance))
+    response.headers["X-Field-Version"] = str(get_version(current_user.id))
+    return response
+
+
+@bp.route("/fields/data", methods=["GET"])
+@login_required
+def fields_data():
+    year = request.args.get("year", current_user.year, type=int)
+    try:
+        ids = [int(id) for value in request.args.getlist("ids") for id in value.split(",") if id]
+    except ValueError:
+        return jsonify("Invalid field ids."), 400
+    query = (
+        select(Field.id)
+        .join(BaseField)
+        .where(BaseField.user_id == current_user.id, Field.year == year)
+        .order_by(BaseField.prefix, BaseField.suffix, Field.partition)
+    )
+    if ids:
+        query = query.where(Field.id.in_(ids))
+    field_ids = db.session.execute(query).scalars().all()
+
+    def generate():
+        # balances are streamed as a JSON array, one field after another
+        loader = FieldLoader()
+        separator = "["
+        for field in loader.iter_load(field_ids):
+            data = {"id": field.id, "name": field.name, "partition": field.partition}
+            try:
+                data |= asdict(field.total_balance())
+            except Exception as e:  # noqa: BLE001
+                logger.warning(f"Balance of field_id={field.id} failed: {e!r}")
+                data["error"] = "Balance failed."
+            yield separator + current_app.json.dumps(data)
+            separator = ","
+        yield "[]" if separator == "[" else "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+@bp.route("/export/<kind>.csv", methods=["GET"])
+@login_required
+def export(kind):
+    years = request.args.getlist("year", type=int) or [current_user.year]
+    if kind not in EXPORT_COLUMNS:
+        return jsonify(f"Unknown export: {kind}"), 404
+    lines = export_csv(kind, current_user.id, years)
+    # BOM for Excel to read the file as UTF-8
+    body = itertools.chain(["\ufeff"], lines)
+    filename = f"{kind}_{'_'.join(str(year) for year in sorted(years))}.csv"
+    return Response(
+        stream_with_context(body),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@bp.route("/field/<id>/scenario", methods=["POST"])
+@login_required
+def field_scenario(id):
+    db_field = Field.query.filter_by(id=id).first_or_404()
+    if db_field.base_field.user_id != current_user.id:
+        return jsonify("Invalid request."), 403
+    scenario = Scenario(create_field(id))
+    error = None
+    try:
+        apply_scenario(scenario, request.form)
+    except (ValueError, KeyError, IndexError, InvalidOperation) as e:
+        error = str(e) or "Invalid scenario."
+    # the scenario is discarded, nothing of it is committed
+    return render_template("field/_field_scenario.html", scenario=scenario, error=error)
+
+
+def apply_scenario(scenario: Scenario, form) -> None:
+    """
+    Apply the scenario form: removed fertilizations by their index, changed yields per
+    cultivation type and added fertilizations as parallel lists.
+    """
+    for index in sorted(form.getlist("remove", type=int), reverse=True):
+        scenario.remove_fertilization(index)
+    for cultivation in list(scenario.field.cultivations):
+        crop_yield = form.get(f"yield_{cultivation.cultivation_type.name}")
+        if crop_yield:
+            scenario.modify_cultivation(
+                cultivation.cultivation_type, crop_yield=Decimal(crop_yield)
+            )
+    for fertilizer_id, amount, measure, cultivation_type in zip(
+        form.getlist("fertilizer_id"),
+        form.getlist("amount"),
+        form.getlist("measure"),
+        form.getlist("cultivation_type"),
+    ):
+        if not fertilizer_id or not amount:
+            continue
+        scenario.add_fertilization(
+            int(fertilizer_id),
+            Decimal(amount),
+            MeasureType[measure],
+            CultivationType[cultivation_type],
+        )
+
+
+@bp.route("/field/<id>/proposal", methods=["GET"])
+@login_required
+def field_proposal(id):
+    db_field = Field.query.filter_by(id=id).first_or_404()
+    if db_field.base_field.user_id != current_user.id:
+        return jsonify("Invalid request."), 403
+    try:
+        cultivation_type = CultivationType[request.args.get("cultivation_type", "main_crop")]
+        proposal = propose_fertilization(create_field(id), cultivation_type)
+    except (KeyError, ValueError) as e:
+        return jsonify(str(e)), 400
+    if request.headers.get("HX-Request"):
+        return render_template("field/_field_proposal.html", proposal=proposal)
+    return jsonify(proposal.to_dict())
+
+
+@bp.route("/field/<id>/demand_options", methods=["GET"])
+@login_required
+def field_demand_options(id):
+    db_field = Field.query.filter_by(id=id).first_or_404()
+    if db_field.base_field.user_id != current_user.id:
+        return jsonify("Invalid request."), 403
+    results = compare_demand_options(create_field(id))
+    if request.headers.get("HX-Request"):
+        return render_template("field/_field_demand_options.html", results=results)
+    return jsonify([result.to_dict() for result in results])
+
+
+@bp.route("/field/<id>/demand_grid", methods=["GET"])
+@login_required
+def field_demand_grid(id):
+    db_field = Field.query.filter_by(id=id).first_or_404()
+    if db_field.base_field.user_id != current_user.id:
+        return jsonify("Invalid request."), 403
+    try:
+        points, spread, proteins = grid_args()
+        grids = field_demand_grids(create_field(id), points, spread, proteins)
+    except ValueError as e:
+        return jsonify(str(e)), 400
+    return jsonify({name: grid.to_dict() for name, grid in grids.items()})
+
+
+def grid_args() -> tuple[int, Decimal, list[Decimal] | None]:
+    """Grid points, relative yield spread and protein contents of the query string."""
+    points = request.args.get("points", 11, type=int)
+    try:
+        spread = Decimal(request.args.get("spread", "0.5"))
+        proteins = [Decimal(value) for value in request.args.getlist("protein")] or None
+    except InvalidOperation:
+        raise ValueError("Invalid spread or protein.")
+    if not all(value.is_finite() for value in (spread, *(proteins or []))) or spread < 0:
+        raise ValueError("Invalid spread or protein.")
+    return points, spread, proteins
 
 
 @bp.route("/crop", methods=["GET", "POST"])
@@ -179,10 +380,26 @@ def crop():
     return render_template("crops.html", title="Crops", crops=crops)
 
 
+@bp.route("/crop/<int:id>/demand_grid", methods=["GET"])
+@login_required
+def crop_demand_grid(id):
+    crops = current_user.get_crops(id=id)
+    if not crops:
+        return jsonify("Crop not found."), 404
+    crop = Crop(crops[0])
+    try:
+        points, spread, proteins = grid_args()
+        target_yield = Decimal(crop.target_yield or 0)
+        grid = demand_grid(crop, grid_range(target_yield, target_yield * spread, points), proteins)
+    except ValueError as e:
+        return jsonify(str(e)), 400
+    return jsonify(grid.to_dict())
+
+
 @bp.route("/fertilizer", methods=["GET", "POST"])
 @login_required
 def fertilizer():
-    fertilizers = sorted(current_user.get_fertilizers(), key=lambda x: (x.year), reverse=True)
+    fertilizers = sorted(current_user.get_fertilizers(), key=lambda x: x.year, reverse=True)
     return render_template("fertilizers.html", title="Fertilizers", fertilizers=fertilizers)
 
 
@@ -291,9 +508,15 @@ def create_list():
     list.sort(key=lambda x: x.field.base_field.prefix)
     list.sort(key=lambda x: x.cultivation.crop.name)
     list.sort(key=lambda x: x.fertilizer.name)
-    list.sort(key=cmp_to_key(MeasureType.sorting))
+    list.sort(key=MeasureType.sort_key)
     unit = " | ".join(set(entry.fertilizer.unit.value for entry in list))
-    return render_template("_lists_table.html", list=list, unit=unit)
+    blocked = {
+        violation.fertilization_id: violation
+        for violation in check_blocking_periods(
+            current_user.id, form.year.data, field_ids=form.fields.data or None
+        )
+    }
+    return render_template("_lists_table.html", list=list, unit=unit, blocked=blocked)
 
 
 @bp.route("/lists/form", methods=["POST"])
@@ -308,6 +531,145 @@ def update_listform():
     return response
 
 
+@bp.route("/nutrient_comparison", methods=["GET"])
+@login_required
+def comparison():
+    year = request.args.get("year", current_user.year, type=int)
+    comparison = nutrient_comparison(current_user.id, year)
+    # persist the farm balances that were cached on the way
+    db.session.commit()
+    compliance = check_compliance(current_user.id, year)
+    return render_template(
+        "nutrient_comparison.html",
+        title="Nutrient comparison",
+        comparison=comparison,
+        compliance=compliance,
+    )
+
+
+@bp.route("/nutrient_comparison/data", methods=["GET"])
+@login_required
+def comparison_data():
+    year = request.args.get("year", current_user.year, type=int)
+    comparison = nutrient_comparison(current_user.id, year)
+    db.session.commit()
+    return jsonify(comparison.to_dict())
+
+
+@bp.route("/compliance", methods=["GET"])
+@login_required
+def compliance():
+    year = request.args.get("year", current_user.year, type=int)
+    return jsonify(check_compliance(current_user.id, year).to_dict())
+
+
+@bp.route("/manure_distribution", methods=["GET", "POST"])
+@login_required
+def manure_distribution():
+    year = request.values.get("year", current_user.year, type=int)
+    fertilizers = current_user.get_fertilizers(fert_class=FertClass.organic, year=year)
+    if request.method == "GET":
+        return render_template(
+            "manure_distribution.html",
+            title="Manure distribution",
+            year=year,
+            fertilizers=fertilizers,
+        )
+    try:
+        volumes = {
+            fertilizer.id: Decimal(volume)
+            for fertilizer in fertilizers
+            if (volume := request.form.get(f"volume_{fertilizer.id}"))
+        }
+        plan = plan_manure_distribution(current_user.id, year, volumes)
+    except (ValueError, InvalidOperation) as e:
+        return jsonify(str(e) or "Invalid volume."), 400
+    if request.headers.get("HX-Request"):
+        return render_template("_manure_distribution.html", plan=plan, fertilizers=fertilizers)
+    return jsonify(plan.to_dict())
+
+
+@bp.route("/fertilization/bulk", methods=["GET", "POST"])
+@login_required
+def bulk_fertilization():
+    year = request.values.get("year", current_user.year, type=int)
+    fields = (
+        current_user.get_fields(year=year)
+        .order_by(BaseField.prefix, BaseField.suffix, Field.partition)
+        .all()
+    )
+    if request.method == "GET":
+        fertilizers = [
+            fertilizer
+            for fertilizer in current_user.get_fertilizers()
+            if fertilizer.fert_class is FertClass.mineral or fertilizer.year == year
+        ]
+        return render_template(
+            "bulk_fertilization.html",
+            title="Bulk fertilization",
+            year=year,
+            fields=fields,
+            fertilizers=fertilizers,
+            measures=list(MeasureType),
+            cultivation_types=list(CultivationType),
+            cut_timings=list(CutTiming),
+        )
+    try:
+        field_ids = [
+            int(id) for value in request.form.getlist("field_ids") for id in value.split(",") if id
+        ]
+    except ValueError:
+        return jsonify("Invalid field ids."), 400
+    if not field_ids:
+        return jsonify("No fields selected."), 400
+    try:
+        report = bulk_fertilize(
+            current_user.id,
+            year,
+            request.form.get("fertilizer_id", type=int),
+            MeasureType[request.form.get("measure", "")],
+            Decimal(request.form.get("amount", "")),
+            field_ids=field_ids,
+            cultivation_types=[
+                CultivationType[name] for name in request.form.getlist("cultivation_types")
+            ]
+            or [CultivationType.main_crop],
+            month=request.form.get("month", type=int),
+            cut_timing=CutTiming[request.form.get("cut_timing") or CutTiming.none.name],
+        )
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(str(e)), 400
+    except (KeyError, InvalidOperation):
+        db.session.rollback()
+        return jsonify("Invalid fertilization."), 400
+    db.session.commit()
+    if request.headers.get("HX-Request"):
+        names = {field.id: field.base_field.name for field in fields}
+        return render_template("_bulk_fertilization.html", report=report, names=names)
+    return jsonify(report.to_dict()), 201 if report.fertilization_ids else 400
+
+
+@bp.route("/rotation", methods=["GET"])
+@login_required
+def rotation():
+    year = request.args.get("year", current_user.year + 1, type=int)
+    years = min(max(request.args.get("years", 3, type=int), 1), 5)
+    plans = plan_rotations(current_user.id, year, years)
+    if request.args.get("format") == "json":
+        return jsonify([plan.to_dict() for plan in plans])
+    return render_template("rotation.html", title="Rotation", year=year, years=years, plans=plans)
+
+
+@bp.route("/report", methods=["GET"])
+@login_required
+def report():
+    year = request.args.get("year", current_user.year, type=int)
+    field_ids = report_field_ids(current_user.id, year)
+    sections = render_report(field_ids, workers=current_app.config["REPORT_WORKERS"])
+    return stream_template("report.html", title="Report", year=year, sections=sections)
+
+
 @bp.route("/sperrzeiten")
 def sperrzeiten():
     return redirect(url_for("static", filename="/docs/Sperrzeiten.pdf"))
@@ -321,3 +683,42 @@ def hinweise():
 @bp.route("/richtwerte")
 def richtwerte():
     return redirect(url_for("static", filename="/docs/Richtwerte.pdf"))
+
+
+# static files that the service worker caches for offline use
+PRECACHED_STATIC = ("css", "js", "img", "htmx.org@2.0.8", "multiselect-dropdown", "manifest.json")
+PRECACHED_BOOTSTRAP = ("css/bootstrap.min.css", "umd/popper.min.js", "js/bootstrap.min.js")
+
+
+@bp.route("/sw.js", methods=["GET"])
+def service_worker():
+    """Service worker, served from the root to control all pages of the app."""
+    static = Path(current_app.static_folder)
+    files = sorted(
+        path
+        for name in PRECACHED_STATIC
+        for path in ([static / name] if (static / name).is_file() else (static / name).rglob("*"))
+        if path.is_file()
+    )
+    # new or changed assets give a new version and replace the whole precache
+    version = hashlib.sha1()
+    assets = []
+    for path in files:
+        stat = path.stat()
+        filename = path.relative_to(static).as_posix()
+        version.update(f"{filename}:{stat.st_mtime_ns}:{stat.st_size}".encode())
+        assets.append(url_for("static", filename=filename))
+    assets += [url_for("bootstrap.static", filename=name) for name in PRECACHED_BOOTSTRAP]
+    response = make_response(
+        render_template("sw.js", version=version.hexdigest()[:12], assets=assets)
+    )
+    response.headers["Content-Type"] = "application/javascript"
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@bp.route("/csrf_token", methods=["GET"])
+@login_required
+def csrf_token():
+    """Fresh CSRF token, for cached pages and requests replayed by the service worker."""
+    return jsonify(generate_csrf())
@@ -1,28 +1,119 @@
 from . import guidelines
 from .balance import Balance
+from .blocking_period import (
+    BlockingPeriod,
+    BlockingViolation,
+    check_blocking_periods,
+    get_blocking_period,
+)
+from .bulk_fertilization import BulkFertilizationReport, bulk_fertilize
+from .compliance import (
+    ComplianceReport,
+    PlannedFertilization,
+    Violation,
+    check_compliance,
+    farm_organic_n,
+    is_fall_forage,
+    max_fall_amount,
+)
 from .crop import Crop
 from .cultivation import CatchCrop, Cultivation, MainCrop, SecondCrop, create_cultivation
+from .demand_option import OptionBalance, compare_demand_options
+from .export import EXPORT_COLUMNS, export_csv, export_rows
+from .farm_balance import NutrientComparison, get_farm_balances, nutrient_comparison
 from .fertilization import Fertilization
 from .fertilizer import Fertilizer, Mineral, Organic, create_fertilizer
-from .field import Field, create_field
+from .field import Field, FieldLoader, create_field
+from .manure import ManureAllocation, ManurePlan, plan_manure_distribution
+from .optimizer import FertilizationProposal, FertilizerAmount, propose_fertilization
+from .rollover import RolloverReport, roll_over
+from .rotation import RotationPlan, RotationStep, plan_rotations
+from .saldo import RecomputeReport, get_saldo_field_ids, recompute_saldos
+from .scenario import Scenario
+from .sensitivity import DemandGrid, demand_grid, field_demand_grids, grid_range
 from .soil import Soil, create_soil_sample
+from .soil_import import SoilImportError, SoilImportReport, import_soil_samples
+from .soil_index import (
+    classify_soil_samples,
+    get_fields_by_soil_class,
+    get_soil_index,
+    reclassify_soil_samples,
+    soil_classes,
+    update_soil_index,
+)
+from .sync import ChangeSet, TableChanges, compact_changes, get_changes, get_version
 
 __all__ = (
     "guidelines",
     "Balance",
+    "BlockingPeriod",
+    "BlockingViolation",
+    "check_blocking_periods",
+    "get_blocking_period",
+    "BulkFertilizationReport",
+    "bulk_fertilize",
+    "ComplianceReport",
+    "PlannedFertilization",
+    "Violation",
+    "check_compliance",
+    "farm_organic_n",
+    "is_fall_forage",
+    "max_fall_amount",
     "Crop",
+    "OptionBalance",
+    "compare_demand_options",
     "CatchCrop",
     "Cultivation",
     "MainCrop",
     "SecondCrop",
     "create_cultivation",
+    "EXPORT_COLUMNS",
+    "export_csv",
+    "export_rows",
+    "NutrientComparison",
+    "get_farm_balances",
+    "nutrient_comparison",
     "Fertilization",
     "Fertilizer",
     "Mineral",
     "Organic",
     "create_fertilizer",
     "Field",
+    "FieldLoader",
     "create_field",
+    "ManureAllocation",
+    "ManurePlan",
+    "plan_manure_distribution",
+    "FertilizationProposal",
+    "FertilizerAmount",
+    "propose_fertilization",
+    "RotationPlan",
+    "RotationStep",
+    "plan_rotations",
+    "RecomputeReport",
+    "get_saldo_field_ids",
+    "recompute_saldos",
+    "Scenario",
+    "DemandGrid",
+    "demand_grid",
+    "field_demand_grids",
+    "grid_range",
     "Soil",
     "create_soil_sample",
+    "SoilImportError",
+    "SoilImportReport",
+    "import_soil_samples",
+    "classify_soil_samples",
+    "get_fields_by_soil_class",
+    "get_soil_index",
+    "reclassify_soil_samples",
+    "soil_classes",
+    "update_soil_index",
+    "RolloverReport",
+    "roll_over",
+    "ChangeSet",
+    "TableChanges",
+    "compact_changes",
+    "get_changes",
+    "get_version",
 )
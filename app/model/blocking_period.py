@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+from calendar import monthrange
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import cache
+
+from sqlalchemy import select
+
+import app.database.model as db
+from app.database.types import CropType, FertType, FieldType
+from app.extensions import db as _db
+
+N_FERT_TYPES = (
+    FertType.org_digestate,
+    FertType.org_slurry,
+    FertType.org_dry_manure,
+    FertType.n,
+    FertType.n_k,
+    FertType.n_p,
+    FertType.n_s,
+    FertType.n_p_k,
+    FertType.n_p_k_s,
+)
+SOLID_FERT_TYPES = (FertType.org_manure, FertType.org_compost)
+P_FERT_TYPES = (FertType.p, FertType.p_k, FertType.n_p, FertType.n_p_k, FertType.n_p_k_s)
+CROPLAND_TYPES = (FieldType.cropland, FieldType.fallow_cropland)
+GRASSLAND_TYPES = (FieldType.grassland, FieldType.fallow_grassland)
+# perennial field forage on cropland is blocked like grassland
+FIELD_FORAGE_TYPES = (
+    CropType.alfalfa,
+    CropType.alfalfa_grass,
+    CropType.clover,
+    CropType.clover_grass,
+    CropType.field_grass,
+)
+
+
+@dataclass(frozen=True)
+class BlockingPeriod:
+    """
+    Period in which fertilizers of `fert_types` must not be applied on `field_types`,
+    `red_region` limits it to fields in or out of red regions.
+    """
+
+    start: tuple[int, int]
+    end: tuple[int, int]
+    fert_types: tuple[FertType, ...]
+    field_types: tuple[FieldType, ...]
+    red_region: bool | None = None
+
+    @property
+    def months(self) -> int:
+        """Bitmask of the months touched by the period, bit 0 is January."""
+        start, end = self.start[0], self.end[0]
+        if start <= end:
+            months = range(start, end + 1)
+        else:
+            months = [*range(start, 13), *range(1, end + 1)]
+        return sum(1 << (month - 1) for month in months)
+
+    @property
+    def full_months(self) -> int:
+        """Bitmask of the months covered by the period from their first to their last day."""
+        months = self.months
+        if self.start[1] > 1:
+            months &= ~(1 << (self.start[0] - 1))
+        if self.end[1] < monthrange(2001, self.end[0])[1]:
+            months &= ~(1 << (self.end[0] - 1))
+        return months
+
+    def covers(self, month: int) -> bool:
+        """Whether the whole month is within the period."""
+        return bool(self.full_months & 1 << (month - 1))
+
+    @property
+    def label(self) -> str:
+        return f"{self.start[1]:02}.{self.start[0]:02}.-{self.end[1]:02}.{self.end[0]:02}."
+
+
+# simplified to the latest begin of the periods of the DüV, see `Sperrzeiten.pdf`
+BLOCKING_PERIODS = (
+    BlockingPeriod((10, 1), (1, 31), N_FERT_TYPES, CROPLAND_TYPES),
+    BlockingPeriod((11, 1), (1, 31), N_FERT_TYPES, GRASSLAND_TYPES, red_region=False),
+    BlockingPeriod((10, 1), (1, 31), N_FERT_TYPES, GRASSLAND_TYPES, red_region=True),
+    BlockingPeriod(
+        (12, 1), (1, 15), SOLID_FERT_TYPES, CROPLAND_TYPES + GRASSLAND_TYPES, red_region=False
+    ),
+    BlockingPeriod(
+        (11, 1), (1, 31), SOLID_FERT_TYPES, CROPLAND_TYPES + GRASSLAND_TYPES, red_region=True
+    ),
+    BlockingPeriod((12, 1), (1, 15), P_FERT_TYPES, CROPLAND_TYPES + GRASSLAND_TYPES),
+)
+
+BlockingKey = tuple[FertType, FieldType, bool]
+
+
+@dataclass
+class BlockingViolation:
+    """Fertilization within a blocking period."""
+
+    fertilization_id: int
+    field_id: int
+    name: str
+    fertilizer: str
+    month: int
+    period: BlockingPeriod
+
+    @property
+    def message(self) -> str:
+        return (
+            f"{self.fertilizer} on {self.name} in month {self.month} "
+            f"is within the blocking period {self.period.label}"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "fertilization_id": self.fertilization_id,
+            "field_id": self.field_id,
+            "month": self.month,
+            "period": self.period.label,
+            "message": self.message,
+        }
+
+
+@cache
+def compile_blocking_periods(
+    periods: tuple[BlockingPeriod, ...] = BLOCKING_PERIODS,
+) -> dict[BlockingKey, tuple[int, tuple[BlockingPeriod, ...]]]:
+    """
+    Combine the blocking periods into one month bitmask per fertilizer type, field type
+    and red region, together with the periods that contribute to it.
+    """
+    masks: dict[BlockingKey, tuple[int, tuple[BlockingPeriod, ...]]] = {}
+    for period in periods:
+        red_regions = (True, False) if period.red_region is None else (period.red_region,)
+        for key in (
+            (fert_type, field_type, red_region)
+            for fert_type in period.fert_types
+            for field_type in period.field_types
+            for red_region in red_regions
+        ):
+            mask, key_periods = masks.get(key, (0, ()))
+            masks[key] = (mask | period.months, (*key_periods, period))
+    return masks
+
+
+def get_blocking_period(
+    fert_type: FertType,
+    field_type: FieldType,
+    red_region: bool,
+    crop_type: CropType | None,
+    month: int | None,
+    partial: bool = False,
+) -> BlockingPeriod | None:
+    """
+    Blocking period that covers the whole `month`, `None` if an application in it is
+    allowed. Applications are only stored with their month, with `partial` a period that
+    blocks some days of the month is returned as well.
+    """
+    if month is None:
+        return None
+    if field_type in CROPLAND_TYPES and crop_type in FIELD_FORAGE_TYPES:
+        field_type = FieldType.grassland
+    mask, periods = compile_blocking_periods().get(
+        (fert_type, field_type, bool(red_region)), (0, ())
+    )
+    bit = 1 << (month - 1)
+    if not mask & bit:
+        return None
+    periods = [period for period in periods if period.months & bit]
+    covering = next((period for period in periods if period.covers(month)), None)
+    return covering if covering is not None or not partial else periods[0]
+
+
+def check_blocking_periods(
+    user_id: int, year: int, field_ids: Iterable[int] | None = None
+) -> list[BlockingViolation]:
+    """
+    Check all fertilizations of a year against the blocking periods, loaded in one query
+    and matched against the precompiled month bitmasks. Fertilizations without month
+    are skipped, the day isn't stored, so months that are blocked in part aren't reported.
+
+    :param field_ids:
+        Fields to check, all fields of the year by default.
+    """
+    query = (
+        select(
+            db.Fertilization.id,
+            db.Fertilization.month,
+            db.Field.id,
+            db.Field.field_type,
+            db.Field.red_region,
+            db.BaseField.name,
+            db.Fertilizer.name,
+            db.Fertilizer.fert_type,
+            db.Crop.crop_type,
+        )
+        .join(db.Field, db.Fertilization.field_id == db.Field.id)
+        .join(db.BaseField)
+        .join(db.Fertilizer, db.Fertilization.fertilizer_id == db.Fertilizer.id)
+        .outerjoin(db.Cultivation, db.Fertilization.cultivation_id == db.Cultivation.id)
+        .outerjoin(db.Crop, db.Cultivation.crop_id == db.Crop.id)
+        .where(
+            db.BaseField.user_id == user_id,
+            db.Field.year == year,
+            db.Fertilization.month.is_not(None),
+        )
+        .order_by(db.Fertilization.id)
+    )
+    if field_ids is not None:
+        query = query.where(db.Field.id.in_(field_ids))
+
+    violations = []
+    for (
+        id,
+        month,
+        field_id,
+        field_type,
+        red_region,
+        name,
+        fertilizer,
+        fert_type,
+        crop_type,
+    ) in _db.session.execute(query):
+        period = get_blocking_period(fert_type, field_type, red_region, crop_type, month)
+        if period is not None:
+            violations.append(
+                BlockingViolation(
+                    fertilization_id=id,
+                    field_id=field_id,
+                    name=name,
+                    fertilizer=fertilizer,
+                    month=month,
+                    period=period,
+                )
+            )
+    return violations
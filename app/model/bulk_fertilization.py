@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from sqlalchemy import and_, insert, select
+
+import app.database.model as db
+from app.database.events import invalidate_field_years, log_rows
+from app.database.types import (
+    ChangeType,
+    CultivationType,
+    CutTiming,
+    FertClass,
+    FertType,
+    MeasureType,
+    MineralMeasureType,
+)
+from app.extensions import db as _db
+
+from . import guidelines
+from .blocking_period import get_blocking_period
+from .compliance import Violation, check_compliance, is_fall_forage, max_fall_amount
+
+
+@dataclass
+class BulkFertilizationReport:
+    """
+    Result of `bulk_fertilize`.
+    `errors` holds the field id and the reason of every skipped cultivation, `warnings`
+    the blocking periods that cover the month of a fertilization in part and `violations`
+    the organic nitrogen limits that the fertilized fields exceed afterwards.
+    """
+
+    fertilization_ids: list[int] = field(default_factory=list)
+    errors: list[tuple[int, str]] = field(default_factory=list)
+    warnings: list[tuple[int, str]] = field(default_factory=list)
+    violations: list[Violation] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "created": len(self.fertilization_ids),
+            "fertilizations": self.fertilization_ids,
+            "errors": [{"field_id": field_id, "error": error} for field_id, error in self.errors],
+            "warnings": [
+                {"field_id": field_id, "warning": warning} for field_id, warning in self.warnings
+            ],
+            "violations": [violation.to_dict() for violation in self.violations],
+        }
+
+
+def bulk_fertilize(
+    user_id: int,
+    year: int,
+    fertilizer_id: int,
+    measure: MeasureType,
+    amount: Decimal,
+    field_ids: Iterable[int] | None = None,
+    cultivation_types: Iterable[CultivationType] = (CultivationType.main_crop,),
+    month: int | None = None,
+    cut_timing: CutTiming = CutTiming.none,
+    *,
+    guidelines: guidelines = guidelines,
+) -> BulkFertilizationReport:
+    """
+    Add the same fertilization to the cultivations of `cultivation_types` of many fields,
+    the checks of the `FertilizationForm` are applied to each of them. Fields, cultivations
+    and crops are authorized and read with one query and all fertilizations are inserted
+    with one statement. The balance caches of the fields are invalidated and the
+    `ChangeLog` is written once, invalid cultivations are skipped. Nothing is committed.
+
+    :param field_ids:
+        Fields of the user in `year`, all fields of the year by default.
+    :param month:
+        Month of the application, required for organic fertilizers only.
+    :raises ValueError:
+        Invalid fertilizer, measure, amount or month, or fields that aren't the user's.
+    """
+    if amount is None or amount <= 0:
+        raise ValueError("Amount has to be positive.")
+    fertilizer = db.Fertilizer.query.filter_by(id=fertilizer_id, user_id=user_id).one_or_none()
+    if fertilizer is None:
+        raise ValueError("Invalid fertilizer selected.")
+    if fertilizer.fert_type.name not in FertType.from_measure(measure)._member_names_:
+        raise ValueError(f"{fertilizer.name} can't be used for {measure.value}.")
+    if fertilizer.fert_class is FertClass.organic:
+        if fertilizer.year != year:
+            raise ValueError(f"{fertilizer.name} isn't available in {year}.")
+        if month is None or not 1 <= month <= 12:
+            raise ValueError("Organic fertilizations need a month.")
+    else:
+        month = None
+
+    cultivation_types = list(cultivation_types)
+    query = (
+        select(
+            db.Field.id,
+            db.Field.base_id,
+            db.Field.field_type,
+            db.Field.red_region,
+            db.Cultivation.id,
+            db.Cultivation.cultivation_type,
+            db.Crop.crop_type,
+            db.Crop.feedable,
+        )
+        .join(db.BaseField)
+        .outerjoin(
+            db.Cultivation,
+            and_(
+                db.Cultivation.field_id == db.Field.id,
+                db.Cultivation.cultivation_type.in_(cultivation_types),
+            ),
+        )
+        .outerjoin(db.Crop)
+        .where(db.BaseField.user_id == user_id, db.Field.year == year)
+        .order_by(db.BaseField.prefix, db.BaseField.suffix, db.Field.partition)
+    )
+    if field_ids is not None:
+        field_ids = set(field_ids)
+        query = query.where(db.Field.id.in_(field_ids))
+    targets = _db.session.execute(query).all()
+    if field_ids is not None and field_ids - {target[0] for target in targets}:
+        raise ValueError("Invalid field ids.")
+
+    existing = set()
+    if measure.name in MineralMeasureType._member_names_:
+        # mineral measures are unique per cultivation
+        existing = set(
+            _db.session.execute(
+                select(db.Fertilization.cultivation_id).where(
+                    db.Fertilization.cultivation_id.in_([target[4] for target in targets]),
+                    db.Fertilization.measure == measure,
+                )
+            ).scalars()
+        )
+
+    fall = {}
+    if measure is MeasureType.org_fall:
+        fall = _fall_nitrogen({target[0] for target in targets})
+
+    report = BulkFertilizationReport()
+    rows, starts = [], {}
+    for (
+        field_id,
+        base_id,
+        field_type,
+        red_region,
+        cultivation_id,
+        cultivation_type,
+        crop_type,
+        feedable,
+    ) in targets:
+        if cultivation_id is None:
+            if field_ids is not None:
+                report.errors.append((field_id, "No cultivation to fertilize."))
+            continue
+        if cultivation_id in existing:
+            report.errors.append((field_id, "Measure already exists for cultivation."))
+            continue
+        period = get_blocking_period(
+            fertilizer.fert_type, field_type, red_region, crop_type, month, partial=True
+        )
+        if period is not None and period.covers(month):
+            report.errors.append(
+                (field_id, f"{fertilizer.fert_type.value} is blocked from {period.label}.")
+            )
+            continue
+        if measure is MeasureType.org_fall:
+            nitrogen = fall[field_id]
+            forage = is_fall_forage(
+                field_type, cultivation_type, feedable, nitrogen.cultivation_types
+            )
+            max_amount = max_fall_amount(
+                fertilizer.n, fertilizer.nh4, amount, nitrogen.n, nitrogen.nh4, forage, red_region
+            )
+            if max_amount is not None:
+                report.errors.append(
+                    (
+                        field_id,
+                        (
+                            "Maximum amount for fall fertilizations: "
+                            f"{max_amount} {fertilizer.unit.value}/ha"
+                        ),
+                    )
+                )
+                continue
+            # several cultivations of a field share its fall limit
+            nitrogen.n += fertilizer.n * amount
+            nitrogen.nh4 += fertilizer.nh4 * amount
+        if period is not None:
+            report.warnings.append(
+                (
+                    field_id,
+                    (
+                        f"{fertilizer.fert_type.value} is blocked from {period.label}, "
+                        "check the day of the application."
+                    ),
+                )
+            )
+        rows.append(
+            {
+                "field_id": field_id,
+                "cultivation_id": cultivation_id,
+                "fertilizer_id": fertilizer.id,
+                "cut_timing": cut_timing if feedable else CutTiming.none,
+                "measure": measure,
+                "month": month,
+                "amount": amount,
+            }
+        )
+        starts[base_id] = year
+    if not rows:
+        return report
+
+    report.fertilization_ids = list(
+        _db.session.execute(
+            insert(db.Fertilization).returning(db.Fertilization.id, sort_by_parameter_order=True),
+            rows,
+        ).scalars()
+    )
+    connection = _db.session.connection()
+    invalidate_field_years(connection, starts)
+    log_rows(
+        connection,
+        [(user_id, "fertilization", id, ChangeType.created) for id in report.fertilization_ids],
+    )
+    if fertilizer.fert_class is FertClass.organic:
+        report.violations = check_compliance(
+            user_id, year, field_ids={row["field_id"] for row in rows}, guidelines=guidelines
+        ).violations
+    return report
+
+
+@dataclass
+class _FallNitrogen:
+    n: Decimal = Decimal()
+    nh4: Decimal = Decimal()
+    cultivation_types: list[CultivationType] = field(default_factory=list)
+
+
+def _fall_nitrogen(field_ids: set[int]) -> dict[int, _FallNitrogen]:
+    """N and NH4 of the fall fertilizations and the cultivation types of the fields."""
+    fall = {field_id: _FallNitrogen() for field_id in field_ids}
+    query = (
+        select(
+            db.Fertilization.field_id, db.Fertilization.amount, db.Fertilizer.n, db.Fertilizer.nh4
+        )
+        .join(db.Fertilizer)
+        .where(
+            db.Fertilization.field_id.in_(field_ids),
+            db.Fertilization.measure == MeasureType.org_fall,
+        )
+    )
+    for field_id, amount, n, nh4 in _db.session.execute(query):
+        fall[field_id].n += n * amount
+        fall[field_id].nh4 += nh4 * amount
+    query = select(db.Cultivation.field_id, db.Cultivation.cultivation_type).where(
+        db.Cultivation.field_id.in_(field_ids)
+    )
+    for field_id, cultivation_type in _db.session.execute(query):
+        fall[field_id].cultivation_types.append(cultivation_type)
+    return fall
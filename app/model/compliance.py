@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+import app.database.model as db
+from app.database.types import CultivationType, FertClass, FieldType, MeasureType
+from app.extensions import db as _db
+
+from . import guidelines
+from .fertilizer import create_fertilizer
+
+# kg N/ha from organic fertilizers after storage losses, farm average and per red region field
+ORGANIC_N_LIMIT = Decimal(170)
+# kg N/ha of fall fertilizations on red region fields
+RED_REGION_FALL_N_LIMIT = Decimal(60)
+# kg N and NH4/ha of fall fertilizations, more N is allowed on grassland and field forage
+FALL_N_LIMIT = Decimal(60)
+FALL_NH4_LIMIT = Decimal(30)
+FORAGE_FALL_N_LIMIT = Decimal(80)
+
+RULES = {
+    "farm_organic_n": "Organic N of the farm exceeds {limit}: {value} kg/ha",
+    "red_region_organic_n": "Organic N of {name} (red region) exceeds {limit}: {value} kg/ha",
+    "red_region_fall_n": "Fall N of {name} (red region) exceeds {limit}: {value} kg/ha",
+}
+
+
+def is_fall_forage(
+    field_type: FieldType,
+    cultivation_type: CultivationType,
+    feedable: bool,
+    cultivation_types: Iterable[CultivationType],
+) -> bool:
+    """Grassland and field forage as main crop have the higher fall limit."""
+    cultivation_types = set(cultivation_types)
+    return field_type is FieldType.grassland or (
+        cultivation_type is CultivationType.main_crop
+        and bool(feedable)
+        and (
+            CultivationType.second_main_crop not in cultivation_types
+            or CultivationType.second_crop not in cultivation_types
+        )
+    )
+
+
+def max_fall_amount(
+    fertilizer_n: Decimal,
+    fertilizer_nh4: Decimal,
+    amount: Decimal,
+    n: Decimal,
+    nh4: Decimal,
+    forage: bool,
+    red_region: bool,
+) -> Decimal | None:
+    """
+    Largest amount of a fall fertilization that keeps a field within the fall limits,
+    `None` if `amount` is within them.
+
+    :param fertilizer_n:
+        kg N per unit of the fertilizer, `fertilizer_nh4` kg NH4.
+    :param n:
+        kg N/ha of the fall fertilizations of the field so far, `nh4` kg NH4/ha.
+    :param forage:
+        See `is_fall_forage`.
+    """
+    sum_n = n + fertilizer_n * amount
+    sum_nh4 = nh4 + fertilizer_nh4 * amount
+    if sum_n <= FALL_N_LIMIT and sum_nh4 <= FALL_NH4_LIMIT:
+        return None
+    if forage:
+        limit = RED_REGION_FALL_N_LIMIT if red_region else FORAGE_FALL_N_LIMIT
+        if sum_n < limit:
+            return None
+        limits = [(limit, n, fertilizer_n)]
+    else:
+        limits = [(FALL_N_LIMIT, n, fertilizer_n), (FALL_NH4_LIMIT, nh4, fertilizer_nh4)]
+    amounts = [(limit - used) // content for limit, used, content in limits if content]
+    return max(min(amounts, default=Decimal()), Decimal())
+
+
+@dataclass
+class PlannedFertilization:
+    """Fertilization that is not saved yet, e.g. the input of a form."""
+
+    field_id: int
+    fertilizer_id: int
+    amount: Decimal
+    measure: MeasureType
+
+
+@dataclass
+class Violation:
+    """
+    Exceeded limit of a rule in `RULES` with the contributing fertilizations.
+    Farm-wide violations have no `field_id`.
+    """
+
+    rule: str
+    value: Decimal
+    limit: Decimal
+    field_id: int | None = None
+    name: str = ""
+    fertilization_ids: list[int] = field(default_factory=list)
+
+    @property
+    def message(self) -> str:
+        return RULES[self.rule].format(
+            name=self.name, limit=f"{self.limit:.0f}", value=f"{self.value:.0f}"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "rule": self.rule,
+            "field_id": self.field_id,
+            "value": float(self.value),
+            "limit": float(self.limit),
+            "message": self.message,
+            "fertilizations": self.fertilization_ids,
+        }
+
+
+@dataclass
+class ComplianceReport:
+    """Result of the organic nitrogen checks of a year."""
+
+    user_id: int
+    year: int
+    area: Decimal = Decimal()
+    n_organic: Decimal = Decimal()
+    violations: list[Violation] = field(default_factory=list)
+
+    @property
+    def n_organic_per_ha(self) -> Decimal:
+        return self.n_organic / self.area if self.area else Decimal()
+
+    @property
+    def valid(self) -> bool:
+        return not self.violations
+
+    def field_violations(self, field_id: int) -> list[Violation]:
+        """Violations of the field including the farm-wide ones."""
+        return [
+            violation
+            for violation in self.violations
+            if violation.field_id is None or violation.field_id == field_id
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "year": self.year,
+            "area": float(self.area),
+            "n_organic": float(self.n_organic_per_ha),
+            "violations": [violation.to_dict() for violation in self.violations],
+        }
+
+
+@dataclass
+class _FieldNitrogen:
+    name: str
+    area: Decimal
+    red_region: bool
+    n_organic: Decimal = Decimal()
+    n_fall: Decimal = Decimal()
+    fertilization_ids: list[int] = field(default_factory=list)
+
+
+def check_compliance(
+    user_id: int,
+    year: int,
+    field_ids: Iterable[int] | None = None,
+    planned: Iterable[PlannedFertilization] = (),
+    exclude: Iterable[int] = (),
+    *,
+    guidelines: guidelines = guidelines,
+) -> ComplianceReport:
+    """
+    Check the organic nitrogen of a year against the farm-wide limit of `ORGANIC_N_LIMIT`
+    and the reduced allowances of red region fields.
+    All fields are evaluated in one batch, with `field_ids` only these fields are evaluated
+    and the farm-wide sum is aggregated in the database. Exchanged land is not part of
+    the farm.
+
+    :param field_ids:
+        Fields to evaluate, all fields of the year by default.
+    :param planned:
+        Unsaved fertilizations that are checked as if they were saved.
+    :param exclude:
+        Ids of fertilizations to leave out, e.g. the one being edited.
+    """
+    field_ids = set(field_ids) if field_ids is not None else None
+    exclude = set(exclude)
+    planned = list(planned)
+    fertilizers = _FertilizerNitrogen(guidelines)
+    report = ComplianceReport(user_id=user_id, year=year)
+
+    query = (
+        select(db.Field.id, db.BaseField.name, db.Field.area, db.Field.red_region)
+        .join(db.BaseField)
+        .where(
+            db.BaseField.user_id == user_id,
+            db.Field.year == year,
+            db.Field.field_type != FieldType.exchanged_land,
+        )
+    )
+    if field_ids is not None:
+        query = query.where(db.Field.id.in_(field_ids))
+    fields = {
+        id: _FieldNitrogen(name=name, area=area or Decimal(), red_region=bool(red_region))
+        for id, name, area, red_region in _db.session.execute(query)
+    }
+
+    query = (
+        select(
+            db.Fertilization.id,
+            db.Fertilization.field_id,
+            db.Fertilization.fertilizer_id,
+            db.Fertilization.amount,
+            db.Fertilization.measure,
+        )
+        .join(db.Fertilizer)
+        .where(
+            db.Fertilization.field_id.in_(fields),
+            db.Fertilizer.fert_class == FertClass.organic,
+            db.Fertilization.id.not_in(exclude),
+        )
+        .order_by(db.Fertilization.id)
+    )
+    rows = list(_db.session.execute(query))
+    rows += [
+        (
+            None,
+            fertilization.field_id,
+            fertilization.fertilizer_id,
+            fertilization.amount,
+            fertilization.measure,
+        )
+        for fertilization in planned
+        if fertilization.field_id in fields
+    ]
+    for id, field_id, fertilizer_id, amount, measure in rows:
+        n_brutto, n_netto = fertilizers.n(fertilizer_id)
+        if n_netto is None:
+            continue
+        nitrogen = fields[field_id]
+        nitrogen.n_organic += amount * n_netto
+        if measure is MeasureType.org_fall:
+            nitrogen.n_fall += amount * n_brutto
+        if id is not None:
+            nitrogen.fertilization_ids.append(id)
+
+    if field_ids is None:
+        report.area = sum((nitrogen.area for nitrogen in fields.values()), Decimal())
+        report.n_organic = sum(
+            (nitrogen.area * nitrogen.n_organic for nitrogen in fields.values()), Decimal()
+        )
+    else:
+        report.area, report.n_organic = _farm_nitrogen(
+            user_id, year, exclude, planned, fertilizers
+        )
+
+    if report.n_organic_per_ha > ORGANIC_N_LIMIT:
+        report.violations.append(
+            Violation(
+                rule="farm_organic_n",
+                value=report.n_organic_per_ha,
+                limit=ORGANIC_N_LIMIT,
+                fertilization_ids=[
+                    id for nitrogen in fields.values() for id in nitrogen.fertilization_ids
+                ],
+            )
+        )
+    for id, nitrogen in fields.items():
+        if not nitrogen.red_region:
+            continue
+        for rule, value, limit in (
+            ("red_region_organic_n", nitrogen.n_organic, ORGANIC_N_LIMIT),
+            ("red_region_fall_n", nitrogen.n_fall, RED_REGION_FALL_N_LIMIT),
+        ):
+            if value > limit:
+                report.violations.append(
+                    Violation(
+                        rule=rule,
+                        value=value,
+                        limit=limit,
+                        field_id=id,
+                        name=nitrogen.name,
+                        fertilization_ids=nitrogen.fertilization_ids,
+                    )
+                )
+    return report
+
+
+def farm_organic_n(
+    user_id: int, year: int, *, guidelines: guidelines = guidelines
+) -> tuple[Decimal, Decimal]:
+    """
+    Farm area of a year and its area-weighted organic N after storage losses, the basis
+    of `ORGANIC_N_LIMIT` that the nutrient comparison reports as well.
+    """
+    return _farm_nitrogen(user_id, year, set(), [], _FertilizerNitrogen(guidelines))
+
+
+class _FertilizerNitrogen:
+    """Total N per unit of organic fertilizers, before and after storage losses."""
+
+    def __init__(self, guidelines: guidelines):
+        self._guidelines = guidelines
+        self._n: dict[int, tuple[Decimal, Decimal] | tuple[None, None]] = {}
+
+    def n(self, fertilizer_id: int) -> tuple[Decimal, Decimal] | tuple[None, None]:
+        if fertilizer_id not in self._n:
+            fertilizer = _db.session.get(db.Fertilizer, fertilizer_id)
+            if fertilizer is None or fertilizer.fert_class is not FertClass.organic:
+                self._n[fertilizer_id] = (None, None)
+            else:
+                fertilizer = create_fertilizer(fertilizer, guidelines=self._guidelines)
+                self._n[fertilizer_id] = (fertilizer.n_total(), fertilizer.n_total(netto=True))
+        return self._n[fertilizer_id]
+
+
+def _farm_nitrogen(
+    user_id: int,
+    year: int,
+    exclude: set[int],
+    planned: list[PlannedFertilization],
+    fertilizers: _FertilizerNitrogen,
+) -> tuple[Decimal, Decimal]:
+    """Farm area and its area-weighted organic N after storage losses, summed in the database."""
+    query = (
+        select(db.Field.id, db.Field.area)
+        .join(db.BaseField)
+        .where(
+            db.BaseField.user_id == user_id,
+            db.Field.year == year,
+            db.Field.field_type != FieldType.exchanged_land,
+        )
+    )
+    areas = {id: area or Decimal() for id, area in _db.session.execute(query)}
+    query = (
+        select(db.Fertilization.fertilizer_id, func.sum(db.Fertilization.amount * db.Field.area))
+        .join(db.Field)
+        .join(db.Fertilizer)
+        .where(
+            db.Fertilization.field_id.in_(areas),
+            db.Fertilizer.fert_class == FertClass.organic,
+            db.Fertilization.id.not_in(exclude),
+        )
+        .group_by(db.Fertilization.fertilizer_id)
+    )
+    n_organic = Decimal()
+    for fertilizer_id, amount in _db.session.execute(query):
+        _, n_netto = fertilizers.n(fertilizer_id)
+        n_organic += Decimal(str(amount or 0)) * (n_netto or Decimal())
+    for fertilization in planned:
+        _, n_netto = fertilizers.n(fertilization.fertilizer_id)
+        if fertilization.field_id in areas and n_netto is not None:
+            n_organic += fertilization.amount * n_netto * areas[fertilization.field_id]
+    return sum(areas.values(), Decimal()), n_organic
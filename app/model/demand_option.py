@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from itertools import product
+
+from app.database.types import DemandType
+
+from .balance import Balance
+from .field import Field
+
+Options = tuple[DemandType, DemandType, DemandType]
+# all combinations of the demand options of P2O5, K2O and MgO
+OPTION_COMBINATIONS: tuple[Options, ...] = tuple(
+    product((DemandType.demand, DemandType.removal), repeat=3)
+)
+OPTION_NUTRIENTS = ("p2o5", "k2o", "mgo")
+
+
+@dataclass
+class OptionBalance:
+    """Total balance of a field with one combination of demand options."""
+
+    options: Options
+    balance: Balance
+    current: bool = False
+
+    def to_dict(self) -> dict:
+        return {
+            **{
+                f"demand_{nutrient}": option.name
+                for nutrient, option in zip(OPTION_NUTRIENTS, self.options)
+            },
+            "current": self.current,
+            "balance": {
+                nutrient: float(getattr(self.balance, nutrient))
+                for nutrient in ("n", "p2o5", "k2o", "mgo", "s", "cao")
+            },
+        }
+
+
+def compare_demand_options(field: Field) -> list[OptionBalance]:
+    """
+    Total balance of the field for all `OPTION_COMBINATIONS`, same as `Field.total_balance`
+    with these options. Crop demands, byproducts, soil reductions and all other reductions
+    are computed once and only masked per combination, the field isn't changed.
+    """
+    soil_reductions = _soil_reductions(field)
+    fertilizations = field.sum_fertilizations() + field.sum_modifiers()
+    cultivations = []
+    for cultivation in field.cultivations:
+        if cultivation is field.catch_crop:
+            # catch crops have neither demands nor reductions in the field balance
+            continue
+        crop_demand = cultivation.crop.demand_crop(
+            crop_yield=cultivation.crop_yield, crop_protein=cultivation.crop_protein
+        )
+        byproduct = cultivation.crop.demand_byproduct(cultivation.crop_yield)
+        reductions = field.crop_reductions(cultivation)
+        soil = Balance()
+        if cultivation is field.main_crop:
+            reductions += field.redelivery()
+            soil = soil_reductions
+        cultivations.append((crop_demand, byproduct, reductions, soil))
+
+    current = (field.option_p2o5, field.option_k2o, field.option_mgo)
+    results = []
+    for options in OPTION_COMBINATIONS:
+        balance = Balance("Field balance") + fertilizations
+        for crop_demand, byproduct, reductions, soil in cultivations:
+            cultivation_balance = reductions - crop_demand
+            cultivation_balance.n += soil.n
+            cultivation_balance.cao += soil.cao
+            # the byproduct and the soil reductions of a nutrient only count on demand,
+            # removal zeroes the byproduct even if the residues are removed
+            for nutrient, option in zip(OPTION_NUTRIENTS, options):
+                if option is DemandType.demand:
+                    value = getattr(cultivation_balance, nutrient)
+                    value += getattr(soil, nutrient) - getattr(byproduct, nutrient)
+                    setattr(cultivation_balance, nutrient, value)
+            field.adjust_nutritional_needs(cultivation_balance)
+            balance += cultivation_balance
+        results.append(OptionBalance(options=options, balance=balance, current=options == current))
+    return results
+
+
+def _soil_reductions(field: Field) -> Balance:
+    """Soil reductions with all options on demand, the only setting that counts them."""
+    options = (field.option_p2o5, field.option_k2o, field.option_mgo)
+    field.option_p2o5 = field.option_k2o = field.option_mgo = DemandType.demand
+    try:
+        return field.soil_reductions()
+    finally:
+        field.option_p2o5, field.option_k2o, field.option_mgo = options
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import csv
+import io
+from collections.abc import Callable, Iterable, Iterator
+from decimal import Decimal
+from enum import Enum
+
+from sqlalchemy import select
+
+import app.database.model as db
+from app.extensions import db as _db
+
+from . import guidelines
+from .field import Field, FieldLoader
+
+FIELD_COLUMNS = ["field_id", "year", "name", "prefix", "suffix", "partition"]
+
+EXPORT_COLUMNS = {
+    "fields": [
+        *FIELD_COLUMNS,
+        "area",
+        "field_type",
+        "red_region",
+        "demand_p2o5",
+        "demand_k2o",
+        "demand_mgo",
+    ],
+    "cultivations": [
+        *FIELD_COLUMNS,
+        "cultivation_type",
+        "crop",
+        "crop_yield",
+        "crop_protein",
+        "residues",
+        "legume_rate",
+    ],
+    "fertilizations": [
+        *FIELD_COLUMNS,
+        "cultivation_type",
+        "fertilizer",
+        "measure",
+        "amount",
+        "n",
+        "p2o5",
+        "k2o",
+        "mgo",
+        "s",
+        "cao",
+        "nh4",
+    ],
+    "balances": [*FIELD_COLUMNS, "area", "n", "p2o5", "k2o", "mgo", "s", "cao", "n_total"],
+}
+
+# field-years that are loaded and exported at a time
+EXPORT_CHUNK_SIZE = 50
+# first characters that make spreadsheets read a cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def export_rows(
+    kind: str, user_id: int, years: Iterable[int], *, guidelines: guidelines = guidelines
+) -> Iterator[list]:
+    """
+    Header and rows of an export of all fields of the user in `years`, one of `EXPORT_COLUMNS`.
+    Fields are batch loaded by a `FieldLoader` in chunks, rows are yielded field by
+    field, so memory doesn't grow with the size of the farm. Nutrients are per ha.
+
+    :raises ValueError:
+        Unknown export.
+    """
+    if kind not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown export: {kind}")
+    rows = _ROWS[kind]
+    query = (
+        select(db.Field.id)
+        .join(db.BaseField)
+        .where(db.BaseField.user_id == user_id, db.Field.year.in_(list(years)))
+        .order_by(db.Field.year, db.BaseField.prefix, db.BaseField.suffix, db.Field.partition)
+    )
+    field_ids = _db.session.execute(query).scalars().all()
+
+    yield EXPORT_COLUMNS[kind]
+    loader = FieldLoader(guidelines=guidelines)
+    for field in loader.iter_load(field_ids, chunk_size=EXPORT_CHUNK_SIZE):
+        yield from rows(field)
+
+
+def export_csv(
+    kind: str,
+    user_id: int,
+    years: Iterable[int],
+    delimiter: str = ";",
+    decimal: str = ",",
+    *,
+    guidelines: guidelines = guidelines,
+) -> Iterator[str]:
+    """
+    Lines of `export_rows` as csv, readable by Excel with the defaults. Enums are written
+    with their displayed value, numbers with two decimals.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\r\n")
+    for row in export_rows(kind, user_id, years, guidelines=guidelines):
+        writer.writerow([_cell(value, decimal) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _field_cells(field: Field) -> list:
+    # base fields are in the session already, loaded by the `FieldLoader`
+    base_field = _db.session.get(db.BaseField, field.base_id)
+    return [
+        field.id,
+        field.year,
+        field.name,
+        base_field.prefix,
+        base_field.suffix,
+        field.partition,
+    ]
+
+
+def _field_rows(field: Field) -> Iterator[list]:
+    yield [
+        *_field_cells(field),
+        field.area,
+        field.field_type,
+        field.red_region,
+        field.option_p2o5,
+        field.option_k2o,
+        field.option_mgo,
+    ]
+
+
+def _cultivation_rows(field: Field) -> Iterator[list]:
+    cells = _field_cells(field)
+    for cultivation in field.cultivations:
+        yield [
+            *cells,
+            cultivation.cultivation_type,
+            cultivation.crop.name,
+            cultivation.crop_yield,
+            cultivation.crop_protein,
+            cultivation.residues,
+            cultivation.legume_rate,
+        ]
+
+
+def _fertilization_rows(field: Field) -> Iterator[list]:
+    cells = _field_cells(field)
+    for fertilization in field.fertilizations:
+        nutrients = fertilization.nutrients(field.field_type)
+        yield [
+            *cells,
+            fertilization.cultivation_type,
+            fertilization.fertilizer.name,
+            fertilization.measure,
+            fertilization.amount,
+            nutrients.n,
+            nutrients.p2o5,
+            nutrients.k2o,
+            nutrients.mgo,
+            nutrients.s,
+            nutrients.cao,
+            nutrients.nh4,
+        ]
+
+
+def _balance_rows(field: Field) -> Iterator[list]:
+    balance = field.total_balance()
+    yield [
+        *_field_cells(field),
+        field.area,
+        balance.n,
+        balance.p2o5,
+        balance.k2o,
+        balance.mgo,
+        balance.s,
+        balance.cao,
+        field.n_total(),
+    ]
+
+
+_ROWS: dict[str, Callable[[Field], Iterator[list]]] = {
+    "fields": _field_rows,
+    "cultivations": _cultivation_rows,
+    "fertilizations": _fertilization_rows,
+    "balances": _balance_rows,
+}
+
+
+def _cell(value, decimal: str) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (Decimal, float)):
+        return f"{value:.2f}".replace(".", decimal)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # names are user input, quoted so that they are shown as text
+        return f"'{value}"
+    return str(value)
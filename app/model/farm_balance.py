@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+import app.database.model as db
+from app.database.types import FieldType
+from app.extensions import db as _db
+
+from . import guidelines
+from .compliance import farm_organic_n
+from .saldo import get_saldo_field_ids, recompute_saldos
+
+# years averaged in the nutrient comparison of the DüV
+N_AVERAGE_YEARS = 3
+P2O5_AVERAGE_YEARS = 6
+
+
+@dataclass
+class NutrientComparison:
+    """
+    Farm-level nutrient comparison of a year with the rolling averages of the
+    previous years. Years without fields are left out of the averages.
+    """
+
+    user_id: int
+    year: int
+    balances: list[db.FarmBalance] = field(default_factory=list)
+
+    @property
+    def current(self) -> db.FarmBalance | None:
+        return next((balance for balance in self.balances if balance.year == self.year), None)
+
+    @property
+    def n_average(self) -> Decimal:
+        return _average([balance.n_per_ha for balance in self.balances[-N_AVERAGE_YEARS:]])
+
+    @property
+    def p2o5_average(self) -> Decimal:
+        return _average([balance.p2o5_per_ha for balance in self.balances[-P2O5_AVERAGE_YEARS:]])
+
+    def to_dict(self) -> dict:
+        return {
+            "year": self.year,
+            "n_average": float(self.n_average),
+            "p2o5_average": float(self.p2o5_average),
+            "years": [
+                {
+                    "year": balance.year,
+                    "fields": balance.fields,
+                    "area": float(balance.area),
+                    "n": float(balance.n_per_ha),
+                    "p2o5": float(balance.p2o5_per_ha),
+                    "n_organic": float(balance.n_organic_per_ha),
+                }
+                for balance in self.balances
+            ],
+        }
+
+
+def get_farm_balances(
+    user_id: int, years: Iterable[int], *, guidelines: guidelines = guidelines
+) -> dict[int, db.FarmBalance]:
+    """
+    Area-weighted sums of the field balances of a user per year.
+    Cached years are read from `FarmBalance`, missing years first recompute the dirty
+    `Saldo` of their field-years and are then aggregated in one grouped query and cached.
+    The organic N is taken after storage losses like in `check_compliance`, not from the
+    gross `Saldo.n_total`. Exchanged land is not part of the farm. Adds to the session,
+    committing is left to the caller.
+
+    :return:
+        `FarmBalance` by year, years without fields are missing.
+    """
+    years = set(years)
+    balances = {
+        balance.year: balance
+        for balance in db.FarmBalance.query.filter(
+            db.FarmBalance.user_id == user_id, db.FarmBalance.year.in_(years)
+        )
+    }
+    missing = years - balances.keys()
+    if not missing:
+        return balances
+
+    field_years = [
+        field_year
+        for field_year in get_saldo_field_ids(user_id=user_id)
+        if field_year[1] in missing
+    ]
+    if field_years:
+        recompute_saldos(field_years, guidelines=guidelines)
+
+    query = (
+        select(
+            db.Field.year,
+            func.count(db.Field.id),
+            func.sum(db.Field.area),
+            func.sum(db.Field.area * db.Saldo.n),
+            func.sum(db.Field.area * db.Saldo.p2o5),
+        )
+        .join(db.BaseField)
+        .join(db.Saldo)
+        .where(
+            db.BaseField.user_id == user_id,
+            db.Field.year.in_(missing),
+            db.Field.field_type != FieldType.exchanged_land,
+        )
+        .group_by(db.Field.year)
+    )
+    for year, fields, area, n, p2o5 in _db.session.execute(query):
+        _, n_organic = farm_organic_n(user_id, year, guidelines=guidelines)
+        balance = db.FarmBalance(
+            user_id=user_id,
+            year=year,
+            fields=fields,
+            area=_to_decimal(area),
+            n=_to_decimal(n),
+            p2o5=_to_decimal(p2o5),
+            n_organic=_to_decimal(n_organic),
+        )
+        _db.session.add(balance)
+        balances[year] = balance
+    return balances
+
+
+def nutrient_comparison(
+    user_id: int, year: int, *, guidelines: guidelines = guidelines
+) -> NutrientComparison:
+    """
+    Nutrient comparison of the farm in `year`, averaging the N balance over the last
+    `N_AVERAGE_YEARS` and the P2O5 balance over the last `P2O5_AVERAGE_YEARS` with fields.
+    """
+    years = range(year - P2O5_AVERAGE_YEARS + 1, year + 1)
+    balances = get_farm_balances(user_id, years, guidelines=guidelines)
+    return NutrientComparison(
+        user_id=user_id, year=year, balances=[balances[year] for year in sorted(balances)]
+    )
+
+
+def _to_decimal(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def _average(values: list[Decimal]) -> Decimal:
+    return sum(values, Decimal()) / len(values) if values else Decimal()
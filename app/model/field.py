@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+from collections.abc import Iterable, Iterator
 from decimal import Decimal
-from functools import cmp_to_key
 
 from loguru import logger
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
 import app.database.model as db
 from app.database.types import (
@@ -14,13 +17,14 @@ from app.database.types import (
     MeasureType,
     ResidueType,
 )
+from app.extensions import db as _db
 
 from . import guidelines
 from .balance import Balance, create_modifier
 from .crop import Crop
 from .cultivation import CatchCrop, Cultivation, MainCrop, SecondCrop, create_cultivation
 from .fertilization import Fertilization
-from .fertilizer import create_fertilizer
+from .fertilizer import Mineral, Organic, create_fertilizer
 from .soil import Soil, create_soil_sample
 
 
@@ -42,37 +46,187 @@ def create_field(
 
     if field is None:
         return None
-    new_field = Field(field, first_year=first_year, guidelines=guidelines)
-    new_field.soil_sample = create_soil_sample(
-        field.base_field.soil_samples, field.field_type, field.year, guidelines=guidelines
-    )
-
-    for cultivation in field.cultivations:
-        crop_data = Crop(cultivation.crop, guidelines=guidelines)
-        cultivation_data = create_cultivation(cultivation, crop_data, guidelines=guidelines)
-        new_field.cultivations.append(cultivation_data)
-        cultivation.fertilizations = sorted(
-            cultivation.fertilizations, key=cmp_to_key(MeasureType.sorting)
-        )
+    return FieldLoader(guidelines=guidelines).build(field, first_year=first_year)
+
+
+class FieldLoader:
+    """
+    Creates `Field` classes of many field-years at once. Field-years, their previous
+    years and all relations they need are read with a few eager queries, crops and
+    fertilizers are created once and shared by all fields of the loader.
+    """
+
+    def __init__(self, *, guidelines: guidelines = guidelines):
+        self._guidelines = guidelines
+        self._crops: dict[int, Crop] = {}
+        self._fertilizers: dict[int, Organic | Mineral] = {}
+
+    def crop(self, crop: db.Crop) -> Crop:
+        """Shared `Crop` of a database crop."""
+        if crop.id not in self._crops:
+            self._crops[crop.id] = Crop(crop, guidelines=self._guidelines)
+        return self._crops[crop.id]
+
+    def fertilizer(self, fertilizer: db.Fertilizer) -> Organic | Mineral:
+        """Shared fertilizer of a database fertilizer."""
+        if fertilizer.id not in self._fertilizers:
+            self._fertilizers[fertilizer.id] = create_fertilizer(
+                fertilizer, guidelines=self._guidelines
+            )
+        return self._fertilizers[fertilizer.id]
+
+    def build(self, field: db.Field, first_year: bool = True) -> Field:
+        """Create the `Field` of a database field-year.
+
+        Args:
+            field (db.Field): Field-year to create.
+            first_year (bool, optional): Specify as `false` to not create the previous year.
+
+        Returns:
+            Field: Field class with all `cultivations` and `fertilizations` of the year.
+        """
+        guidelines = self._guidelines
+        new_field = Field(field, first_year=first_year, guidelines=guidelines)
+        if field.soil is not None:
+            new_field.soil_sample = Soil(field.soil.soil_sample, field.field_type, guidelines)
+        else:
+            # field-year isn't indexed yet, search through all samples of the base field
+            new_field.soil_sample = create_soil_sample(
+                field.base_field.soil_samples, field.field_type, field.year, guidelines=guidelines
+            )
+
+        for cultivation in field.cultivations:
+            crop_data = self.crop(cultivation.crop)
+            cultivation_data = create_cultivation(cultivation, crop_data, guidelines=guidelines)
+            new_field.cultivations.append(cultivation_data)
+            _sort_fertilizations(cultivation)
+
+        _sort_fertilizations(field)
+        for fertilization in field.fertilizations:
+            fertilization_data = Fertilization(
+                fertilization,
+                self.fertilizer(fertilization.fertilizer),
+                self.crop(fertilization.cultivation.crop).feedable,
+                fertilization.cultivation.cultivation_type,
+            )
+            new_field.fertilizations.append(fertilization_data)
+
+        for modifier in field.modifiers:
+            new_field.modifiers.append(
+                create_modifier(modifier.description, modifier.modification, modifier.amount)
+            )
+
+        return new_field
+
+    def load(self, ids: Iterable[int]) -> list[Field]:
+        """Create the fields of many field-years together with their previous years.
+
+        Args:
+            ids (Iterable[int]): Ids of the field-years, unknown ids are skipped.
 
-    field.fertilizations = sorted(field.fertilizations, key=cmp_to_key(MeasureType.sorting))
-    for fertilization in field.fertilizations:
-        fertilizer_data = create_fertilizer(fertilization.fertilizer, guidelines=guidelines)
-        crop_data = Crop(fertilization.cultivation.crop, guidelines=guidelines)
-        fertilization_data = Fertilization(
-            fertilization,
-            fertilizer_data,
-            crop_data.feedable,
-            fertilization.cultivation.cultivation_type,
+        Returns:
+            list[Field]: Fields in the order of `ids`.
+        """
+        return [field for _, field in self.load_rows(ids)]
+
+    def load_rows(self, ids: Iterable[int]) -> list[tuple[db.Field, Field]]:
+        """Like `load`, but also returns the eager loaded database rows of the fields.
+
+        Args:
+            ids (Iterable[int]): Ids of the field-years, unknown ids are skipped.
+
+        Returns:
+            list[tuple[db.Field, Field]]: Rows and fields in the order of `ids`.
+        """
+        ids = list(ids)
+        fields = {field.id: field for field in self._query(ids)}
+        previous_ids = self._previous_ids(fields.values())
+        previous = {
+            field.id: self.build(field, first_year=False)
+            for field in self._query(set(previous_ids.values()))
+        }
+        result = []
+        for id in ids:
+            if id not in fields:
+                continue
+            new_field = self.build(fields[id], first_year=False)
+            new_field.field_prev_year = previous.get(previous_ids.get(id))
+            result.append((fields[id], new_field))
+        return result
+
+    def iter_load(self, ids: Iterable[int], chunk_size: int = 50) -> Iterator[Field]:
+        """Like `load`, but reads `chunk_size` field-years at a time and yields their fields."""
+        ids = list(ids)
+        for start in range(0, len(ids), chunk_size):
+            yield from self.load(ids[start : start + chunk_size])
+
+    @staticmethod
+    def _query(ids: Iterable[int]) -> list[db.Field]:
+        """Field-years with all relations that `build` reads."""
+        return (
+            db.Field.query.options(
+                selectinload(db.Field.base_field).selectinload(db.BaseField.soil_samples),
+                selectinload(db.Field.soil).selectinload(db.FieldSoil.soil_sample),
+                selectinload(db.Field.cultivations).selectinload(db.Cultivation.crop),
+                selectinload(db.Field.cultivations).selectinload(db.Cultivation.fertilizations),
+                selectinload(db.Field.fertilizations).selectinload(db.Fertilization.fertilizer),
+                selectinload(db.Field.modifiers),
+                selectinload(db.Field.saldo),
+            )
+            .filter(db.Field.id.in_(list(ids)))
+            .all()
         )
-        new_field.fertilizations.append(fertilization_data)
 
-    for modifier in field.modifiers:
-        new_field.modifiers.append(
-            create_modifier(modifier.description, modifier.modification, modifier.amount)
+    @staticmethod
+    def _previous_ids(fields: Iterable[db.Field]) -> dict[int, int]:
+        """Previous field-year of each field-year, like `Field._field_prev_year`."""
+        fields = list(fields)
+        if not fields:
+            return {}
+        query = select(db.Field.id, db.Field.base_id, db.Field.year, db.Field.partition).where(
+            db.Field.base_id.in_({field.base_id for field in fields}),
+            db.Field.year.in_({field.year - 1 for field in fields}),
         )
+        partitions: dict[tuple[int, int, int], int] = {}
+        years: dict[tuple[int, int], list[int]] = {}
+        for id, base_id, year, partition in _db.session.execute(query):
+            partitions[(base_id, year, partition)] = id
+            years.setdefault((base_id, year), []).append(id)
+        previous_ids = {}
+        for field in fields:
+            key = (field.base_id, field.year - 1)
+            if (*key, field.partition) in partitions:
+                previous_ids[field.id] = partitions[(*key, field.partition)]
+            elif len(years.get(key, [])) == 1:
+                previous_ids[field.id] = years[key][0]
+        return previous_ids
+
+
+def _sort_fertilizations(row: db.Field | db.Cultivation) -> None:
+    fertilizations = sorted(row.fertilizations, key=MeasureType.sort_key)
+    if inspect(row).attrs.fertilizations.history.has_changes():
+        row.fertilizations = fertilizations
+    else:
+        # sorted for the templates as well, without flagging the row as changed
+        set_committed_value(row, "fertilizations", fertilizations)
+
+
+def get_lime_balance(id: int, *, guidelines: guidelines = guidelines) -> Decimal:
+    """Running lime balance of a field-year, read from the `LimeBalance` cache or calculated.
+
+    Missing years are calculated from the last cached year forward without writing them,
+    the cache is filled by `recompute_saldos` for the field-years it recomputes.
 
-    return new_field
+    Args:
+        id (int): Id of the field-year.
+
+    Returns:
+        Decimal: Lime balance at the end of the year.
+    """
+    cached = _db.session.get(db.LimeBalance, id)
+    if cached is not None:
+        return cached.cao
+    return create_field(id, guidelines=guidelines).lime_balance()
 
 
 class Field:
@@ -83,6 +237,7 @@ class Field:
     def __init__(
         self, Field: db.Field, first_year: bool = False, *, guidelines: guidelines = guidelines
     ):
+        self.id: int = Field.id
         self.user_id: int = Field.base_field.user_id
         self.base_id: int = Field.base_id
         self.partition: int = Field.partition
@@ -99,6 +254,7 @@ class Field:
         self.cultivations: list[Cultivation] = []
         self.fertilizations: list[Fertilization] = []
         self.modifiers: list[Balance] = []
+        self._guidelines = guidelines
         self.field_prev_year: Field = self._field_prev_year(first_year, guidelines=guidelines)
 
     def __eq__(self, other):
@@ -112,21 +268,15 @@ class Field:
         if not first_year:
             return
         year = self.year - 1
-        field = (
-            db.BaseField.query.join(db.Field)
-            .filter(
-                db.BaseField.id == self.base_id,
-                db.Field.year == year,
-                db.Field.partition == self.partition,
-            )
-            .one_or_none()
-        )
+        field = db.Field.query.filter(
+            db.Field.base_id == self.base_id,
+            db.Field.year == year,
+            db.Field.partition == self.partition,
+        ).one_or_none()
         if field is None:
-            field = (
-                db.BaseField.query.join(db.Field)
-                .filter(db.BaseField.id == self.base_id, db.Field.year == year)
-                .one_or_none()
-            )
+            field = db.Field.query.filter(
+                db.Field.base_id == self.base_id, db.Field.year == year
+            ).one_or_none()
         if field:
             field = create_field(field.id, first_year=False, guidelines=guidelines)
         return field
@@ -149,9 +299,8 @@ class Field:
     @property
     def second_crop(self) -> SecondCrop:
         for cultivation in self.cultivations:
-            if (
-                cultivation.cultivation_type is CultivationType.second_main_crop
-                or cultivation.cultivation_type is CultivationType.second_crop
+            if cultivation.cultivation_type.is_any(
+                CultivationType.second_main_crop, CultivationType.second_crop
             ):
                 return cultivation
         return None
@@ -204,7 +353,9 @@ class Field:
     def soil_reductions(self) -> Balance:
         """Summarize all reductions that are related to the soil composition and values."""
         reductions = Balance("Soil reductions")
-        if not (self.soil_sample and self.field_type in (FieldType.cropland, FieldType.grassland)):
+        if not (
+            self.soil_sample and self.field_type.is_any(FieldType.cropland, FieldType.grassland)
+        ):
             return reductions
         reductions.n = self.soil_sample.reduction_n()
         if self.option_p2o5 is DemandType.demand:
@@ -228,12 +379,23 @@ class Field:
         return reductions
 
     def cao_saldo(self) -> Decimal:
-        """Returns the cummulated lime balance since the last soil sample."""
-        # REWORK badly needed
-        try:
-            return self.field_prev_year.saldo.cao
-        except AttributeError:
+        """Returns the cummulated lime balance of the previous years since the last soil sample."""
+        field_prev_year = self.field_prev_year
+        if field_prev_year is None:
             return Decimal()
+        if self.soil_sample is not None and (
+            field_prev_year.soil_sample is None
+            or field_prev_year.soil_sample.year != self.soil_sample.year
+        ):
+            # a new soil sample restarts the lime balance
+            return Decimal()
+        if field_prev_year.id is None:
+            return field_prev_year.lime_balance()
+        return get_lime_balance(field_prev_year.id, guidelines=self._guidelines)
+
+    def lime_balance(self) -> Decimal:
+        """Returns the lime balance at the end of the year, that is carried into the next year."""
+        return self.cao_saldo() + self.soil_reductions().cao + self.sum_fertilizations().cao
 
     def fertilization_redelivery(self) -> Balance:
         """
@@ -383,7 +545,7 @@ class Field:
         for fertilization in self.fertilizations:
             if (
                 fertilization.fertilizer.is_class(FertClass.organic)
-                and fertilization.measure == MeasureType.org_fall
+                and fertilization.measure is MeasureType.org_fall
             ):
                 n_total += fertilization.fertilizer.n * fertilization.amount
                 nh4 += fertilization.fertilizer.nh4 * fertilization.amount
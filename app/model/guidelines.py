@@ -1,3 +1,5 @@
+import hashlib
+import json
 from functools import cache
 
 from loguru import logger
@@ -87,3 +89,14 @@ def legume_delivery():
 def sulfur_needs():
     logger.info("Caching data")
     return load_json("data/Richtwerte/Nährstoffwerte/schwefelbedarf.json")
+
+
+@cache
+def version() -> str:
+    """
+    Short fingerprint of the soil class tables, changes whenever the guidelines are updated.
+    Used to detect outdated persisted soil classifications.
+    """
+    tables = [p2o5_classes(), k2o_classes(), mg_classes(), ph_classes()]
+    data = json.dumps(tables, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()[:12]
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import ROUND_DOWN, Decimal
+
+from sqlalchemy import func, select
+
+import app.database.model as db
+from app.database.types import FertClass, FieldType
+from app.extensions import db as _db
+
+from . import guidelines
+from .compliance import ORGANIC_N_LIMIT, _FertilizerNitrogen
+from .fertilizer import Organic, create_fertilizer
+from .saldo import get_saldo_field_ids, recompute_saldos
+
+
+@dataclass
+class ManureAllocation:
+    """Amount per ha of an organic fertilizer on a field."""
+
+    field_id: int
+    name: str
+    fertilizer_id: int
+    fertilizer: str
+    amount: Decimal
+    volume: Decimal
+
+    def to_dict(self) -> dict:
+        return {
+            "field_id": self.field_id,
+            "name": self.name,
+            "fertilizer_id": self.fertilizer_id,
+            "fertilizer": self.fertilizer,
+            "amount": float(self.amount),
+            "volume": float(self.volume),
+        }
+
+
+@dataclass
+class ManurePlan:
+    """Distribution of the available volumes of organic fertilizers over the fields of a year."""
+
+    user_id: int
+    year: int
+    volumes: dict[int, Decimal] = field(default_factory=dict)
+    allocations: list[ManureAllocation] = field(default_factory=list)
+
+    @property
+    def remaining(self) -> dict[int, Decimal]:
+        """Volumes per fertilizer that couldn't be distributed."""
+        remaining = dict(self.volumes)
+        for allocation in self.allocations:
+            remaining[allocation.fertilizer_id] -= allocation.volume
+        return remaining
+
+    def field_allocations(self, field_id: int) -> list[ManureAllocation]:
+        return [allocation for allocation in self.allocations if allocation.field_id == field_id]
+
+    def to_dict(self) -> dict:
+        return {
+            "year": self.year,
+            "volumes": {id: float(volume) for id, volume in self.volumes.items()},
+            "remaining": {id: float(volume) for id, volume in self.remaining.items()},
+            "allocations": [allocation.to_dict() for allocation in self.allocations],
+        }
+
+
+@dataclass
+class _FarmFields:
+    """Column arrays of the fields of a year, one entry per field."""
+
+    ids: list[int] = field(default_factory=list)
+    names: list[str] = field(default_factory=list)
+    areas: list[Decimal] = field(default_factory=list)
+    field_types: list[FieldType] = field(default_factory=list)
+    n_needs: list[Decimal] = field(default_factory=list)
+    p2o5_needs: list[Decimal] = field(default_factory=list)
+    k2o_needs: list[Decimal] = field(default_factory=list)
+    n_allowances: list[Decimal] = field(default_factory=list)
+
+
+def plan_manure_distribution(
+    user_id: int, year: int, volumes: dict[int, Decimal], *, guidelines: guidelines = guidelines
+) -> ManurePlan:
+    """
+    Distribute the available volumes of organic fertilizers over all fields of a year.
+    The needs of the fields are read from their `Saldo` in one query and kept in column
+    arrays. Fertilizers are distributed one after another, the richest in N first.
+    Every field gets at most the amount that covers its N need with the available N and
+    keeps the organic N after storage losses within `ORGANIC_N_LIMIT`. Fields that use
+    the most of the supplied N, P2O5 and K2O are served first. Amounts are whole units
+    per ha. Exchanged land is not part of the farm.
+
+    :param volumes:
+        Available volume by fertilizer id, in units of the fertilizer.
+    :raises ValueError:
+        Fertilizer isn't an organic fertilizer of the user in `year`.
+    """
+    fertilizers: list[tuple[db.Fertilizer, Organic, Decimal]] = []
+    for fertilizer_id, volume in volumes.items():
+        fertilizer = _db.session.get(db.Fertilizer, fertilizer_id)
+        if (
+            fertilizer is None
+            or fertilizer.user_id != user_id
+            or fertilizer.fert_class is not FertClass.organic
+            or fertilizer.year != year
+        ):
+            raise ValueError(f"Unknown organic fertilizer of {year}: {fertilizer_id}")
+        organic = create_fertilizer(fertilizer, guidelines=guidelines)
+        fertilizers.append((fertilizer, organic, Decimal(volume)))
+    fertilizers.sort(key=lambda item: item[1].n, reverse=True)
+
+    plan = ManurePlan(user_id=user_id, year=year, volumes={f.id: v for f, _, v in fertilizers})
+    fields = _load_fields(user_id, year, guidelines)
+    nitrogen = _FertilizerNitrogen(guidelines)
+    for fertilizer, organic, volume in fertilizers:
+        _, n_netto = nitrogen.n(fertilizer.id)
+        p2o5, k2o = organic.p2o5 or Decimal(), organic.k2o or Decimal()
+        n_available: dict[FieldType, Decimal] = {}
+        candidates = []
+        for i, field_type in enumerate(fields.field_types):
+            if field_type not in n_available:
+                n_available[field_type] = organic.n_verf(field_type)
+            n = n_available[field_type]
+            if n <= 0 or fields.n_needs[i] <= 0:
+                continue
+            rate = fields.n_needs[i] / n
+            if n_netto > 0:
+                rate = min(rate, fields.n_allowances[i] / n_netto)
+            rate = rate.quantize(Decimal(1), ROUND_DOWN)
+            if rate <= 0:
+                continue
+            used = (
+                n * rate
+                + min(p2o5 * rate, fields.p2o5_needs[i])
+                + min(k2o * rate, fields.k2o_needs[i])
+            )
+            candidates.append((used / (rate * (n + p2o5 + k2o)), i, rate))
+
+        candidates.sort(key=lambda candidate: (-candidate[0], fields.ids[candidate[1]]))
+        for _, i, rate in candidates:
+            if volume <= 0:
+                break
+            area = fields.areas[i]
+            if rate * area > volume:
+                rate = (volume / area).quantize(Decimal(1), ROUND_DOWN)
+                if rate <= 0:
+                    continue
+            volume -= rate * area
+            n = n_available[fields.field_types[i]]
+            fields.n_needs[i] -= n * rate
+            fields.p2o5_needs[i] = max(fields.p2o5_needs[i] - p2o5 * rate, Decimal())
+            fields.k2o_needs[i] = max(fields.k2o_needs[i] - k2o * rate, Decimal())
+            fields.n_allowances[i] -= n_netto * rate
+            plan.allocations.append(
+                ManureAllocation(
+                    field_id=fields.ids[i],
+                    name=fields.names[i],
+                    fertilizer_id=fertilizer.id,
+                    fertilizer=fertilizer.name,
+                    amount=rate,
+                    volume=rate * area,
+                )
+            )
+    return plan
+
+
+def _load_fields(user_id: int, year: int, guidelines: guidelines) -> _FarmFields:
+    """
+    Needs of the fields of a year from their `Saldo`, recomputing dirty ones first, and
+    the N allowance left by their organic fertilizations.
+    """
+    field_years = get_saldo_field_ids(year=year, user_id=user_id)
+    if field_years:
+        recompute_saldos(field_years, guidelines=guidelines)
+
+    query = (
+        select(
+            db.Field.id,
+            db.BaseField.name,
+            db.Field.area,
+            db.Field.field_type,
+            db.Saldo.n,
+            db.Saldo.p2o5,
+            db.Saldo.k2o,
+        )
+        .join(db.BaseField)
+        .join(db.Saldo)
+        .where(
+            db.BaseField.user_id == user_id,
+            db.Field.year == year,
+            db.Field.field_type != FieldType.exchanged_land,
+            db.Field.area > 0,
+        )
+        .order_by(db.Field.id)
+    )
+    fields = _FarmFields()
+    for id, name, area, field_type, n, p2o5, k2o in _db.session.execute(query):
+        fields.ids.append(id)
+        fields.names.append(name)
+        fields.areas.append(area)
+        fields.field_types.append(field_type)
+        fields.n_needs.append(max(-(n or Decimal()), Decimal()))
+        fields.p2o5_needs.append(max(-(p2o5 or Decimal()), Decimal()))
+        fields.k2o_needs.append(max(-(k2o or Decimal()), Decimal()))
+        fields.n_allowances.append(ORGANIC_N_LIMIT)
+
+    # organic N after storage losses that is already applied
+    index = {id: i for i, id in enumerate(fields.ids)}
+    query = (
+        select(
+            db.Fertilization.field_id,
+            db.Fertilization.fertilizer_id,
+            func.sum(db.Fertilization.amount),
+        )
+        .join(db.Fertilizer)
+        .where(
+            db.Fertilization.field_id.in_(fields.ids),
+            db.Fertilizer.fert_class == FertClass.organic,
+        )
+        .group_by(db.Fertilization.field_id, db.Fertilization.fertilizer_id)
+    )
+    nitrogen = _FertilizerNitrogen(guidelines)
+    for field_id, fertilizer_id, amount in _db.session.execute(query):
+        _, n_netto = nitrogen.n(fertilizer_id)
+        fields.n_allowances[index[field_id]] -= Decimal(str(amount or 0)) * (n_netto or Decimal())
+    return fields
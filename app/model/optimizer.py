@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal
+
+import app.database.model as db
+from app.database.types import CultivationType, FertClass, FertType, MeasureType
+from app.extensions import db as _db
+
+from . import guidelines
+from .balance import Balance
+from .compliance import ORGANIC_N_LIMIT
+from .cultivation import Cultivation
+from .fertilization import Fertilization
+from .fertilizer import create_fertilizer
+from .field import Field
+
+NUTRIENTS = ("n", "p2o5", "k2o", "mgo", "s", "cao")
+# decimal places of the amounts, same as the fertilization form
+AMOUNT_PLACES = {FertClass.organic: Decimal(1), FertClass.mineral: Decimal("0.1")}
+
+
+@dataclass
+class FertilizerOption:
+    """Fertilizer with its nutrients per unit on a cultivation of a field."""
+
+    fertilizer_id: int
+    name: str
+    fert_class: FertClass
+    measure: MeasureType
+    price: Decimal
+    nutrients: Balance
+    n_organic: Decimal = Decimal()
+
+    def max_amount(self, needs: dict[str, Decimal], n_allowance: Decimal) -> Decimal:
+        """
+        Largest amount that doesn't oversupply any of the `needs` it contributes to,
+        doesn't exceed the N need and stays within the organic N allowance.
+        """
+        amounts = [
+            need / getattr(self.nutrients, nutrient)
+            for nutrient, need in needs.items()
+            if getattr(self.nutrients, nutrient) > 0
+        ]
+        if not amounts:
+            return Decimal()
+        amount = min(amounts)
+        if self.nutrients.n > 0:
+            amount = min(amount, needs.get("n", Decimal()) / self.nutrients.n)
+        if self.n_organic > 0:
+            amount = min(amount, max(n_allowance, Decimal()) / self.n_organic)
+        return amount
+
+
+@dataclass
+class FertilizerAmount:
+    fertilizer_id: int
+    name: str
+    measure: MeasureType
+    amount: Decimal
+    cost: Decimal
+
+    def to_dict(self) -> dict:
+        return {
+            "fertilizer_id": self.fertilizer_id,
+            "name": self.name,
+            "measure": self.measure.name,
+            "amount": float(self.amount),
+            "cost": float(self.cost),
+        }
+
+
+@dataclass
+class FertilizationProposal:
+    """Proposed amounts to cover the remaining needs of a cultivation."""
+
+    field_id: int
+    cultivation_type: CultivationType
+    needs: Balance
+    remaining: Balance
+    amounts: list[FertilizerAmount] = field(default_factory=list)
+
+    @property
+    def cost(self) -> Decimal:
+        return sum((amount.cost for amount in self.amounts), Decimal())
+
+    def to_dict(self) -> dict:
+        return {
+            "field_id": self.field_id,
+            "cultivation_type": self.cultivation_type.name,
+            "needs": {nutrient: float(getattr(self.needs, nutrient)) for nutrient in NUTRIENTS},
+            "remaining": {
+                nutrient: float(getattr(self.remaining, nutrient)) for nutrient in NUTRIENTS
+            },
+            "amounts": [amount.to_dict() for amount in self.amounts],
+            "cost": float(self.cost),
+        }
+
+
+def propose_fertilization(
+    field: Field,
+    cultivation_type: CultivationType,
+    fertilizers: Iterable[db.Fertilizer] | None = None,
+    *,
+    guidelines: guidelines = guidelines,
+) -> FertilizationProposal:
+    """
+    Propose fertilizer amounts that cover the remaining needs of a cultivation at the
+    lowest cost. The greedy solver repeatedly applies the fertilizer with the lowest
+    price per share of covered needs, in the largest amount that doesn't oversupply a
+    needed nutrient. Available N never exceeds the N need, which is the legal limit of the
+    DüV, and organic fertilizations stay within `ORGANIC_N_LIMIT` of the field.
+
+    :param fertilizers:
+        Fertilizers to choose from, the active fertilizers of the user by default.
+        Fertilizers without price are skipped.
+    :raises ValueError:
+        Field has no cultivation of `cultivation_type`.
+    """
+    cultivation = next(
+        (c for c in field.cultivations if c.cultivation_type is cultivation_type), None
+    )
+    if cultivation is None:
+        raise ValueError(f"No cultivation of type: {cultivation_type}")
+    if fertilizers is None:
+        user = _db.session.get(db.User, field.user_id)
+        fertilizers = [
+            fertilizer
+            for fertilizer in user.get_fertilizers(active=True)
+            if fertilizer.fert_class is FertClass.mineral or fertilizer.year == field.year
+        ]
+    options = [
+        option
+        for fertilizer in fertilizers
+        if fertilizer.price is not None
+        and (option := _create_option(fertilizer, field, cultivation, guidelines))
+    ]
+
+    field.create_balances()
+    needs = Balance("Remaining needs")
+    needs.add(cultivation.balances["mineral"][-1])
+    balance = Balance("Remaining needs")
+    balance.add(needs)
+    n_allowance = ORGANIC_N_LIMIT - field.n_total(netto=True)
+    amounts: dict[int, Decimal] = {}
+    # every step covers a need completely or exhausts the organic N allowance
+    for _ in range(len(options) * len(NUTRIENTS)):
+        open_needs = {
+            nutrient: -getattr(balance, nutrient)
+            for nutrient in NUTRIENTS
+            if getattr(balance, nutrient) < 0
+        }
+        best = None
+        for index, option in enumerate(options):
+            amount = option.max_amount(open_needs, n_allowance)
+            if amount <= 0:
+                continue
+            coverage = sum(
+                min(getattr(option.nutrients, nutrient) * amount, need) / need
+                for nutrient, need in open_needs.items()
+                if getattr(option.nutrients, nutrient) > 0
+            )
+            score = option.price * amount / coverage
+            if best is None or score < best[0]:
+                best = (score, index, amount)
+        if best is None:
+            break
+        _, index, amount = best
+        option = options[index]
+        amounts[index] = amounts.get(index, Decimal()) + amount
+        n_allowance -= option.n_organic * amount
+        balance.add(option.nutrients * amount)
+
+    remaining = Balance("Remaining needs")
+    remaining.add(needs)
+    proposal = FertilizationProposal(
+        field_id=field.id, cultivation_type=cultivation_type, needs=needs, remaining=remaining
+    )
+    for index, amount in sorted(amounts.items()):
+        option = options[index]
+        amount = amount.quantize(AMOUNT_PLACES[option.fert_class], ROUND_HALF_UP)
+        if not amount:
+            continue
+        remaining.add(option.nutrients * amount)
+        proposal.amounts.append(
+            FertilizerAmount(
+                fertilizer_id=option.fertilizer_id,
+                name=option.name,
+                measure=option.measure,
+                amount=amount,
+                cost=option.price * amount,
+            )
+        )
+    return proposal
+
+
+def _create_option(
+    fertilizer: db.Fertilizer, field: Field, cultivation: Cultivation, guidelines: guidelines
+) -> FertilizerOption | None:
+    """Nutrients of one unit of the fertilizer, `None` if it can't be used on the field."""
+    if fertilizer.fert_class is FertClass.organic:
+        measure = MeasureType.org_spring
+    elif fertilizer.fert_type is FertType.lime:
+        measure = MeasureType.lime_fert
+    elif fertilizer.n:
+        measure = MeasureType.first_n_fert
+    else:
+        measure = MeasureType.first_base_fert
+    fertilizer_data = create_fertilizer(fertilizer, guidelines=guidelines)
+    if fertilizer_data is None:
+        return None
+    fertilization = Fertilization(
+        db.Fertilization(amount=Decimal(1), measure=measure),
+        fertilizer_data,
+        cultivation.crop.feedable,
+        cultivation.cultivation_type,
+    )
+    try:
+        nutrients = fertilization.nutrients(field.field_type)
+    except KeyError:
+        # organic fertilizers have no factors for fallow land
+        return None
+    return FertilizerOption(
+        fertilizer_id=fertilizer.id,
+        name=fertilizer.name,
+        fert_class=fertilizer.fert_class,
+        measure=measure,
+        price=fertilizer.price,
+        nutrients=nutrients,
+        n_organic=fertilizer_data.n_total(netto=True) if fertilizer_data.is_organic else Decimal(),
+    )
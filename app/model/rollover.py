@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy import ColumnElement, and_, case, exists, func, insert, literal, or_, select
+from sqlalchemy.orm import aliased
+
+import app.database.model as db
+from app.database.events import invalidate_field_years, log_rows
+from app.database.types import ChangeType, FertClass
+from app.extensions import db as _db
+
+from . import guidelines
+from .soil_index import update_soil_index
+
+
+@dataclass
+class RolloverReport:
+    """
+    Result of `roll_over`, the number of rows created in `year`.
+    `skipped` counts the field-years of the previous year that existed in `year` already.
+    """
+
+    year: int
+    fields: int = 0
+    cultivations: int = 0
+    fertilizations: int = 0
+    skipped: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "year": self.year,
+            "fields": self.fields,
+            "cultivations": self.cultivations,
+            "fertilizations": self.fertilizations,
+            "skipped": self.skipped,
+        }
+
+
+def roll_over(
+    user_id: int,
+    year: int,
+    cultivations: bool = False,
+    fertilizations: bool = False,
+    *,
+    guidelines: guidelines = guidelines,
+) -> RolloverReport:
+    """
+    Copy all field-years of the user from `year` to the following year with their
+    partitions, areas, field types and demand options, optionally with their cultivations
+    and fertilizations. Every table is copied with one `INSERT ... SELECT`, field-years
+    that exist in the following year already are left as they are. The soil index is
+    copied along, the `ChangeLog` is written and the following years are invalidated
+    like the session hooks do for single rows. Nothing is committed.
+
+    :param fertilizations:
+        Copy the fertilizations of the cultivations too. Organic fertilizers are analysed
+        per year, their fertilizations are only copied if the user has a fertilizer of the
+        same name in the following year.
+    :raises ValueError:
+        Fertilizations are copied without their cultivations.
+    """
+    if fertilizations and not cultivations:
+        raise ValueError("Fertilizations can only be copied with their cultivations.")
+    next_year = year + 1
+    report = RolloverReport(year=next_year)
+    session = _db.session
+
+    old, new = aliased(db.Field), aliased(db.Field)
+    existing = exists().where(
+        new.base_id == old.base_id, new.partition == old.partition, new.year == next_year
+    )
+    owned = (db.BaseField.id == old.base_id, db.BaseField.user_id == user_id, old.year == year)
+    report.skipped = session.scalar(select(func.count(old.id)).where(*owned, existing))
+    field_ids = session.scalars(
+        insert(db.Field)
+        .from_select(
+            [
+                db.Field.base_id,
+                db.Field.partition,
+                db.Field.area,
+                db.Field.year,
+                db.Field.red_region,
+                db.Field.field_type,
+                db.Field.demand_p2o5,
+                db.Field.demand_k2o,
+                db.Field.demand_mgo,
+            ],
+            select(
+                old.base_id,
+                old.partition,
+                old.area,
+                literal(next_year),
+                old.red_region,
+                old.field_type,
+                old.demand_p2o5,
+                old.demand_k2o,
+                old.demand_mgo,
+            ).where(*owned, ~existing),
+        )
+        .returning(db.Field.id)
+    ).all()
+    report.fields = len(field_ids)
+    if not field_ids:
+        return report
+
+    # pairs of every copied field-year and its copy
+    pairs = and_(
+        old.year == year,
+        new.base_id == old.base_id,
+        new.partition == old.partition,
+        new.year == next_year,
+        new.id.in_(field_ids),
+    )
+    base_ids = set(session.scalars(select(new.base_id).where(new.id.in_(field_ids))))
+    changes = [(db.Field.__tablename__, field_ids)]
+    _copy_soil_index(old, new, pairs, base_ids, next_year, guidelines)
+
+    if cultivations:
+        cultivation_ids = session.scalars(
+            insert(db.Cultivation)
+            .from_select(
+                [
+                    db.Cultivation.field_id,
+                    db.Cultivation.cultivation_type,
+                    db.Cultivation.crop_id,
+                    db.Cultivation.crop_yield,
+                    db.Cultivation.crop_protein,
+                    db.Cultivation.residues,
+                    db.Cultivation.legume_rate,
+                    db.Cultivation.nmin_30,
+                    db.Cultivation.nmin_60,
+                    db.Cultivation.nmin_90,
+                ],
+                select(
+                    new.id,
+                    db.Cultivation.cultivation_type,
+                    db.Cultivation.crop_id,
+                    db.Cultivation.crop_yield,
+                    db.Cultivation.crop_protein,
+                    db.Cultivation.residues,
+                    db.Cultivation.legume_rate,
+                    db.Cultivation.nmin_30,
+                    db.Cultivation.nmin_60,
+                    db.Cultivation.nmin_90,
+                )
+                .join(old, old.id == db.Cultivation.field_id)
+                .join(new, pairs),
+            )
+            .returning(db.Cultivation.id)
+        ).all()
+        report.cultivations = len(cultivation_ids)
+        changes.append((db.Cultivation.__tablename__, cultivation_ids))
+
+    if fertilizations:
+        new_cultivation = aliased(db.Cultivation)
+        fertilizer, next_fertilizer = aliased(db.Fertilizer), aliased(db.Fertilizer)
+        fertilization_ids = session.scalars(
+            insert(db.Fertilization)
+            .from_select(
+                [
+                    db.Fertilization.field_id,
+                    db.Fertilization.cultivation_id,
+                    db.Fertilization.fertilizer_id,
+                    db.Fertilization.cut_timing,
+                    db.Fertilization.amount,
+                    db.Fertilization.measure,
+                    db.Fertilization.month,
+                ],
+                select(
+                    new.id,
+                    new_cultivation.id,
+                    case(
+                        (fertilizer.fert_class == FertClass.organic, next_fertilizer.id),
+                        else_=fertilizer.id,
+                    ),
+                    db.Fertilization.cut_timing,
+                    db.Fertilization.amount,
+                    db.Fertilization.measure,
+                    db.Fertilization.month,
+                )
+                .join(db.Cultivation, db.Cultivation.id == db.Fertilization.cultivation_id)
+                .join(old, old.id == db.Cultivation.field_id)
+                .join(new, pairs)
+                .join(
+                    new_cultivation,
+                    and_(
+                        new_cultivation.field_id == new.id,
+                        new_cultivation.cultivation_type == db.Cultivation.cultivation_type,
+                    ),
+                )
+                .join(fertilizer, fertilizer.id == db.Fertilization.fertilizer_id)
+                .outerjoin(
+                    next_fertilizer,
+                    and_(
+                        fertilizer.fert_class == FertClass.organic,
+                        next_fertilizer.user_id == fertilizer.user_id,
+                        next_fertilizer.name == fertilizer.name,
+                        next_fertilizer.year == next_year,
+                    ),
+                )
+                .where(
+                    or_(
+                        fertilizer.fert_class != FertClass.organic, next_fertilizer.id.is_not(None)
+                    )
+                ),
+            )
+            .returning(db.Fertilization.id)
+        ).all()
+        report.fertilizations = len(fertilization_ids)
+        changes.append((db.Fertilization.__tablename__, fertilization_ids))
+
+    connection = session.connection()
+    # later years of the base fields carry the lime balance of the new year forward
+    invalidate_field_years(connection, {base_id: next_year for base_id in base_ids})
+    log_rows(
+        connection,
+        [
+            (user_id, table, row_id, ChangeType.created)
+            for table, row_ids in changes
+            for row_id in row_ids
+        ],
+    )
+    return report
+
+
+def _copy_soil_index(
+    old: type[db.Field],
+    new: type[db.Field],
+    pairs: ColumnElement[bool],
+    base_ids: set[int],
+    year: int,
+    guidelines: guidelines,
+) -> None:
+    """
+    The effective soil sample of a copy is the one of its field-year, unless the base field
+    has a sample of the new year. These few base fields are indexed again.
+    """
+    sampled = set(
+        _db.session.scalars(
+            select(db.SoilSample.base_id).where(
+                db.SoilSample.base_id.in_(base_ids), db.SoilSample.year == year
+            )
+        )
+    )
+    _db.session.execute(
+        insert(db.FieldSoil).from_select(
+            [
+                db.FieldSoil.field_id,
+                db.FieldSoil.sample_id,
+                db.FieldSoil.version,
+                db.FieldSoil.class_ph,
+                db.FieldSoil.class_p2o5,
+                db.FieldSoil.class_k2o,
+                db.FieldSoil.class_mg,
+            ],
+            select(
+                new.id,
+                db.FieldSoil.sample_id,
+                db.FieldSoil.version,
+                db.FieldSoil.class_ph,
+                db.FieldSoil.class_p2o5,
+                db.FieldSoil.class_k2o,
+                db.FieldSoil.class_mg,
+            )
+            .join(old, old.id == db.FieldSoil.field_id)
+            .join(new, pairs)
+            .where(new.base_id.not_in(sampled)),
+        )
+    )
+    if sampled:
+        update_soil_index(sampled, guidelines=guidelines)
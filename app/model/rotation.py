@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import app.database.model as db
+from app.database.types import (
+    CropClass,
+    CultivationType,
+    DemandType,
+    FieldType,
+    LegumeType,
+    ResidueType,
+)
+
+from . import guidelines
+from .balance import Balance
+from .blocking_period import FIELD_FORAGE_TYPES
+from .crop import Crop
+from .cultivation import Cultivation, create_cultivation
+
+# crop id, residues and yield of a main crop, all that the following year depends on
+CropState = tuple[int, ResidueType, Decimal]
+Options = tuple[DemandType, DemandType, DemandType]
+
+
+@dataclass
+class RotationStep:
+    """Main crop of a year with the nutrients that still have to be fertilized per ha."""
+
+    year: int
+    crop_id: int
+    crop: str
+    residues: ResidueType
+    n: Decimal
+    p2o5: Decimal
+    k2o: Decimal
+
+    @property
+    def score(self) -> Decimal:
+        return self.n + self.p2o5 + self.k2o
+
+    def to_dict(self) -> dict:
+        return {
+            "year": self.year,
+            "crop_id": self.crop_id,
+            "crop": self.crop,
+            "residues": self.residues.name,
+            "n": float(self.n),
+            "p2o5": float(self.p2o5),
+            "k2o": float(self.k2o),
+        }
+
+
+@dataclass
+class RotationPlan:
+    """Crop sequence of a base field following the field-year `field_id`."""
+
+    base_id: int
+    field_id: int
+    name: str
+    steps: list[RotationStep] = field(default_factory=list)
+
+    @property
+    def score(self) -> Decimal:
+        return sum((step.score for step in self.steps), Decimal())
+
+    def to_dict(self) -> dict:
+        return {
+            "base_id": self.base_id,
+            "field_id": self.field_id,
+            "name": self.name,
+            "score": float(self.score),
+            "steps": [step.to_dict() for step in self.steps],
+        }
+
+
+def plan_rotations(
+    user_id: int,
+    year: int,
+    years: int = 3,
+    crop_ids: list[int] | None = None,
+    *,
+    guidelines: guidelines = guidelines,
+) -> list[RotationPlan]:
+    """
+    Plan the main crops of all cropland base fields from `year` on for `years` years,
+    following their crop of the previous year. A sequence is scored by the N, P2O5 and
+    K2O that remain to be fertilized after the pre-crop effect, the legume delivery and
+    the redelivery of crop residues, the lowest score wins. A crop type doesn't follow
+    itself, except for perennial field forage.
+    The best sequences are memoized by demand options, remaining years and the state of
+    the previous crop and shared between all fields, branches that can't beat the best
+    sequence so far are pruned.
+
+    :param crop_ids:
+        Main crops to choose from, all main crops of the user on cropland by default.
+    """
+    query = db.Crop.query.filter(
+        db.Crop.user_id == user_id,
+        db.Crop.crop_class == CropClass.main_crop,
+        db.Crop.field_type == FieldType.cropland,
+    )
+    if crop_ids is not None:
+        query = query.filter(db.Crop.id.in_(crop_ids))
+    planner = _RotationPlanner(query.order_by(db.Crop.id).all(), guidelines)
+
+    fields = (
+        db.Field.query.join(db.BaseField)
+        .filter(
+            db.BaseField.user_id == user_id,
+            db.Field.year == year - 1,
+            db.Field.field_type == FieldType.cropland,
+        )
+        .order_by(db.BaseField.prefix, db.BaseField.suffix, db.Field.partition)
+        .all()
+    )
+    plans = []
+    for db_field in fields:
+        previous = planner.previous_state(db_field)
+        options = (db_field.demand_p2o5, db_field.demand_k2o, db_field.demand_mgo)
+        plan = RotationPlan(
+            base_id=db_field.base_id, field_id=db_field.id, name=db_field.base_field.name
+        )
+        _, states = planner.best(options, years, previous)
+        for offset, state in enumerate(states):
+            n, p2o5, k2o = planner.needs(options, previous, state)
+            cultivation = planner.cultivation(state)
+            plan.steps.append(
+                RotationStep(
+                    year=year + offset,
+                    crop_id=state[0],
+                    crop=cultivation.crop.name,
+                    residues=state[1],
+                    n=n,
+                    p2o5=p2o5,
+                    k2o=k2o,
+                )
+            )
+            previous = state
+        plans.append(plan)
+    return plans
+
+
+class _RotationPlanner:
+    """Memoized search of the crop sequences, shared by all fields of the farm."""
+
+    def __init__(self, crops: list[db.Crop], guidelines: guidelines):
+        self._guidelines = guidelines
+        self._crops: dict[int, db.Crop] = {crop.id: crop for crop in crops}
+        self._cultivations: dict[CropState, Cultivation] = {}
+        self._demands: dict[tuple[Options, CropState], Balance] = {}
+        self._redeliveries: dict[tuple[Options, CropState], Balance] = {}
+        self._lower_bounds: dict[Options, Decimal] = {}
+        self._memo: dict[tuple[Options, int, CropState | None], tuple[Decimal, tuple]] = {}
+        self.candidates: list[CropState] = [
+            (crop.id, residues, Decimal(crop.target_yield or 0))
+            for crop in crops
+            for residues in (
+                (ResidueType.main_stayed, ResidueType.main_removed)
+                if crop.residue
+                else (ResidueType.none,)
+            )
+        ]
+
+    def previous_state(self, db_field: db.Field) -> CropState | None:
+        """State of the last main or second crop of the field-year."""
+        previous = None
+        for cultivation in db_field.cultivations:
+            if cultivation.cultivation_type is CultivationType.catch_crop:
+                continue
+            if previous is None or cultivation.cultivation_type is not CultivationType.main_crop:
+                previous = cultivation
+        if previous is None:
+            return None
+        self._crops.setdefault(previous.crop.id, previous.crop)
+        return (previous.crop.id, previous.residues, Decimal(previous.crop_yield or 0))
+
+    def cultivation(self, state: CropState) -> Cultivation:
+        if state not in self._cultivations:
+            crop_id, residues, crop_yield = state
+            crop = self._crops[crop_id]
+            self._cultivations[state] = create_cultivation(
+                db.Cultivation(
+                    cultivation_type=CultivationType.main_crop,
+                    crop_yield=crop_yield,
+                    nmin_30=0,
+                    nmin_60=0,
+                    nmin_90=0,
+                    legume_rate=LegumeType.none,
+                    residues=residues,
+                ),
+                Crop(crop, guidelines=self._guidelines),
+                guidelines=self._guidelines,
+            )
+        return self._cultivations[state]
+
+    def needs(
+        self, options: Options, previous: CropState | None, state: CropState
+    ) -> tuple[Decimal, Decimal, Decimal]:
+        """N, P2O5 and K2O left to fertilize for the crop of `state` after `previous`."""
+        cultivation = self.cultivation(state)
+        key = (options, state)
+        if key not in self._demands:
+            demand = cultivation.demand(*options)
+            demand.n += cultivation.legume_delivery()
+            self._demands[key] = demand
+        balance = self._demands[key]
+        if previous is not None:
+            balance = balance + self._redelivery(options, previous)
+        return (
+            max(-balance.n, Decimal()),
+            max(-balance.p2o5, Decimal()),
+            max(-balance.k2o, Decimal()),
+        )
+
+    def best(
+        self, options: Options, years: int, previous: CropState | None
+    ) -> tuple[Decimal, tuple[CropState, ...]]:
+        """Lowest score and its sequence of states for the remaining `years`."""
+        if years == 0:
+            return Decimal(), ()
+        key = (options, years, previous)
+        if key in self._memo:
+            return self._memo[key]
+        previous_type = self.cultivation(previous).crop_type if previous else None
+        steps = sorted(
+            (
+                (sum(self.needs(options, previous, state)), state)
+                for state in self.candidates
+                if self.cultivation(state).crop_type is not previous_type
+                or previous_type in FIELD_FORAGE_TYPES
+            ),
+            key=lambda step: (step[0], step[1][0], step[1][1].name),
+        )
+        bound = self._lower_bound(options) * (years - 1)
+        best = (Decimal(), ())
+        for index, (score, state) in enumerate(steps):
+            if index and score + bound >= best[0]:
+                # steps are sorted, no following one can beat the best sequence
+                break
+            rest, states = self.best(options, years - 1, state)
+            if not index or score + rest < best[0]:
+                best = (score + rest, (state, *states))
+        self._memo[key] = best
+        return best
+
+    def _redelivery(self, options: Options, previous: CropState) -> Balance:
+        """Pre-crop effect and residue redelivery of the previous crop."""
+        key = (options, previous)
+        if key not in self._redeliveries:
+            cultivation = self.cultivation(previous)
+            redelivery = Balance("Redelivery", n=cultivation.pre_crop_effect())
+            if cultivation.residues is ResidueType.main_stayed and DemandType.demand in options:
+                byproduct = cultivation.crop.demand_byproduct(cultivation.crop_yield)
+                for nutrient, option in zip(("p2o5", "k2o", "mgo"), options):
+                    if option is DemandType.demand:
+                        setattr(redelivery, nutrient, getattr(byproduct, nutrient))
+            self._redeliveries[key] = redelivery
+        return self._redeliveries[key]
+
+    def _lower_bound(self, options: Options) -> Decimal:
+        """Lowest score of any single year, a bound for every remaining year."""
+        if options not in self._lower_bounds:
+            previous = [None, *self.candidates]
+            self._lower_bounds[options] = min(
+                (
+                    sum(self.needs(options, state_before, state))
+                    for state_before in previous
+                    for state in self.candidates
+                ),
+                default=Decimal(),
+            )
+        return self._lower_bounds[options]
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from flask import current_app
+from loguru import logger
+from sqlalchemy import insert, or_, select, update
+
+import app.database.model as db
+from app.extensions import db as _db
+
+from . import guidelines
+from .field import create_field
+
+# app context of a process pool worker, see `_init_worker`
+_worker_context = None
+
+
+@dataclass
+class RecomputeReport:
+    """Result of a balance recomputation."""
+
+    fields: int = 0
+    failed: list[int] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Computed field-years per second."""
+        return self.fields / self.seconds if self.seconds else 0.0
+
+
+def compute_saldos(
+    field_ids: Iterable[int], *, guidelines: guidelines = guidelines
+) -> tuple[list[dict], list[dict], list[int]]:
+    """
+    Compute the total balance of field-years as `Saldo` rows and their running lime
+    balance as `LimeBalance` rows.
+
+    :return:
+        Saldo rows and lime balance rows as dicts and the ids of the field-years that failed.
+    """
+    rows, lime_rows, failed = [], [], []
+    for field_id in field_ids:
+        try:
+            field = create_field(field_id, guidelines=guidelines)
+            balance = field.total_balance()
+            n_total = field.n_total()
+            lime = field.lime_balance()
+        except Exception as e:  # noqa: BLE001
+            logger.warning(f"Balance of {field_id=} failed: {e!r}")
+            failed.append(field_id)
+            continue
+        rows.append(
+            {
+                "field_id": field_id,
+                "n": balance.n,
+                "p2o5": balance.p2o5,
+                "k2o": balance.k2o,
+                "mgo": balance.mgo,
+                "s": balance.s,
+                "cao": balance.cao,
+                "n_total": Decimal(n_total),
+                "dirty": False,
+            }
+        )
+        lime_rows.append({"field_id": field_id, "cao": lime})
+    return rows, lime_rows, failed
+
+
+def get_saldo_field_ids(
+    year: int | None = None, user_id: int | None = None, only_dirty: bool = True
+) -> list[tuple[int, int]]:
+    """
+    Field-years whose `Saldo` has to be recomputed, dirty or missing ones by default.
+
+    :return:
+        Tuples of field id and year, ordered by year.
+    """
+    query = (
+        select(db.Field.id, db.Field.year)
+        .join(db.BaseField)
+        .outerjoin(db.Saldo)
+        .order_by(db.Field.year, db.Field.id)
+    )
+    if year is not None:
+        query = query.where(db.Field.year == year)
+    if user_id is not None:
+        query = query.where(db.BaseField.user_id == user_id)
+    if only_dirty:
+        query = query.where(or_(db.Saldo.field_id.is_(None), db.Saldo.dirty.is_(True)))
+    return [(field_id, year) for field_id, year in _db.session.execute(query)]
+
+
+def save_saldos(rows: list[dict], model: type[db.Saldo | db.LimeBalance] = db.Saldo) -> None:
+    """
+    Bulk upsert `Saldo` rows, or `LimeBalance` rows with `model`, one executemany for
+    updates and one for inserts.
+    """
+    if not rows:
+        return
+    ids = [row["field_id"] for row in rows]
+    existing = set(
+        _db.session.execute(select(model.field_id).where(model.field_id.in_(ids))).scalars()
+    )
+    updates = [row for row in rows if row["field_id"] in existing]
+    inserts = [row for row in rows if row["field_id"] not in existing]
+    if updates:
+        _db.session.execute(update(model), updates)
+    if inserts:
+        _db.session.execute(insert(model), inserts)
+
+
+def recompute_saldos(
+    field_years: list[tuple[int, int]],
+    workers: int = 0,
+    chunk_size: int = 50,
+    progress: Callable[[int, int], None] | None = None,
+    *,
+    guidelines: guidelines = guidelines,
+) -> RecomputeReport:
+    """
+    Recompute and store the `Saldo` of field-years, one year after another because every
+    year builds on the lime balance of the previous one. Within a year the field-years are
+    sharded across a process pool of `workers`, `0` computes them in this process.
+    Each year is committed on its own, together with the lime balances of its field-years
+    that the next year builds on.
+
+    :param field_years:
+        Tuples of field id and year, e.g. from `get_saldo_field_ids`.
+    :param progress:
+        Called with the number of done and total field-years after every year.
+    """
+    report = RecomputeReport()
+    start = time.perf_counter()
+    years: dict[int, list[int]] = {}
+    for field_id, year in field_years:
+        years.setdefault(year, []).append(field_id)
+
+    executor = None
+    if workers:
+        database_uri = current_app.config["SQLALCHEMY_DATABASE_URI"]
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(database_uri,))
+    try:
+        for year, field_ids in sorted(years.items()):
+            if executor is None:
+                rows, lime_rows, failed = compute_saldos(field_ids, guidelines=guidelines)
+            else:
+                rows, lime_rows, failed = [], [], []
+                shards = [
+                    field_ids[i : i + chunk_size] for i in range(0, len(field_ids), chunk_size)
+                ]
+                for shard_rows, shard_lime_rows, shard_failed in executor.map(
+                    _compute_shard, shards
+                ):
+                    rows += shard_rows
+                    lime_rows += shard_lime_rows
+                    failed += shard_failed
+            save_saldos(rows)
+            save_saldos(lime_rows, db.LimeBalance)
+            _db.session.commit()
+            report.fields += len(rows)
+            report.failed += failed
+            if progress is not None:
+                progress(report.fields + len(report.failed), len(field_years))
+            logger.info(f"Recomputed {len(rows)} balances of {year}.")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _init_worker(database_uri: str) -> None:
+    """Create an app with its own database engine in every worker process."""
+    from app.app import create_app
+    from config import Config
+
+    global _worker_context
+    config = type("WorkerConfig", (Config,), {"SQLALCHEMY_DATABASE_URI": database_uri})
+    _worker_context = create_app(config).app_context()
+    _worker_context.push()
+
+
+def _compute_shard(field_ids: list[int]) -> tuple[list[dict], list[dict], list[int]]:
+    result = compute_saldos(field_ids)
+    # ends the read transaction, the next year sees the lime balances the main process wrote
+    _db.session.rollback()
+    return result
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import copy
+from decimal import Decimal
+
+import app.database.model as db
+from app.database.types import CultivationType, LegumeType, MeasureType, ResidueType
+from app.extensions import db as _db
+
+from . import guidelines
+from .balance import Balance
+from .crop import Crop
+from .cultivation import Cultivation, create_cultivation
+from .fertilization import Fertilization
+from .fertilizer import create_fertilizer
+from .field import Field
+
+CULTIVATION_ATTRIBUTES = (
+    "crop_yield",
+    "crop_protein",
+    "nmin_30",
+    "nmin_60",
+    "nmin_90",
+    "legume_rate",
+    "residues",
+)
+
+
+class Scenario:
+    """
+    What-if layer over a `Field` that changes cultivations and fertilizations in memory.
+
+    The field is copied on write, so the original field and its previous years stay
+    untouched and nothing is written to the database. Every balance line is cached and
+    a change only drops the lines that depend on it.
+    """
+
+    def __init__(self, field: Field, *, guidelines: guidelines = guidelines):
+        self.base = field
+        self.field = copy.copy(field)
+        self._guidelines = guidelines
+        self._lines: dict[str, Balance] = {}
+        self._copied: set[str] = set()
+        self._base_total: Balance | None = None
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._copied)
+
+    def add_fertilization(
+        self,
+        fertilizer_id: int,
+        amount: Decimal,
+        measure: MeasureType,
+        cultivation_type: CultivationType,
+    ) -> Fertilization:
+        """
+        Add a fertilization of a fertilizer of the user to a cultivation of the field.
+
+        :raises ValueError:
+            Fertilizer or cultivation doesn't exist.
+        """
+        fertilizer = _db.session.get(db.Fertilizer, fertilizer_id)
+        if fertilizer is None or fertilizer.user_id != self.field.user_id:
+            raise ValueError(f"Unknown fertilizer: {fertilizer_id}")
+        cultivation = self._get_cultivation(cultivation_type)
+        fertilization = Fertilization(
+            db.Fertilization(amount=Decimal(amount), measure=measure),
+            create_fertilizer(fertilizer, guidelines=self._guidelines),
+            cultivation.crop.feedable,
+            cultivation.cultivation_type,
+        )
+        self._fertilizations().append(fertilization)
+        self._invalidate_fertilization(fertilization)
+        return fertilization
+
+    def remove_fertilization(self, index: int) -> None:
+        """Remove the fertilization at `index` of `field.fertilizations`."""
+        fertilization = self._fertilizations().pop(index)
+        self._invalidate_fertilization(fertilization)
+
+    def modify_fertilization(
+        self, index: int, amount: Decimal | None = None, measure: MeasureType | None = None
+    ) -> None:
+        """Change amount or measure of the fertilization at `index` of `field.fertilizations`."""
+        fertilizations = self._fertilizations()
+        fertilization = fertilizations[index] = copy.copy(fertilizations[index])
+        if amount is not None:
+            fertilization.amount = Decimal(amount)
+        if measure is not None:
+            fertilization.measure = measure
+        self._invalidate_fertilization(fertilization)
+
+    def add_cultivation(
+        self, crop_id: int, cultivation_type: CultivationType, **attributes
+    ) -> Cultivation:
+        """
+        Add or replace the cultivation of `cultivation_type` with a crop of the user.
+        `attributes` are the values of `CULTIVATION_ATTRIBUTES`, the yield defaults to the
+        target yield of the crop.
+
+        :raises ValueError:
+            Crop doesn't exist.
+        """
+        crop = _db.session.get(db.Crop, crop_id)
+        if crop is None or crop.user_id != self.field.user_id:
+            raise ValueError(f"Unknown crop: {crop_id}")
+        data = {
+            "crop_yield": crop.target_yield,
+            "nmin_30": 0,
+            "nmin_60": 0,
+            "nmin_90": 0,
+            "legume_rate": LegumeType.none,
+            "residues": ResidueType.none,
+            **_cultivation_data(attributes),
+        }
+        cultivation = create_cultivation(
+            db.Cultivation(cultivation_type=cultivation_type, **data),
+            Crop(crop, guidelines=self._guidelines),
+            guidelines=self._guidelines,
+        )
+        cultivations = self._cultivations()
+        cultivations[:] = [c for c in cultivations if c.cultivation_type is not cultivation_type]
+        cultivations.append(cultivation)
+        # fertilizations of a replaced cultivation now feed the new crop
+        fertilizations = self._fertilizations()
+        for index, fertilization in enumerate(fertilizations):
+            if fertilization.cultivation_type is cultivation_type:
+                fertilization = fertilizations[index] = copy.copy(fertilization)
+                fertilization._crop_feedable = crop.feedable
+        self._lines.clear()
+        return cultivation
+
+    def remove_cultivation(self, cultivation_type: CultivationType) -> None:
+        """Remove the cultivation of `cultivation_type` together with its fertilizations."""
+        cultivation = self._get_cultivation(cultivation_type)
+        self._cultivations().remove(cultivation)
+        self._fertilizations()[:] = [
+            fertilization
+            for fertilization in self.field.fertilizations
+            if fertilization.cultivation_type is not cultivation_type
+        ]
+        self._lines.clear()
+
+    def modify_cultivation(self, cultivation_type: CultivationType, **attributes) -> None:
+        """Change `CULTIVATION_ATTRIBUTES` of the cultivation of `cultivation_type`."""
+        cultivations = self._cultivations()
+        index = cultivations.index(self._get_cultivation(cultivation_type))
+        cultivation = cultivations[index] = copy.copy(cultivations[index])
+        for name, value in _cultivation_data(attributes).items():
+            setattr(cultivation, name, value)
+        self._lines.clear()
+
+    def lines(self) -> dict[str, Balance]:
+        """
+        Balance lines of the scenario that add up to `total_balance`: the crop needs of every
+        cultivation after reductions, the fertilizations and the modifiers.
+        """
+        field = self.field
+        lines = {}
+        for cultivation in field.cultivations:
+            key = cultivation.cultivation_type.name
+            if key not in self._lines:
+                balance = field.demands(cultivation) + field.reductions(cultivation)
+                field.adjust_nutritional_needs(balance)
+                balance.title = cultivation.crop.name
+                self._lines[key] = balance
+            lines[key] = self._lines[key]
+        if "fertilizations" not in self._lines:
+            self._lines["fertilizations"] = field.sum_fertilizations()
+        if "modifiers" not in self._lines:
+            self._lines["modifiers"] = field.sum_modifiers()
+        lines["fertilizations"] = self._lines["fertilizations"]
+        lines["modifiers"] = self._lines["modifiers"]
+        return lines
+
+    def total_balance(self) -> Balance:
+        """Same result as `Field.total_balance` of the changed field."""
+        balance = Balance("Field balance")
+        for line in self.lines().values():
+            balance += line
+        return balance
+
+    def base_balance(self) -> Balance:
+        """Total balance of the unchanged field."""
+        if self._base_total is None:
+            self._base_total = self.base.total_balance()
+        return self._base_total
+
+    def difference(self) -> Balance:
+        """Change of the total balance compared to the unchanged field."""
+        difference = self.total_balance() - self.base_balance()
+        difference.title = "Difference"
+        return difference
+
+    def _cultivations(self) -> list[Cultivation]:
+        if "cultivations" not in self._copied:
+            self.field.cultivations = list(self.base.cultivations)
+            self._copied.add("cultivations")
+        return self.field.cultivations
+
+    def _fertilizations(self) -> list[Fertilization]:
+        if "fertilizations" not in self._copied:
+            self.field.fertilizations = list(self.base.fertilizations)
+            self._copied.add("fertilizations")
+        return self.field.fertilizations
+
+    def _get_cultivation(self, cultivation_type: CultivationType) -> Cultivation:
+        for cultivation in self.field.cultivations:
+            if cultivation.cultivation_type is cultivation_type:
+                return cultivation
+        raise ValueError(f"No cultivation of type: {cultivation_type}")
+
+    def _invalidate_fertilization(self, fertilization: Fertilization) -> None:
+        """
+        Fertilizations count towards the fertilization line and the sulphur reduction of
+        their cultivation, catch crop fertilizations are redelivered to the main crop.
+        """
+        self._lines.pop("fertilizations", None)
+        self._lines.pop(fertilization.cultivation_type.name, None)
+        if fertilization.cultivation_type is CultivationType.catch_crop:
+            self._lines.pop(CultivationType.main_crop.name, None)
+
+
+def _cultivation_data(attributes: dict) -> dict:
+    unknown = set(attributes) - set(CULTIVATION_ATTRIBUTES)
+    if unknown:
+        raise ValueError(f"Unknown cultivation attributes: {', '.join(sorted(unknown))}")
+    return attributes
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from app.database.types import DemandType, ResidueType
+
+from .crop import Crop
+from .cultivation import CatchCrop
+from .field import Field
+
+# grid points per axis
+MAX_GRID_SIZE = 201
+
+
+@dataclass
+class DemandGrid:
+    """
+    Nutrient demand of a crop over a grid of yields and protein contents.
+    `n[i][j]` is the N demand at `yields[i]` and `proteins[j]`, the other nutrients
+    don't depend on the protein content and have one value per yield.
+    """
+
+    name: str
+    yields: list[Decimal]
+    proteins: list[Decimal]
+    n: list[list[Decimal]] = field(default_factory=list)
+    p2o5: list[Decimal] = field(default_factory=list)
+    k2o: list[Decimal] = field(default_factory=list)
+    mgo: list[Decimal] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "yields": [float(value) for value in self.yields],
+            "proteins": [float(value) for value in self.proteins],
+            "n": [[float(value) for value in row] for row in self.n],
+            "p2o5": [float(value) for value in self.p2o5],
+            "k2o": [float(value) for value in self.k2o],
+            "mgo": [float(value) for value in self.mgo],
+        }
+
+
+def grid_range(center: Decimal, spread: Decimal, points: int) -> list[Decimal]:
+    """`points` evenly spaced values from `center - spread` to `center + spread`."""
+    if not 1 <= points <= MAX_GRID_SIZE:
+        raise ValueError(f"Grid size has to be between 1 and {MAX_GRID_SIZE}.")
+    center, spread = Decimal(center), Decimal(spread)
+    if not center.is_finite() or not spread.is_finite() or spread < 0:
+        raise ValueError("Grid range has to be finite with a non-negative spread.")
+    if points == 1:
+        return [center]
+    step = 2 * spread / (points - 1)
+    return [center - spread + step * i for i in range(points)]
+
+
+def demand_grid(
+    crop: Crop,
+    yields: Sequence[Decimal],
+    proteins: Sequence[Decimal] | None = None,
+    options: tuple[DemandType, DemandType, DemandType] | None = None,
+    residues: ResidueType = ResidueType.none,
+) -> DemandGrid:
+    """
+    Demand of `crop` like `Cultivation.demand` for every combination of `yields` and
+    `proteins`, as positive values. N demand is the sum of a yield and a protein term,
+    so both are computed once per axis and only added up for the grid.
+
+    :param proteins:
+        Protein contents, the target protein of the crop by default.
+    :param options:
+        Demand options of P2O5, K2O and MgO, the byproduct counts towards the demand
+        like in `Cultivation.demand`. Without options only the crop itself is counted.
+    """
+    if len(yields) > MAX_GRID_SIZE or proteins is not None and len(proteins) > MAX_GRID_SIZE:
+        raise ValueError(f"Grid size has to be between 1 and {MAX_GRID_SIZE}.")
+    proteins = [crop.target_protein or Decimal()] if proteins is None else proteins
+    yields = [Decimal(value) for value in yields]
+    proteins = [Decimal(value) for value in proteins]
+
+    target_yield = Decimal(crop.target_yield or 0)
+    yield_terms = [
+        crop.target_demand
+        + Decimal(str(crop.pos_yield if target_yield < value else crop.neg_yield))
+        * (value - target_yield)
+        for value in yields
+    ]
+    target_protein = crop.target_protein or Decimal()
+    protein_terms = [
+        (crop.var_protein or Decimal()) * (value - target_protein) for value in proteins
+    ]
+
+    byproduct = _byproduct_factors(options, residues)
+    byp_ratio = crop.byp_ratio or Decimal()
+    rates = {
+        nutrient: (getattr(crop, nutrient) or Decimal())
+        + factor * byp_ratio * (getattr(crop, f"byp_{nutrient}") or Decimal())
+        for nutrient, factor in byproduct.items()
+    }
+    return DemandGrid(
+        name=crop.name,
+        yields=yields,
+        proteins=proteins,
+        n=[
+            [yield_term + protein_term for protein_term in protein_terms]
+            for yield_term in yield_terms
+        ],
+        p2o5=[rates["p2o5"] * value for value in yields],
+        k2o=[rates["k2o"] * value for value in yields],
+        mgo=[rates["mgo"] * value for value in yields],
+    )
+
+
+def field_demand_grids(
+    field: Field,
+    points: int = 11,
+    spread: Decimal = Decimal("0.5"),
+    proteins: Sequence[Decimal] | None = None,
+) -> dict[str, DemandGrid]:
+    """
+    Demand grids of the cultivations of a field with its demand options, the yields
+    range over `spread` of the yield of each cultivation. Catch crops have a fixed
+    demand and are left out.
+
+    :return:
+        `DemandGrid` by name of the `CultivationType`.
+    """
+    options = (field.option_p2o5, field.option_k2o, field.option_mgo)
+    grids = {}
+    for cultivation in field.cultivations:
+        if isinstance(cultivation, CatchCrop):
+            continue
+        crop_yield = Decimal(cultivation.crop_yield or cultivation.crop.target_yield or 0)
+        grids[cultivation.cultivation_type.name] = demand_grid(
+            cultivation.crop,
+            grid_range(crop_yield, crop_yield * spread, points),
+            proteins if proteins is not None else [cultivation.crop_protein or Decimal()],
+            options,
+            cultivation.residues,
+        )
+    return grids
+
+
+def _byproduct_factors(
+    options: tuple[DemandType, DemandType, DemandType] | None, residues: ResidueType
+) -> dict[str, int]:
+    """Whether the byproduct counts towards the demand per nutrient, see `Cultivation.demand`."""
+    if options is None:
+        return {"p2o5": 0, "k2o": 0, "mgo": 0}
+    counted = (
+        any(option is DemandType.demand for option in options)
+        or residues is ResidueType.main_removed
+    )
+    return {
+        nutrient: int(counted and option is not DemandType.removal)
+        for nutrient, option in zip(("p2o5", "k2o", "mgo"), options)
+    }
@@ -196,6 +196,17 @@ class Soil:
             logger.warning(e)
             return ""
 
+    def classes(self) -> dict[str, SoilClass | str]:
+        """
+        All soil classes of the sample, in the same form as `FieldSoil.classes`.
+        """
+        return {
+            "ph": self.class_ph(),
+            "p2o5": self.class_p2o5(),
+            "k2o": self.class_k2o(),
+            "mg": self.class_mg(),
+        }
+
     def optimal_ph(self) -> Decimal:
         ph_classes = self._guidelines.ph_classes()
         try:
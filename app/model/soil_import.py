@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import csv
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from loguru import logger
+
+import app.database.model as db
+from app.database.types import HumusType, SoilType
+from app.extensions import db as _db
+
+from . import guidelines
+from .soil_index import update_soil_index
+
+SOIL_IMPORT_COLUMNS = ("prefix", "suffix", "year", "soil_type", "humus", "ph", "p2o5", "k2o", "mg")
+
+
+class SoilImportError(ValueError):
+    pass
+
+
+@dataclass
+class SoilImportReport:
+    """
+    Result of a soil sample import.
+    `errors` holds the line number and the reason of every rejected row.
+    """
+
+    imported: int = 0
+    base_ids: set[int] = field(default_factory=set)
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def rows(self) -> int:
+        return self.imported + len(self.errors)
+
+    def to_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "errors": [{"line": line, "error": error} for line, error in self.errors],
+        }
+
+
+def import_soil_samples(
+    lines: Iterable[str],
+    user_id: int,
+    *,
+    delimiter: str = ";",
+    guidelines: guidelines = guidelines,
+) -> SoilImportReport:
+    """
+    Import soil samples of lab results in csv format.
+    Rows are read one at a time and matched to the base fields of the user by `prefix` and
+    `suffix`. Rejected rows are reported, all valid rows are added in the current transaction
+    and classified in one pass. Flushes the session, committing is left to the caller.
+
+    :param lines:
+        Csv lines with a header of `SOIL_IMPORT_COLUMNS`, e.g. an open text file.
+    :param user_id:
+        Id of the user whose base fields the samples belong to.
+    :param delimiter:
+        Csv delimiter, decimal commas are accepted.
+    :raises SoilImportError:
+        Header is missing required columns.
+    """
+    reader = csv.DictReader(lines, delimiter=delimiter)
+    missing = set(SOIL_IMPORT_COLUMNS) - set(reader.fieldnames or ())
+    if missing:
+        raise SoilImportError(f"Missing columns: {', '.join(sorted(missing))}")
+
+    base_fields: dict[tuple[int, int], int] = {
+        (prefix, suffix): base_id
+        for base_id, prefix, suffix in _db.session.execute(
+            _db.select(db.BaseField.id, db.BaseField.prefix, db.BaseField.suffix).where(
+                db.BaseField.user_id == user_id
+            )
+        )
+    }
+    existing: set[tuple[int, int]] = {
+        (base_id, year)
+        for base_id, year in _db.session.execute(
+            _db.select(db.SoilSample.base_id, db.SoilSample.year)
+            .join(db.BaseField)
+            .where(db.BaseField.user_id == user_id)
+        )
+    }
+
+    report = SoilImportReport()
+    samples: list[db.SoilSample] = []
+    for row in reader:
+        try:
+            base_id = base_fields.get((_to_int(row["prefix"]), _to_int(row["suffix"])))
+            if base_id is None:
+                raise SoilImportError(f"Unknown field {row['prefix']}-{row['suffix']}")
+            year = _to_int(row["year"])
+            if (base_id, year) in existing:
+                raise SoilImportError(f"Soil sample for {year} already exists.")
+            sample = db.SoilSample(
+                base_id=base_id,
+                year=year,
+                soil_type=_to_enum(SoilType, row["soil_type"]),
+                humus=_to_enum(HumusType, row["humus"]),
+                ph=_to_decimal(row["ph"]),
+                p2o5=_to_decimal(row["p2o5"]),
+                k2o=_to_decimal(row["k2o"]),
+                mg=_to_decimal(row["mg"]),
+            )
+        except SoilImportError as e:
+            report.errors.append((reader.line_num, str(e)))
+            continue
+        existing.add((base_id, year))
+        samples.append(sample)
+        report.base_ids.add(base_id)
+
+    _db.session.add_all(samples)
+    _db.session.flush()
+    # classifies all new samples in one pass before indexing them
+    if report.base_ids:
+        update_soil_index(report.base_ids, guidelines=guidelines)
+    report.imported = len(samples)
+    logger.info(
+        f"Imported {report.imported} of {report.rows} soil samples for {user_id=}, "
+        f"{len(report.errors)} rejected."
+    )
+    return report
+
+
+def _to_int(value: str | None) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise SoilImportError(f"Invalid number '{value}'")
+
+
+def _to_decimal(value: str | None) -> Decimal | None:
+    if value is None or not value.strip():
+        return None
+    try:
+        number = Decimal(value.strip().replace(",", "."))
+    except InvalidOperation:
+        raise SoilImportError(f"Invalid value '{value}'")
+    if not number.is_finite():
+        raise SoilImportError(f"Invalid value '{value}'")
+    if number < 0:
+        raise SoilImportError(f"Negative value '{value}'")
+    return number
+
+
+def _to_enum(enum_type: type[SoilType | HumusType], value: str | None):
+    """Accept the name (`sand`) or the displayed value (`Sand`) of the enum."""
+    value = (value or "").strip()
+    try:
+        return enum_type[value]
+    except KeyError:
+        pass
+    try:
+        return enum_type(value)
+    except ValueError:
+        raise SoilImportError(f"Invalid {enum_type.__name__} '{value}'")
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Iterable
+
+from loguru import logger
+
+import app.database.model as db
+from app.database.types import FieldType, SoilClass
+from app.extensions import db as _db
+
+from . import guidelines
+from .soil import Soil
+
+# field types that have soil class tables in the guidelines
+CLASSIFIED_FIELD_TYPES = (FieldType.cropland, FieldType.grassland)
+SOIL_CLASS_COLUMNS = {
+    "ph": db.SoilClassification.class_ph,
+    "p2o5": db.SoilClassification.class_p2o5,
+    "k2o": db.SoilClassification.class_k2o,
+    "mg": db.SoilClassification.class_mg,
+}
+
+
+def classify_soil_samples(
+    sample_ids: Iterable[int] | None = None, *, guidelines: guidelines = guidelines
+) -> set[int]:
+    """
+    Persist the soil classes of soil samples for every classified field type.
+    Only classifications that are missing or were computed with other guidelines are updated.
+    Flushes the session, committing is left to the caller.
+
+    :param sample_ids:
+        Ids of the soil samples to classify, `None` classifies all samples.
+    :return:
+        Ids of the base fields with updated classifications.
+    """
+    version = guidelines.version()
+    query = db.SoilSample.query
+    if sample_ids is not None:
+        query = query.filter(db.SoilSample.id.in_(list(sample_ids)))
+
+    updated = set()
+    for sample in query:
+        for field_type in CLASSIFIED_FIELD_TYPES:
+            classification = sample.get_classification(field_type)
+            if classification is not None and classification.version == version:
+                continue
+            if classification is None:
+                classification = db.SoilClassification(field_type=field_type)
+                sample.classifications.append(classification)
+            classes = Soil(sample, field_type, guidelines).classes()
+            classification.version = version
+            classification.class_ph = classes["ph"] or None
+            classification.class_p2o5 = classes["p2o5"] or None
+            classification.class_k2o = classes["k2o"] or None
+            classification.class_mg = classes["mg"] or None
+            updated.add(sample.base_id)
+    _db.session.flush()
+    logger.info(f"Classified soil samples of {len(updated)} base fields.")
+    return updated
+
+
+def soil_classes(
+    sample: db.SoilSample,
+    field_type: FieldType,
+    index: db.FieldSoil | None = None,
+    *,
+    guidelines: guidelines = guidelines,
+) -> dict[str, SoilClass | str]:
+    """
+    Soil classes of a sample, read from the soil index of the field-year or the persisted
+    classification if they are up to date with the guidelines.
+
+    :param sample:
+        Soil sample database object.
+    :param field_type:
+        `FieldType` of the field the sample is used on.
+    :param index:
+        `FieldSoil` of the field-year, used if it indexes `sample`.
+    """
+    version = guidelines.version()
+    if index is not None and index.sample_id == sample.id and index.version == version:
+        return index.classes
+    classification = sample.get_classification(field_type)
+    if classification is not None and classification.version == version:
+        return classification.classes
+    return Soil(sample, field_type, guidelines).classes()
+
+
+def update_soil_index(
+    base_ids: Iterable[int] | None = None, *, guidelines: guidelines = guidelines
+) -> int:
+    """
+    Recalculate the effective soil sample and its soil classes for every field-year
+    of the given base fields. Outdated soil classifications of their samples are
+    recomputed first. Flushes the session, committing is left to the caller.
+
+    :param base_ids:
+        Ids of the base fields to update, `None` updates all base fields.
+    :return:
+        Number of field-years that have an effective soil sample.
+    """
+    field_query = db.Field.query
+    sample_query = db.SoilSample.query.order_by(db.SoilSample.year)
+    index_query = db.FieldSoil.query
+    if base_ids is not None:
+        base_ids = list(base_ids)
+        field_query = field_query.filter(db.Field.base_id.in_(base_ids))
+        sample_query = sample_query.filter(db.SoilSample.base_id.in_(base_ids))
+        index_query = index_query.join(db.Field).filter(db.Field.base_id.in_(base_ids))
+
+    samples: dict[int, list[db.SoilSample]] = {}
+    for sample in sample_query:
+        samples.setdefault(sample.base_id, []).append(sample)
+    classify_soil_samples(
+        [sample.id for items in samples.values() for sample in items], guidelines=guidelines
+    )
+    years = {base_id: [sample.year for sample in items] for base_id, items in samples.items()}
+    entries: dict[int, db.FieldSoil] = {entry.field_id: entry for entry in index_query}
+
+    count = 0
+    for field in field_query:
+        index = bisect_right(years.get(field.base_id, []), field.year) - 1
+        entry = entries.get(field.id)
+        if index < 0:
+            if entry is not None:
+                _db.session.delete(entry)
+            continue
+        sample = samples[field.base_id][index]
+        classification = sample.get_classification(field.field_type)
+        if entry is None:
+            entry = db.FieldSoil(field_id=field.id)
+            _db.session.add(entry)
+        entry.sample_id = sample.id
+        entry.version = classification.version if classification else None
+        entry.class_ph = classification.class_ph if classification else None
+        entry.class_p2o5 = classification.class_p2o5 if classification else None
+        entry.class_k2o = classification.class_k2o if classification else None
+        entry.class_mg = classification.class_mg if classification else None
+        count += 1
+    _db.session.flush()
+    logger.info(f"Updated soil index for {count} field-years.")
+    return count
+
+
+def reclassify_soil_samples(*, guidelines: guidelines = guidelines) -> int:
+    """
+    Bulk update after the guidelines changed: recompute all outdated soil
+    classifications and refresh the index of the affected base fields.
+
+    :return:
+        Number of base fields that were updated.
+    """
+    base_ids = classify_soil_samples(guidelines=guidelines)
+    if base_ids:
+        update_soil_index(base_ids, guidelines=guidelines)
+    return len(base_ids)
+
+
+def get_soil_index(field_ids: Iterable[int]) -> dict[int, db.FieldSoil]:
+    """
+    Load the indexed soil samples and classes of multiple field-years in one query.
+    Classes of entries with another `version` than the guidelines are outdated until
+    `reclassify_soil_samples` ran.
+
+    :param field_ids:
+        Ids of the field-years.
+    :return:
+        Mapping of field id to `FieldSoil`, field-years without soil sample are missing.
+    """
+    entries = db.FieldSoil.query.filter(db.FieldSoil.field_id.in_(list(field_ids)))
+    return {entry.field_id: entry for entry in entries}
+
+
+def get_fields_by_soil_class(
+    user_id: int,
+    year: int,
+    nutrient: str,
+    soil_class: SoilClass,
+    *,
+    guidelines: guidelines = guidelines,
+) -> list[db.Field]:
+    """
+    All field-years of a user whose effective soil sample has `soil_class` for `nutrient`,
+    e.g. all fields in class A for P2O5. Uses the indexed, persisted classifications.
+
+    :param nutrient:
+        One of `ph`, `p2o5`, `k2o` or `mg`.
+    :raises KeyError:
+        Unknown nutrient.
+    """
+    column = SOIL_CLASS_COLUMNS[nutrient]
+    query = (
+        db.Field.query.join(db.BaseField)
+        .join(db.FieldSoil)
+        .join(
+            db.SoilClassification,
+            (db.SoilClassification.sample_id == db.FieldSoil.sample_id)
+            & (db.SoilClassification.field_type == db.Field.field_type),
+        )
+        .filter(
+            db.BaseField.user_id == user_id,
+            db.Field.year == year,
+            db.SoilClassification.version == guidelines.version(),
+            column == soil_class,
+        )
+    )
+    return query.all()
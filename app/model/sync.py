@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+from sqlalchemy import delete, func, inspect, select
+
+import app.database.model as db
+from app.database.events import LOGGED_MODELS
+from app.database.types import ChangeType
+from app.extensions import db as _db
+from app.utils import json_value
+
+# change log entries per sync response
+SYNC_BATCH_SIZE = 1000
+
+
+@dataclass
+class TableChanges:
+    """Current rows of the created or updated entries of a table and the deleted ids."""
+
+    columns: list[str]
+    rows: list[list] = field(default_factory=list)
+    deleted: list[int] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {"columns": self.columns, "rows": self.rows, "deleted": self.deleted}
+
+
+@dataclass
+class ChangeSet:
+    """Changes of a user since a version, `version` is the one to sync from next."""
+
+    version: int
+    more: bool = False
+    tables: dict[str, TableChanges] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "more": self.more,
+            "changes": {table: changes.to_dict() for table, changes in self.tables.items()},
+        }
+
+
+def get_version(user_id: int) -> int:
+    """Latest version of the data of the user, changes with every write."""
+    query = select(func.max(db.ChangeLog.id)).where(db.ChangeLog.user_id == user_id)
+    return _db.session.execute(query).scalar() or 0
+
+
+def compact_changes(user_id: int | None = None) -> int:
+    """
+    Delete the `ChangeLog` entries of rows that have a later entry. Syncs only read the
+    last change of a row, so no client misses a change, the log keeps one entry per row.
+
+    :param user_id:
+        Only compact the entries of this user.
+    :return:
+        Number of deleted entries.
+    """
+    filters = [] if user_id is None else [db.ChangeLog.user_id == user_id]
+    latest = (
+        select(func.max(db.ChangeLog.id))
+        .where(*filters)
+        .group_by(db.ChangeLog.table, db.ChangeLog.row_id)
+    )
+    query = delete(db.ChangeLog).where(*filters, db.ChangeLog.id.not_in(latest))
+    return _db.session.execute(query).rowcount
+
+
+def get_changes(user_id: int, since: int = 0, limit: int = SYNC_BATCH_SIZE) -> ChangeSet:
+    """
+    Rows of the user that were created, updated or deleted after the version `since`,
+    read from the `ChangeLog`. Every row is listed once with its last change, created
+    and updated rows with their current values, one list of values per row in the order
+    of the columns of their table.
+
+    :param limit:
+        Change log entries to read at most, `more` is set if there are further ones.
+    """
+    query = (
+        select(db.ChangeLog.id, db.ChangeLog.table, db.ChangeLog.row_id, db.ChangeLog.change)
+        .where(db.ChangeLog.user_id == user_id, db.ChangeLog.id > since)
+        .order_by(db.ChangeLog.id)
+        .limit(limit + 1)
+    )
+    entries = _db.session.execute(query).all()
+    changes = ChangeSet(version=since, more=len(entries) > limit)
+    last: dict[tuple[str, int], ChangeType] = {}
+    for version, table, row_id, change in entries[:limit]:
+        last[(table, row_id)] = change
+        changes.version = version
+
+    models = {model.__tablename__: model for model in LOGGED_MODELS}
+    ids: dict[str, list[int]] = {}
+    for (table, row_id), change in last.items():
+        if table not in models:
+            continue
+        if table not in changes.tables:
+            columns = [column.key for column in inspect(models[table]).column_attrs]
+            changes.tables[table] = TableChanges(columns=columns)
+        if change is ChangeType.deleted:
+            changes.tables[table].deleted.append(row_id)
+        else:
+            ids.setdefault(table, []).append(row_id)
+
+    for table, row_ids in ids.items():
+        model, table_changes = models[table], changes.tables[table]
+        query = (
+            select(*(getattr(model, column) for column in table_changes.columns))
+            .where(model.id.in_(row_ids))
+            .order_by(model.id)
+        )
+        # rows deleted after this batch are missing, their deletion follows with the next one
+        table_changes.rows = [
+            [json_value(value) for value in row] for row in _db.session.execute(query)
+        ]
+    return changes
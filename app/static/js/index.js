@@ -3,6 +3,7 @@ import { manageToast } from "./toast.js";
 import { fieldSaldo, removeStoredTab, restoreTab, storeTab } from "./field.js";
 import { manageSidebar } from "./sidebar.js";
 import { manageFields } from "./fields.js";
+import { registerServiceWorker } from "./pwa.js";
 
 // Control modal
 window.addEventListener("show.bs.modal", (event) => createModal(event));
@@ -32,3 +33,6 @@ if (document.querySelector("#sidebarNav")) {
   manageSidebar();
   removeStoredTab();
 }
+
+// Control offline caching
+registerServiceWorker();
@@ -139,6 +139,15 @@ class Modal {
         }
         window.location.reload();
       });
+    } else if (response.status == 202) {
+      // queued by the service worker while offline
+      response.json().then((data) => {
+        this.clearErrors();
+        this.content.querySelector(".modal-footer").innerHTML = `
+        <ul class="ps-0 me-auto">
+        <h6 class="">${data}</h6></ul>
+        <ul><button type="button" class="btn btn-secondary ms-1" data-bs-dismiss="modal">Close</button></ul>`;
+      });
     } else if (response.status == 206) {
       // changed content
       response.json().then((data) => {
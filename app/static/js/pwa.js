@@ -0,0 +1,82 @@
+import { fieldSaldo } from "./field.js";
+import { fetchData } from "./request.js";
+
+const FIELD_PAGE = /^\/field\/\d+$/;
+const ACTIONS = { POST: "new entry", PUT: "change", DELETE: "deletion" };
+
+export function registerServiceWorker() {
+  if (!("serviceWorker" in navigator)) {
+    return;
+  }
+  navigator.serviceWorker.register("/sw.js");
+  navigator.serviceWorker.addEventListener("message", (event) => handleMessage(event.data));
+  window.addEventListener("online", () => {
+    navigator.serviceWorker.controller?.postMessage({ type: "replay" });
+  });
+  // field pages may come from the cache with an expired csrf token
+  const isFieldPage = FIELD_PAGE.test(window.location.pathname);
+  if (navigator.serviceWorker.controller && navigator.onLine && isFieldPage) {
+    refreshCsrfToken();
+  }
+  // offline submissions that were rejected later on are shown on every page until discarded
+  navigator.serviceWorker.controller?.postMessage({ type: "failed-submissions" });
+}
+
+async function refreshCsrfToken() {
+  const token = await fetchData("/csrf_token");
+  if (typeof token !== "string") {
+    return;
+  }
+  document.querySelector('meta[name="csrf-token"]').content = token;
+  document.querySelectorAll('input[name="csrf_token"]').forEach((input) => {
+    input.value = token;
+  });
+}
+
+function handleMessage(message) {
+  if (message.type === "field-updated") {
+    // a newer version of the shown field was cached
+    const path = new URL(message.url).pathname;
+    if (path === window.location.pathname) {
+      window.location.reload();
+    } else if (path === window.location.pathname + "/data") {
+      fieldSaldo();
+    }
+  } else if (message.type === "submission-replayed") {
+    console.log(`Offline submission sent: ${message.status}`);
+  } else if (message.type === "failed-submissions") {
+    message.submissions.forEach(showFailedSubmission);
+  }
+}
+
+function showFailedSubmission(submission) {
+  const id = `submission-${submission.id}`;
+  if (document.getElementById(id)) {
+    return;
+  }
+  let container = document.querySelector(".toast-container");
+  if (!container) {
+    container = document.createElement("div");
+    container.className = "toast-container position-fixed bottom-0 end-0 p-3";
+    document.body.append(container);
+  }
+  const toast = document.createElement("div");
+  toast.id = id;
+  toast.className = "toast align-items-center show";
+  toast.setAttribute("role", "alert");
+  toast.innerHTML = `
+    <div class="toast-body d-flex align-items-center">
+      <span class="me-2"></span>
+      <button type="button" class="btn btn-sm btn-outline-danger ms-auto">Discard</button>
+    </div>`;
+  const time = new Date(submission.time).toLocaleString();
+  const action = ACTIONS[submission.method] ?? "submission";
+  toast.querySelector("span").textContent =
+    `The offline ${action} (${submission.form}) of ${time} was rejected ` +
+    `with status ${submission.status} and has to be entered again.`;
+  toast.querySelector("button").addEventListener("click", () => {
+    navigator.serviceWorker.controller?.postMessage({ type: "discard", id: submission.id });
+    toast.remove();
+  });
+  container.append(toast);
+}
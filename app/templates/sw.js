@@ -0,0 +1,227 @@
+// Service worker of AgroPlan, rendered by `main.service_worker`.
+const VERSION = {{ version | tojson }};
+const STATIC_CACHE = `agroplan-static-${VERSION}`;
+const PAGE_CACHE = "agroplan-pages";
+const PRECACHE = {{ assets | tojson }};
+// field pages and their balances are served from the cache while they are revalidated
+const FIELD_URL = /^\/field\/\d+(\/data)?$/;
+const VERSION_HEADER = "X-Field-Version";
+const QUEUE_DB = "agroplan-queue";
+const QUEUE_STORE = "submissions";
+
+self.addEventListener("install", (event) => {
+  event.waitUntil(
+    caches
+      .open(STATIC_CACHE)
+      .then((cache) => cache.addAll(PRECACHE))
+      .then(() => self.skipWaiting())
+  );
+});
+
+self.addEventListener("activate", (event) => {
+  event.waitUntil(
+    caches
+      .keys()
+      .then((keys) =>
+        Promise.all(
+          keys
+            .filter((key) => key.startsWith("agroplan-static-") && key !== STATIC_CACHE)
+            .map((key) => caches.delete(key))
+        )
+      )
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener("fetch", (event) => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+  if (url.pathname === "/modal/submit" && request.method !== "GET") {
+    event.respondWith(submitOrQueue(request));
+  } else if (request.method !== "GET") {
+    return;
+  } else if (url.pathname === "/auth/logout") {
+    // cached pages and queued submissions belong to the user that logs out
+    event.waitUntil(
+      Promise.all([caches.delete(PAGE_CACHE), queueStore("readwrite", (store) => store.clear())])
+    );
+  } else if (PRECACHE.includes(url.pathname)) {
+    event.respondWith(caches.match(request).then((cached) => cached || fetch(request)));
+  } else if (FIELD_URL.test(url.pathname)) {
+    event.respondWith(staleWhileRevalidate(event));
+  } else if (url.pathname === "/modal") {
+    event.respondWith(networkFirst(request));
+  }
+});
+
+self.addEventListener("message", (event) => {
+  if (event.data?.type === "replay") {
+    event.waitUntil(replayQueue());
+  } else if (event.data?.type === "failed-submissions") {
+    event.waitUntil(failedSubmissions().then((failed) => event.source.postMessage(failed)));
+  } else if (event.data?.type === "discard") {
+    event.waitUntil(queueStore("readwrite", (store) => store.delete(event.data.id)));
+  }
+});
+
+self.addEventListener("sync", (event) => {
+  if (event.tag === "replay-submissions") {
+    event.waitUntil(replayQueue());
+  }
+});
+
+/**
+ * Answer from the cache and update it in the background. Clients are told when the
+ * field version of the update differs from the cached one.
+ */
+async function staleWhileRevalidate(event) {
+  const cache = await caches.open(PAGE_CACHE);
+  const cached = await cache.match(event.request);
+  const revalidated = fetch(event.request).then(async (response) => {
+    // redirects to the login and errors aren't cached
+    if (response.ok && !response.redirected) {
+      await cache.put(event.request, response.clone());
+      if (cached && response.headers.get(VERSION_HEADER) !== cached.headers.get(VERSION_HEADER)) {
+        notifyClients({ type: "field-updated", url: event.request.url });
+      }
+    }
+    return response;
+  });
+  if (!cached) {
+    return revalidated;
+  }
+  event.waitUntil(revalidated.catch(() => {}));
+  return cached;
+}
+
+async function networkFirst(request) {
+  const cache = await caches.open(PAGE_CACHE);
+  try {
+    const response = await fetch(request);
+    if (response.ok) {
+      await cache.put(request, response.clone());
+    }
+    return response;
+  } catch (err) {
+    const cached = await cache.match(request);
+    if (cached) {
+      return cached;
+    }
+    throw err;
+  }
+}
+
+/**
+ * Send a modal submission or queue it for replay if the network is unreachable.
+ */
+async function submitOrQueue(request) {
+  const body = [...(await request.clone().formData())];
+  try {
+    const response = await fetch(request);
+    replayQueue();
+    return response;
+  } catch (err) {
+    await queueStore("readwrite", (store) =>
+      store.add({ url: request.url, method: request.method, body: body, time: Date.now() })
+    );
+    if (self.registration.sync) {
+      self.registration.sync.register("replay-submissions").catch(() => {});
+    }
+    return new Response(JSON.stringify("Saved offline, it is sent once you are back online."), {
+      status: 202,
+      headers: { "Content-Type": "application/json" },
+    });
+  }
+}
+
+let replaying = null;
+
+function replayQueue() {
+  replaying ??= replay().finally(() => {
+    replaying = null;
+  });
+  return replaying;
+}
+
+/**
+ * Send the queued submissions. Saved ones are removed from the queue, rejected ones are
+ * kept with their status and shown to the user until they are discarded.
+ */
+async function replay() {
+  const submissions = await queueStore("readonly", (store) => store.getAll());
+  const pending = submissions.filter((submission) => !submission.status);
+  if (!pending.length) {
+    return;
+  }
+  // tokens of queued submissions may have expired, fails offline or logged out and keeps
+  // the queue
+  const token = await fetch("/csrf_token").then((response) => response.json());
+  for (const submission of pending) {
+    const body = new FormData();
+    for (const [key, value] of submission.body) {
+      body.append(key, key === "csrf_token" ? token : value);
+    }
+    const response = await fetch(submission.url, {
+      method: submission.method,
+      body: body,
+      headers: { "X-CSRFToken": token },
+    });
+    if (response.redirected || response.status >= 500) {
+      // logged out meanwhile or a server error, sent again with the next replay
+      return;
+    }
+    if (response.status === 201) {
+      await queueStore("readwrite", (store) => store.delete(submission.id));
+      notifyClients({ type: "submission-replayed", status: response.status });
+    } else {
+      // invalid forms are answered with 206
+      submission.status = response.status;
+      await queueStore("readwrite", (store) => store.put(submission));
+      notifyClients(await failedSubmissions());
+    }
+  }
+}
+
+async function failedSubmissions() {
+  const submissions = await queueStore("readonly", (store) => store.getAll());
+  return {
+    type: "failed-submissions",
+    submissions: submissions
+      .filter((submission) => submission.status)
+      .map((submission) => {
+        const body = Object.fromEntries(submission.body);
+        return {
+          id: submission.id,
+          status: submission.status,
+          method: submission.method,
+          form: body.form_type,
+          time: submission.time,
+        };
+      }),
+  };
+}
+
+function queueStore(mode, callback) {
+  return new Promise((resolve, reject) => {
+    const open = indexedDB.open(QUEUE_DB, 1);
+    open.onupgradeneeded = () => {
+      open.result.createObjectStore(QUEUE_STORE, { keyPath: "id", autoIncrement: true });
+    };
+    open.onerror = () => reject(open.error);
+    open.onsuccess = () => {
+      const transaction = open.result.transaction(QUEUE_STORE, mode);
+      const request = callback(transaction.objectStore(QUEUE_STORE));
+      transaction.oncomplete = () => resolve(request.result);
+      transaction.onerror = () => reject(transaction.error);
+    };
+  });
+}
+
+async function notifyClients(message) {
+  for (const client of await self.clients.matchAll()) {
+    client.postMessage(message);
+  }
+}
@@ -2,6 +2,7 @@ from .utils import (
     fertilization_sorting,
     format_number,
     handle_error,
+    json_value,
     load_json,
     round_to_nearest,
     save_json,
@@ -11,6 +12,7 @@ __all__ = [
     "fertilization_sorting",
     "format_number",
     "handle_error",
+    "json_value",
     "load_json",
     "round_to_nearest",
     "save_json",
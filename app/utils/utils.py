@@ -1,7 +1,7 @@
 import json
 import re
-from decimal import InvalidOperation
-from functools import cmp_to_key
+from decimal import Decimal, InvalidOperation
+from enum import Enum
 from numbers import Number
 
 from loguru import logger
@@ -10,7 +10,7 @@ from app.database.types import MeasureType
 
 
 def fertilization_sorting(fertilizations):
-    return sorted(fertilizations, key=cmp_to_key(MeasureType.sorting))
+    return sorted(fertilizations, key=MeasureType.sort_key)
 
 
 def handle_error(caller, on_exception="None"):
@@ -49,6 +49,15 @@ def round_to_nearest(number: Number, num_decimals: int) -> Number:
         return round(number, num_decimals)
 
 
+def json_value(value):
+    """JSON value of a database column value, enums by name and decimals as floats."""
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
 def load_json(filename: str) -> dict:
     """Load data from ``filename``. Has to be a JSON file.
 
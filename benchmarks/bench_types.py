@@ -0,0 +1,207 @@
+"""
+Micro benchmark for enum comparisons of `app.database.types.BaseType`.
+
+Measures the raw comparison cost and the two hot paths that depend on it:
+the `field.field_type != "exchanged_land"` filter of the index/field templates
+and the balance calculation of a batch of fields in the model layer.
+
+Run from the project root with:
+```
+python -m benchmarks.bench_types
+```
+"""
+
+from __future__ import annotations
+
+import timeit
+from decimal import Decimal
+
+from jinja2 import Template
+from loguru import logger
+
+import app.database.model as db
+from app.database.types import (
+    CropClass,
+    CropType,
+    CultivationType,
+    CutTiming,
+    DemandType,
+    FertClass,
+    FertType,
+    FieldType,
+    MeasureType,
+    NminType,
+    ResidueType,
+    UnitType,
+)
+from app.model import Crop, Fertilization, Field, create_cultivation, create_fertilizer
+from app.utils import fertilization_sorting
+
+
+class guidelines:
+    """Minimal guidelines so that the benchmark doesn't depend on the `data` folder."""
+
+    @staticmethod
+    def org_factor():
+        return {FertType.org_slurry.value: {"Lagerverluste": 0.9, FieldType.cropland.value: 0.6}}
+
+    @staticmethod
+    def pre_crop_effect():
+        return {CropType.grain.value: 10, CropType.corn.value: 0}
+
+    @staticmethod
+    def legume_delivery():
+        return {}
+
+    @staticmethod
+    def sulfur_needs():
+        return {"W.-Weizen": 20, "Silomais": 20}
+
+
+def _db_objects(count: int) -> list[db.Field]:
+    user = db.User(id=1, username="bench", year=2024)
+    wheat = db.Crop(
+        name="W.-Weizen",
+        crop_class=CropClass.main_crop,
+        crop_type=CropType.grain,
+        feedable=False,
+        nmin_depth=NminType.nmin_90,
+        target_demand=230,
+        target_yield=80,
+        pos_yield=Decimal(1),
+        neg_yield=Decimal("1.5"),
+        target_protein=Decimal(0),
+        var_protein=Decimal(0),
+        p2o5=Decimal("0.8"),
+        k2o=Decimal("0.6"),
+        mgo=Decimal("0.2"),
+        byp_ratio=Decimal("0.8"),
+        byp_p2o5=Decimal("0.3"),
+        byp_k2o=Decimal("1.4"),
+        byp_mgo=Decimal("0.2"),
+    )
+    slurry = db.Fertilizer(
+        name="Gülle",
+        fert_class=FertClass.organic,
+        fert_type=FertType.org_slurry,
+        unit=UnitType.cbm,
+        n=Decimal(4),
+        p2o5=Decimal("1.5"),
+        k2o=Decimal(4),
+        mgo=Decimal(1),
+        s=Decimal("0.4"),
+        cao=Decimal("1.5"),
+        nh4=Decimal(2),
+    )
+    kas = db.Fertilizer(
+        name="KAS",
+        fert_class=FertClass.mineral,
+        fert_type=FertType.n,
+        unit=UnitType.dt,
+        n=Decimal(27),
+        p2o5=Decimal(0),
+        k2o=Decimal(0),
+        mgo=Decimal(0),
+        s=Decimal(0),
+        cao=Decimal(12),
+        nh4=Decimal("13.5"),
+    )
+    fields = []
+    for i in range(count):
+        base_field = db.BaseField(user=user, prefix=i, suffix=0, name=f"Field {i}")
+        field = db.Field(
+            base_field=base_field,
+            partition=0,
+            area=Decimal("5.5"),
+            year=2024,
+            red_region=False,
+            field_type=FieldType.exchanged_land if i % 10 == 0 else FieldType.cropland,
+            demand_p2o5=DemandType.demand,
+            demand_k2o=DemandType.demand,
+            demand_mgo=DemandType.removal,
+        )
+        cultivation = db.Cultivation(
+            field=field,
+            cultivation_type=CultivationType.main_crop,
+            crop=wheat,
+            crop_yield=90,
+            residues=ResidueType.main_stayed,
+            nmin_30=10,
+            nmin_60=10,
+            nmin_90=10,
+        )
+        for measure, fertilizer, amount in (
+            (MeasureType.second_n_fert, kas, Decimal(2)),
+            (MeasureType.org_spring, slurry, Decimal(20)),
+            (MeasureType.first_n_fert, kas, Decimal(3)),
+        ):
+            db.Fertilization(
+                field=field,
+                cultivation=cultivation,
+                fertilizer=fertilizer,
+                cut_timing=CutTiming.none,
+                measure=measure,
+                amount=amount,
+            )
+        fields.append(field)
+    return fields
+
+
+def _build_field(field: db.Field) -> Field:
+    new_field = Field(field, first_year=False, guidelines=guidelines)
+    for cultivation in field.cultivations:
+        crop = Crop(cultivation.crop, guidelines=guidelines)
+        new_field.cultivations.append(create_cultivation(cultivation, crop, guidelines=guidelines))
+    for fertilization in fertilization_sorting(field.fertilizations):
+        new_field.fertilizations.append(
+            Fertilization(
+                fertilization,
+                create_fertilizer(fertilization.fertilizer, guidelines=guidelines),
+                fertilization.cultivation.crop.feedable,
+                fertilization.cultivation.cultivation_type,
+            )
+        )
+    return new_field
+
+
+def main(count: int = 200, repeat: int = 5):
+    logger.remove()
+    db_fields = _db_objects(count)
+    template = Template(
+        '{% for field in fields if field.field_type != "exchanged_land" %}'
+        '{% if field.field_type.name == "cropland" %}c{% endif %}{% endfor %}'
+    )
+    member = FieldType.cropland
+    other = FieldType.grassland
+
+    def field_page():
+        for field in _build_field_list():
+            field.create_balances()
+
+    def _build_field_list():
+        return [
+            _build_field(field)
+            for field in db_fields
+            if field.field_type is not FieldType.exchanged_land
+        ]
+
+    def batch_balance():
+        for field in models:
+            field.total_balance()
+
+    models = _build_field_list()
+    cases = {
+        "enum == enum (mismatch)": (lambda: member == other, 200_000),
+        "enum != str": (lambda: member != "exchanged_land", 200_000),
+        "measure sorting": (lambda: fertilization_sorting(db_fields[0].fertilizations), 20_000),
+        "template field filter": (lambda: template.render(fields=db_fields), 200),
+        "field page (build + balances)": (field_page, 5),
+        "batch balance": (batch_balance, 20),
+    }
+    for name, (func, number) in cases.items():
+        best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+        print(f"{name:<32} {best * 1e6:>12.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,8 @@ class Config:
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD")
     ADMINS = [os.environ.get("ADMIN_MAIL")]
     POSTS_PER_PAGE = 25
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS") or 2)
+    REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS") or 0)
     LANGUAGES = ["en", "de"]
     EXPLAIN_TEMPLATE_LOADING = False
     BOOTSTRAP_SERVE_LOCAL = True
@@ -28,3 +30,5 @@ class TestConfig(Config):
     SECRET_KEY = "test-key"
     SQLALCHEMY_DATABASE_URI = "sqlite://"
     TESTING = True
+    JOB_WORKERS = 0
+    REPORT_WORKERS = 0
@@ -0,0 +1,24 @@
+"""recompute farm balances with organic n after storage losses
+
+Revision ID: e8b2c5d7f1a4
+Revises: d4f7a1c9e3b6
+Create Date: 2026-10-19 19:48:36.217094
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e8b2c5d7f1a4"
+down_revision = "d4f7a1c9e3b6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # cached balances hold the organic n before storage losses, they are lazily recalculated
+    op.execute("DELETE FROM farm_balance")
+
+
+def downgrade():
+    op.execute("DELETE FROM farm_balance")
@@ -0,0 +1,48 @@
+import pytest
+
+from app.api_v1.resources import RESOURCES, decode_cursor, encode_cursor, fetch_page
+
+
+def test_fetch_page_fields(fill_db):
+    page = fetch_page("fields", 1, fields=["id", "year", "field_type"])
+    assert page.data == [
+        {"id": 1, "year": 1000, "field_type": "cropland"},
+        {"id": 2, "year": 1001, "field_type": "cropland"},
+    ]
+    assert page.next_cursor is None
+    assert fetch_page("fields", 2).data == []
+
+
+def test_fetch_page_cursor(fill_db):
+    first = fetch_page("cultivations", 1, fields=["id"], limit=2)
+    assert [row["id"] for row in first.data] == [1, 2]
+    second = fetch_page("cultivations", 1, fields=["id"], cursor=first.next_cursor, limit=2)
+    assert [row["id"] for row in second.data] == [3, 4]
+    assert second.next_cursor is None
+    assert decode_cursor(encode_cursor(42)) == 42
+
+
+def test_fetch_page_year(fill_db):
+    page = fetch_page("fertilizations", 1, fields=["id", "year"], year=1001)
+    assert {row["year"] for row in page.data} == {1001}
+    assert len(page.data) == 2
+
+
+def test_fetch_page_balances(fill_db, guidelines):
+    page = fetch_page("balances", 1, guidelines=guidelines)
+    assert [row["field_id"] for row in page.data] == [1, 2]
+    assert list(page.data[0]) == list(RESOURCES["balances"].columns)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"name": "crops"},
+        {"name": "fields", "fields": ["id", "unknown"]},
+        {"name": "fields", "cursor": "invalid"},
+        {"name": "fields", "limit": 0},
+    ],
+)
+def test_fetch_page_invalid(kwargs, fill_db):
+    with pytest.raises(ValueError):
+        fetch_page(user_id=1, **kwargs)
@@ -887,6 +887,10 @@ def guidelines() -> object:
                 CropType.alfalfa.value: 360,
             }
 
+        @staticmethod
+        def version():
+            return "test"
+
         @staticmethod
         def sulfur_needs():
             return {
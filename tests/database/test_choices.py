@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import event, insert
+
+from app.database.choices import crop_choices, fertilizer_choices, year_choices
+from app.database.events import log_rows
+from app.database.model import Crop, Fertilizer, Field, User
+from app.database.types import ChangeType, CropClass, FertClass, FertType, FieldType, MeasureType
+from app.extensions import db
+
+
+@pytest.fixture
+def statements(fill_db):
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def test_crop_choices(user: User, fill_db):
+    assert crop_choices(user.id) == sorted((crop.id, crop.name) for crop in user.get_crops())
+    for crop_class in CropClass:
+        for field_type in (FieldType.grassland, FieldType.cropland):
+            assert crop_choices(user.id, crop_class, field_type) == sorted(
+                (crop.id, crop.name)
+                for crop in user.get_crops(crop_class=crop_class, field_type=field_type)
+            )
+    assert crop_choices(user.id + 1) == []
+
+
+def test_fertilizer_choices(
+    user: User, organic_fertilizer: Fertilizer, mineral_fertilizer: Fertilizer, fill_db
+):
+    assert fertilizer_choices(user.id) == sorted(
+        (fertilizer.id, fertilizer.name) for fertilizer in user.get_fertilizers()
+    )
+    assert fertilizer_choices(user.id, FertClass.mineral) == [
+        (mineral_fertilizer.id, mineral_fertilizer.name)
+    ]
+    assert fertilizer_choices(user.id, FertClass.organic, years=[organic_fertilizer.year]) == [
+        (organic_fertilizer.id, organic_fertilizer.name)
+    ]
+    n_fert_types = FertType.from_measure(MeasureType.first_n_fert)
+    assert fertilizer_choices(user.id, fert_types=n_fert_types) == [
+        (mineral_fertilizer.id, mineral_fertilizer.name)
+    ]
+    assert (
+        fertilizer_choices(user.id, fert_types=FertType.from_measure(MeasureType.lime_fert)) == []
+    )
+
+
+def test_year_choices(user: User, field_first_year: Field, field_second_year: Field, fill_db):
+    assert year_choices(user.id) == [field_second_year.year, field_first_year.year]
+
+
+def test_choices_cached(user: User, field_first_year: Field, statements: list):
+    crops = crop_choices(user.id)
+    years = year_choices(user.id)
+    fertilizer_choices(user.id)
+    statements.clear()
+    assert crop_choices(user.id, CropClass.main_crop) and year_choices(user.id) == years
+    assert fertilizer_choices(user.id, FertClass.organic)
+    # only the versions are read
+    assert all("change_log" in statement for statement in statements)
+
+    crop = Crop(user_id=user.id, name="Neu", crop_class=CropClass.main_crop)
+    db.session.add(crop)
+    db.session.commit()
+    assert crop_choices(user.id) == [*crops, (crop.id, crop.name)]
+    # years and fertilizers are still cached
+    statements.clear()
+    assert year_choices(user.id) == years
+    fertilizer_choices(user.id)
+    assert all("change_log" in statement for statement in statements)
+
+    field_first_year.year = 999
+    db.session.commit()
+    assert year_choices(user.id) == [years[0], 999]
+
+
+def test_choices_uncommitted(user: User, fill_db):
+    crops = crop_choices(user.id)
+    crop = Crop(user_id=user.id, name="Neu", crop_class=CropClass.main_crop)
+    db.session.add(crop)
+    db.session.flush()
+    # the own transaction sees its writes, but they aren't cached
+    assert crop_choices(user.id) == [*crops, (crop.id, crop.name)]
+    db.session.rollback()
+    # the version of the rolled back write is used again
+    crop = Crop(user_id=user.id, name="Anders", crop_class=CropClass.main_crop)
+    db.session.add(crop)
+    db.session.commit()
+    assert crop_choices(user.id) == [*crops, (crop.id, "Anders")]
+
+
+def test_choices_other_connection(user: User, fill_db):
+    """Writes of other processes are seen by their version."""
+    crops = crop_choices(user.id)
+    db.session.commit()
+    with db.engine.begin() as connection:
+        crop_id = connection.execute(
+            insert(Crop).values(user_id=user.id, name="CLI").returning(Crop.id)
+        ).scalar()
+        log_rows(connection, [(user.id, "crop", crop_id, ChangeType.created)])
+    assert crop_choices(user.id) == [*crops, (crop_id, "CLI")]
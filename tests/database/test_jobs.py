@@ -0,0 +1,112 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.database.model import Job, User
+from app.database.types import JobStatus
+from app.jobs import (
+    HEARTBEAT_TIMEOUT,
+    JobCancelled,
+    JobContext,
+    UnknownJobError,
+    _JobState,
+    runner,
+)
+
+
+@pytest.fixture
+def job_tasks():
+    tasks = dict(runner.tasks)
+
+    @runner.task("test_sum")
+    def test_sum(job: JobContext, values: list[int]) -> int:
+        for i, _ in enumerate(values):
+            job.progress(i + 1, len(values), f"{i + 1} values")
+        return sum(values)
+
+    @runner.task("test_fail")
+    def test_fail(job: JobContext):
+        raise ValueError("Test error")
+
+    @runner.task("test_cancel")
+    def test_cancel(job: JobContext):
+        runner.cancel(job.id)
+        job.progress(50)
+
+    yield
+    runner.tasks = tasks
+
+
+def test_submit_job(user: User, db, job_tasks, fill_db):
+    job_id = runner.submit("test_sum", user.id, values=[1, 2, 3])
+    job = runner.status(job_id)
+    assert job["status"] is JobStatus.done
+    assert job["progress"] == 100
+    assert job["message"] == "3 values"
+    assert job["result"] == 6
+    assert db.session.get(Job, job_id).finished_at is not None
+
+
+def test_failed_job(user: User, job_tasks, fill_db):
+    job = runner.status(runner.submit("test_fail", user.id))
+    assert job["status"] is JobStatus.failed
+    assert job["message"] == "Test error"
+
+
+def test_cancelled_job(user: User, job_tasks, fill_db):
+    job = runner.status(runner.submit("test_cancel", user.id))
+    assert job["status"] is JobStatus.cancelled
+
+
+def test_unknown_job(user: User, fill_db):
+    with pytest.raises(UnknownJobError):
+        runner.submit("unknown", user.id)
+
+
+def test_interrupted_job(user: User, db, fill_db):
+    heartbeat = datetime.now(UTC) - HEARTBEAT_TIMEOUT - timedelta(seconds=1)
+    job = Job(user_id=user.id, name="test_sum", status=JobStatus.running, heartbeat_at=heartbeat)
+    db.session.add(job)
+    db.session.commit()
+    assert runner.status(job.id)["status"] is JobStatus.failed
+    assert runner.cancel(job.id) is False
+
+
+def test_job_of_other_process(user: User, db, fill_db):
+    # running in another process with a recent heartbeat
+    job = Job(
+        user_id=user.id,
+        name="test_sum",
+        status=JobStatus.running,
+        progress=40,
+        heartbeat_at=datetime.now(UTC),
+    )
+    db.session.add(job)
+    db.session.commit()
+    info = runner.status(job.id)
+    assert info["status"] is JobStatus.running
+    assert info["progress"] == 40
+
+
+def test_heartbeat(user: User, db, fill_db):
+    job = Job(user_id=user.id, name="test_sum", status=JobStatus.running, progress=0)
+    db.session.add(job)
+    db.session.commit()
+    runner._states[job.id] = _JobState(progress=60, message="Running")
+    try:
+        runner.heartbeat()
+    finally:
+        runner._states.pop(job.id)
+    db.session.refresh(job)
+    assert job.heartbeat_at is not None
+    assert (job.progress, job.message) == (60, "Running")
+
+
+def test_job_context_progress():
+    state = _JobState()
+    job = JobContext(Job(id=1, user_id=1), state)
+    job.progress(1, 4)
+    assert state.progress == 25
+    state.cancel.set()
+    with pytest.raises(JobCancelled):
+        job.progress(2, 4)
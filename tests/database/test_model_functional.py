@@ -3,8 +3,10 @@ from time import time
 import pytest
 from jwt import encode
 
-from app.database.model import Crop, Fertilization, Fertilizer, Field, SoilSample, User
+from app.database import delete_database_entry
+from app.database.model import Crop, Fertilization, Fertilizer, Field, Saldo, SoilSample, User
 from app.database.types import FertClass
+from app.extensions import db
 
 
 def test_user_reset_password(user: User, fill_db):
@@ -71,3 +73,9 @@ def test_fertilizer_usage(
     )
     with pytest.raises(ValueError):
         mineral_fertilizer.usage()
+
+
+def test_delete_field_with_saldo(field_first_year: Field, saldo: Saldo, fill_db):
+    assert delete_database_entry(field_first_year.id, "field")
+    assert db.session.get(Field, field_first_year.id) is None
+    assert db.session.get(Saldo, saldo.field_id) is None
@@ -126,3 +126,44 @@ def test_nmin_type_from_int():
         NminType.from_int("0")
     with pytest.raises(ValueError):
         NminType.from_int(100)
+
+
+def test_base_type_comparisons():
+    class BaseEnum(BaseType):
+        a = "A"
+        b = "B"
+
+    assert BaseEnum.a != BaseEnum.b
+    assert BaseEnum.a != "b"
+    assert BaseEnum.a == "a"
+    assert "a" == BaseEnum.a
+    assert BaseEnum.a != 1
+    assert {BaseEnum.a: 1}["a"] == 1
+
+
+def test_base_type_ordinal():
+    assert [e.ordinal for e in MeasureType] == list(range(len(MeasureType)))
+    assert CultivationType.main_crop.ordinal == 1
+
+
+def test_base_type_is_any():
+    assert CultivationType.main_crop.is_any(CultivationType.catch_crop, CultivationType.main_crop)
+    assert not CultivationType.main_crop.is_any(CultivationType.catch_crop)
+    assert not CultivationType.main_crop.is_any("main_crop")
+
+
+def test_measure_type_sort_key():
+    class Item:
+        def __init__(self, measure):
+            self.measure = measure
+
+    items = [
+        Item(MeasureType.lime_fert),
+        Item(MeasureType.org_fall),
+        Item(MeasureType.first_n_fert),
+    ]
+    assert [item.measure for item in sorted(items, key=MeasureType.sort_key)] == [
+        MeasureType.org_fall,
+        MeasureType.first_n_fert,
+        MeasureType.lime_fert,
+    ]
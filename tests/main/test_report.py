@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+import app.database.model as db
+import app.model.guidelines as default_guidelines
+from app.extensions import db as _db
+from app.main import report
+from app.main.report import render_report, report_field_ids, shutdown_report_pools
+
+
+@pytest.fixture
+def request_context(app):
+    with app.test_request_context() as context:
+        yield context
+
+
+def test_report_field_ids(fill_db, field_first_year: db.Field):
+    assert report_field_ids(1, field_first_year.year) == [field_first_year.id]
+    assert report_field_ids(2, field_first_year.year) == []
+
+
+def test_render_report(
+    request_context, fill_db, field_first_year: db.Field, field_second_year: db.Field, guidelines
+):
+    sections = list(
+        render_report(
+            [field_second_year.id, field_first_year.id], chunk_size=1, guidelines=guidelines
+        )
+    )
+    assert len(sections) == 2
+    assert f'id="field{field_second_year.id}"' in sections[0]
+    assert f'id="field{field_first_year.id}"' in sections[1]
+    for section, field in zip(sections, (field_second_year, field_first_year)):
+        for cultivation in field.cultivations:
+            assert cultivation.crop.name in section
+        assert "Field balance" in section
+        assert "could not be computed" not in section
+
+
+def test_render_report_workers(
+    app,
+    request_context,
+    fill_db,
+    field_first_year: db.Field,
+    field_second_year: db.Field,
+    guidelines,
+    monkeypatch,
+    tmp_path,
+):
+    # the workers open their own connection, they read a copy of the in-memory database
+    path = tmp_path / "report.db"
+    with sqlite3.connect(path) as copy:
+        _db.engine.raw_connection().driver_connection.backup(copy)
+    monkeypatch.setitem(app.config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{path}")
+    # forked workers inherit the patched guidelines
+    for name in vars(guidelines):
+        if not name.startswith("_"):
+            monkeypatch.setattr(default_guidelines, name, getattr(guidelines, name))
+    field_ids = [field_second_year.id, field_first_year.id]
+    expected = list(render_report(field_ids, chunk_size=1))
+    assert all("could not be computed" not in section for section in expected)
+    try:
+        assert list(render_report(field_ids, workers=2, chunk_size=1)) == expected
+        # the pool is reused by the next report
+        assert list(render_report(field_ids[:1] * 2, workers=2, chunk_size=1)) == expected[:1] * 2
+        assert len(report._executors) == 1
+    finally:
+        shutdown_report_pools()
@@ -0,0 +1,97 @@
+from decimal import Decimal
+
+import pytest
+from flask import g
+from sqlalchemy import event
+
+import app.database.model as db
+import app.model.guidelines
+from app.extensions import db as _db
+from app.model.sync import get_version
+
+
+@pytest.fixture
+def logged_in(client, fill_db):
+    # the app context of the client is shared by its requests, as is the user loaded into it
+    g.pop("_login_user", None)
+    with client.session_transaction() as session:
+        session["_user_id"] = "1"
+        session["_fresh"] = True
+    yield client
+    with client.session_transaction() as session:
+        session.clear()
+    g.pop("_login_user", None)
+
+
+def test_service_worker(client):
+    response = client.get("/sw.js")
+    assert response.status_code == 200
+    assert response.content_type == "application/javascript"
+    assert response.headers["Cache-Control"] == "no-cache"
+    script = response.get_data(as_text=True)
+    assert "/static/js/pwa.js" in script
+    assert "{{" not in script
+
+
+def test_csrf_token(client, logged_in):
+    response = client.get("/csrf_token")
+    assert response.status_code == 200
+    assert isinstance(response.get_json(), str)
+
+
+def test_csrf_token_logged_out(client, db):
+    response = client.get("/csrf_token")
+    assert response.status_code == 302
+    assert "/auth/login" in response.headers["Location"]
+
+
+@pytest.fixture
+def db_session_writes():
+    writes = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("SELECT"):
+            writes.append(statement)
+
+    event.listen(_db.engine, "before_cursor_execute", record)
+    yield writes
+    event.remove(_db.engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def patched_guidelines(guidelines, monkeypatch):
+    # the routes use the default guidelines
+    for name in vars(guidelines):
+        if not name.startswith("_"):
+            monkeypatch.setattr(app.model.guidelines, name, getattr(guidelines, name))
+
+
+def test_field_version(client, logged_in, patched_guidelines, field_first_year: db.Field):
+    version = str(get_version(1))
+    for url in (f"/field/{field_first_year.id}", f"/field/{field_first_year.id}/data"):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers["X-Field-Version"] == version
+
+    field_first_year.area = Decimal("2.5")
+    _db.session.commit()
+    response = client.get(f"/field/{field_first_year.id}/data")
+    assert int(response.headers["X-Field-Version"]) > int(version)
+
+
+def test_field_read_only(
+    client, logged_in, patched_guidelines, field_second_year: db.Field, db_session_writes
+):
+    for url in (f"/field/{field_second_year.id}", f"/field/{field_second_year.id}/data"):
+        assert client.get(url).status_code == 200
+    assert db_session_writes == []
+
+
+@pytest.mark.parametrize(
+    "query", ["spread=NaN", "spread=Infinity", "spread=-0.5", "protein=NaN", "protein=-Infinity"]
+)
+def test_field_demand_grid_invalid(
+    client, logged_in, patched_guidelines, field_second_year: db.Field, query
+):
+    response = client.get(f"/field/{field_second_year.id}/demand_grid?{query}")
+    assert response.status_code == 400
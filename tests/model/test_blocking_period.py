@@ -0,0 +1,79 @@
+import app.database.model as db
+from app.database.types import CropType, FertType, FieldType
+from app.extensions import db as _db
+from app.model.blocking_period import (
+    BLOCKING_PERIODS,
+    check_blocking_periods,
+    compile_blocking_periods,
+    get_blocking_period,
+)
+
+
+def test_blocking_period_months():
+    cropland = BLOCKING_PERIODS[0]
+    assert cropland.months == 0b111000000001
+    assert cropland.label == "01.10.-31.01."
+
+
+def test_blocking_period_full_months():
+    cropland, *_, phosphate = BLOCKING_PERIODS
+    assert cropland.full_months == cropland.months
+    # 01.12.-15.01. covers only december
+    assert phosphate.full_months == 0b100000000000
+    assert phosphate.covers(12) and not phosphate.covers(1)
+
+
+def test_compile_blocking_periods():
+    masks = compile_blocking_periods()
+    mask, periods = masks[(FertType.n_p_k, FieldType.cropland, False)]
+    # nitrogen and phosphate periods overlap
+    assert mask == 0b111000000001
+    assert len(periods) == 2
+    assert (FertType.lime, FieldType.cropland, False) not in masks
+
+
+def test_get_blocking_period():
+    digestate = FertType.org_digestate
+    assert get_blocking_period(digestate, FieldType.cropland, False, CropType.corn, 9) is None
+    assert get_blocking_period(digestate, FieldType.cropland, False, CropType.corn, 10)
+    assert get_blocking_period(digestate, FieldType.grassland, False, None, 10) is None
+    assert get_blocking_period(digestate, FieldType.grassland, True, None, 10)
+    # field forage on cropland is blocked like grassland
+    assert get_blocking_period(digestate, FieldType.cropland, False, CropType.clover, 10) is None
+    assert get_blocking_period(FertType.org_manure, FieldType.cropland, False, None, 11) is None
+    assert get_blocking_period(FertType.org_manure, FieldType.cropland, True, None, 11)
+    assert get_blocking_period(digestate, FieldType.cropland, False, None, None) is None
+    # solid manure is blocked until 15.01.
+    manure = FertType.org_manure
+    assert get_blocking_period(manure, FieldType.cropland, False, None, 1) is None
+    period = get_blocking_period(manure, FieldType.cropland, False, None, 1, partial=True)
+    assert period.label == "01.12.-15.01."
+    assert get_blocking_period(manure, FieldType.cropland, False, None, 12) == period
+    # a period covering the whole month is preferred
+    period = get_blocking_period(FertType.n_p, FieldType.cropland, False, None, 1, partial=True)
+    assert period.covers(1)
+
+
+def test_check_blocking_periods(
+    field_first_year: db.Field,
+    field_second_year: db.Field,
+    organic_fertilization: db.Fertilization,
+    organic_fertilization_second_year: db.Fertilization,
+    user: db.User,
+    fill_db,
+):
+    # digestate for field grass in october is allowed
+    assert check_blocking_periods(user.id, field_first_year.year) == []
+    organic_fertilization.month = 11
+    _db.session.commit()
+    violations = check_blocking_periods(user.id, field_first_year.year)
+    assert [violation.fertilization_id for violation in violations] == [organic_fertilization.id]
+    assert violations[0].period.label == "01.11.-31.01."
+
+    # digestate for the catch crop in october is blocked
+    violations = check_blocking_periods(
+        user.id, field_second_year.year, field_ids=[field_second_year.id]
+    )
+    assert [violation.fertilization_id for violation in violations] == [
+        organic_fertilization_second_year.id
+    ]
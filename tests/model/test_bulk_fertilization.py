@@ -0,0 +1,134 @@
+from decimal import Decimal
+
+import pytest
+
+import app.database.model as db
+from app.database.types import (
+    ChangeType,
+    CultivationType,
+    FertClass,
+    FertType,
+    MeasureType,
+    UnitType,
+)
+from app.extensions import db as _db
+from app.model.bulk_fertilization import bulk_fertilize
+
+
+def test_bulk_fertilize(fill_db, field_second_year: db.Field, mineral_fertilizer, guidelines):
+    report = bulk_fertilize(
+        1,
+        field_second_year.year,
+        mineral_fertilizer.id,
+        MeasureType.first_n_fert,
+        Decimal(2),
+        field_ids=[field_second_year.id],
+        cultivation_types=[CultivationType.main_crop, CultivationType.second_crop],
+        guidelines=guidelines,
+    )
+    # the main crop has a first N fertilization already
+    assert report.errors == [(field_second_year.id, "Measure already exists for cultivation.")]
+    (fertilization_id,) = report.fertilization_ids
+    _db.session.commit()
+    fertilization = _db.session.get(db.Fertilization, fertilization_id)
+    assert fertilization.field_id == field_second_year.id
+    assert fertilization.cultivation.cultivation_type is CultivationType.second_crop
+    assert fertilization.amount == 2
+    entry = _db.session.query(db.ChangeLog).filter_by(table="fertilization").all()[-1]
+    assert (entry.user_id, entry.row_id, entry.change) == (1, fertilization_id, ChangeType.created)
+
+
+def test_bulk_fertilize_invalidates(
+    fill_db, field_first_year: db.Field, saldo: db.Saldo, mineral_fertilizer, guidelines
+):
+    report = bulk_fertilize(
+        1,
+        field_first_year.year,
+        mineral_fertilizer.id,
+        MeasureType.first_n_fert,
+        Decimal(2),
+        guidelines=guidelines,
+    )
+    assert len(report.fertilization_ids) == 1
+    assert not report.errors
+    _db.session.commit()
+    _db.session.refresh(saldo)
+    assert saldo.dirty
+
+
+def test_bulk_fertilize_organic(
+    fill_db, field_first_year: db.Field, organic_fertilizer, guidelines
+):
+    args = (1, field_first_year.year, organic_fertilizer.id, MeasureType.org_spring, Decimal(5))
+    report = bulk_fertilize(*args, month=12, guidelines=guidelines)
+    assert not report.fertilization_ids
+    assert report.errors[0][0] == field_first_year.id
+    report = bulk_fertilize(*args, month=4, guidelines=guidelines)
+    assert len(report.fertilization_ids) == 1
+    assert not report.errors
+
+
+def test_bulk_fertilize_partly_blocked(fill_db, field_first_year: db.Field, guidelines):
+    manure = db.Fertilizer(
+        user_id=1,
+        name="Mist",
+        year=field_first_year.year,
+        fert_class=FertClass.organic,
+        fert_type=FertType.org_manure,
+        unit=UnitType.to,
+        n=Decimal(5),
+        nh4=Decimal(1),
+    )
+    _db.session.add(manure)
+    _db.session.commit()
+    args = (1, field_first_year.year, manure.id, MeasureType.org_spring, Decimal(10))
+    # solid manure is blocked from 01.12. to 15.01.
+    report = bulk_fertilize(*args, month=12, guidelines=guidelines)
+    assert not report.fertilization_ids
+    assert report.errors[0][0] == field_first_year.id
+    report = bulk_fertilize(*args, month=1, guidelines=guidelines)
+    assert len(report.fertilization_ids) == 1
+    assert not report.errors
+    assert [field_id for field_id, _ in report.warnings] == [field_first_year.id]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"field_ids": [2]},
+        {"fertilizer_id": 3},
+        {"fertilizer_id": 2},
+        {"month": None},
+        {"amount": Decimal(-1)},
+        {"amount": Decimal(0)},
+    ],
+)
+def test_bulk_fertilize_invalid(kwargs, fill_db, guidelines):
+    arguments = {
+        "user_id": 1,
+        "year": 1000,
+        "fertilizer_id": 1,
+        "measure": MeasureType.org_spring,
+        "amount": Decimal(5),
+        "month": 4,
+    }
+    with pytest.raises(ValueError):
+        bulk_fertilize(**(arguments | kwargs), guidelines=guidelines)
+
+
+def test_bulk_fertilize_fall_limit(
+    fill_db, field_first_year: db.Field, organic_fertilizer, guidelines
+):
+    args = (1, field_first_year.year, organic_fertilizer.id, MeasureType.org_fall)
+    # the field grass is field forage with 10 kg N of fall fertilizations already
+    report = bulk_fertilize(*args, Decimal(100), month=9, guidelines=guidelines)
+    assert not report.fertilization_ids
+    assert report.errors == [
+        (field_first_year.id, "Maximum amount for fall fertilizations: 70 m³/ha")
+    ]
+    report = bulk_fertilize(*args, Decimal(60), month=9, guidelines=guidelines)
+    assert len(report.fertilization_ids) == 1
+    report = bulk_fertilize(*args, Decimal(20), month=9, guidelines=guidelines)
+    assert report.errors == [
+        (field_first_year.id, "Maximum amount for fall fertilizations: 10 m³/ha")
+    ]
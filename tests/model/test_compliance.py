@@ -0,0 +1,97 @@
+from decimal import Decimal
+
+import pytest
+
+import app.database.model as db
+from app.database.types import MeasureType
+from app.extensions import db as _db
+from app.model.compliance import PlannedFertilization, check_compliance, max_fall_amount
+
+
+def test_check_compliance(field_first_year: db.Field, user: db.User, guidelines, fill_db):
+    report = check_compliance(user.id, field_first_year.year, guidelines=guidelines)
+    # 10 m³ with 1 kg N and 50% storage losses
+    assert report.n_organic_per_ha == Decimal(5)
+    assert report.area == field_first_year.area
+    assert report.valid
+
+
+def test_check_compliance_red_region(
+    field_first_year: db.Field,
+    organic_fertilization: db.Fertilization,
+    user: db.User,
+    guidelines,
+    fill_db,
+):
+    field_first_year.red_region = True
+    organic_fertilization.amount = Decimal(400)
+    _db.session.commit()
+    report = check_compliance(user.id, field_first_year.year, guidelines=guidelines)
+    assert {violation.rule for violation in report.violations} == {
+        "farm_organic_n",
+        "red_region_organic_n",
+        "red_region_fall_n",
+    }
+    assert all(
+        violation.fertilization_ids == [organic_fertilization.id]
+        for violation in report.violations
+    )
+    assert report.field_violations(field_first_year.id) == report.violations
+    assert report.field_violations(field_first_year.id + 1) == report.violations[:1]
+
+
+def test_check_compliance_planned(
+    field_first_year: db.Field,
+    organic_fertilizer: db.Fertilizer,
+    organic_fertilization: db.Fertilization,
+    user: db.User,
+    guidelines,
+    fill_db,
+):
+    planned = PlannedFertilization(
+        field_id=field_first_year.id,
+        fertilizer_id=organic_fertilizer.id,
+        amount=Decimal(340),
+        measure=MeasureType.org_spring,
+    )
+    report = check_compliance(
+        user.id,
+        field_first_year.year,
+        field_ids=[field_first_year.id],
+        planned=[planned],
+        guidelines=guidelines,
+    )
+    assert report.n_organic_per_ha == Decimal(175)
+    assert [violation.rule for violation in report.violations] == ["farm_organic_n"]
+
+    # editing the saved fertilization replaces it
+    report = check_compliance(
+        user.id,
+        field_first_year.year,
+        field_ids=[field_first_year.id],
+        planned=[planned],
+        exclude=[organic_fertilization.id],
+        guidelines=guidelines,
+    )
+    assert report.n_organic_per_ha == Decimal(170)
+    assert report.valid
+
+
+@pytest.mark.parametrize(
+    "amount, n, nh4, forage, red_region, expected",
+    [
+        (Decimal(10), Decimal(), Decimal(), False, False, None),
+        (Decimal(20), Decimal(), Decimal(), False, False, None),
+        (Decimal(25), Decimal(), Decimal(), False, False, Decimal(20)),
+        (Decimal(25), Decimal(10), Decimal(), False, False, Decimal(16)),
+        (Decimal(25), Decimal(), Decimal(), True, False, None),
+        (Decimal(25), Decimal(), Decimal(), True, True, Decimal(20)),
+        (Decimal(50), Decimal(), Decimal(), True, False, Decimal(26)),
+        (Decimal(1), Decimal(70), Decimal(), False, False, Decimal()),
+    ],
+)
+def test_max_fall_amount(amount, n, nh4, forage, red_region, expected):
+    # 3 kg N and 1.5 kg NH4 per unit
+    assert max_fall_amount(Decimal(3), Decimal("1.5"), amount, n, nh4, forage, red_region) == (
+        expected
+    )
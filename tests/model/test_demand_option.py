@@ -0,0 +1,19 @@
+import pytest
+
+from app.extensions import db as _db
+from app.model.demand_option import OPTION_COMBINATIONS, compare_demand_options
+from app.model.field import create_field
+
+
+@pytest.mark.parametrize("field_id", [1, 2])
+def test_compare_demand_options(field_id, guidelines, fill_db):
+    field = create_field(field_id, guidelines=guidelines)
+    current = (field.option_p2o5, field.option_k2o, field.option_mgo)
+    results = compare_demand_options(field)
+    assert [result.options for result in results] == list(OPTION_COMBINATIONS)
+    assert [result.options for result in results if result.current] == [current]
+    assert (field.option_p2o5, field.option_k2o, field.option_mgo) == current
+    for result in results:
+        field.option_p2o5, field.option_k2o, field.option_mgo = result.options
+        assert result.balance == field.total_balance()
+    assert not _db.session.dirty
@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+import pytest
+
+import app.database.model as db
+from app.extensions import db as _db
+from app.model.export import EXPORT_COLUMNS, _cell, export_csv, export_rows
+from app.model.field import create_field
+
+
+@pytest.mark.parametrize("kind", list(EXPORT_COLUMNS))
+def test_export_rows(kind, fill_db, field_first_year: db.Field, guidelines):
+    header, *rows = export_rows(kind, 1, [field_first_year.year], guidelines=guidelines)
+    assert header == EXPORT_COLUMNS[kind]
+    assert all(len(row) == len(header) for row in rows)
+    assert {row[header.index("field_id")] for row in rows} == {field_first_year.id}
+    assert (
+        len(rows)
+        == {
+            "fields": 1,
+            "cultivations": len(field_first_year.cultivations),
+            "fertilizations": len(field_first_year.fertilizations),
+            "balances": 1,
+        }[kind]
+    )
+    assert list(export_rows(kind, 2, [field_first_year.year], guidelines=guidelines)) == [header]
+
+
+def test_export_balances(fill_db, field_first_year, field_second_year, guidelines):
+    header, *rows = export_rows(
+        "balances", 1, [field_second_year.year, field_first_year.year], guidelines=guidelines
+    )
+    assert [row[header.index("year")] for row in rows] == [1000, 1001]
+    balance = create_field(field_second_year.id, guidelines=guidelines).total_balance()
+    assert rows[1][header.index("n")] == balance.n
+
+
+def test_export_csv(fill_db, field_first_year: db.Field, guidelines):
+    header, line = export_csv("fields", 1, [field_first_year.year], guidelines=guidelines)
+    assert header == ";".join(EXPORT_COLUMNS["fields"]) + "\r\n"
+    assert line.startswith(f"{field_first_year.id};{field_first_year.year};")
+    assert ";11,11;" in line
+    header, line = export_csv(
+        "fields", 1, [field_first_year.year], ",", ".", guidelines=guidelines
+    )
+    assert ",11.11," in line
+
+
+def test_export_csv_formulas(fill_db, field_first_year: db.Field, guidelines):
+    field_first_year.base_field.name = "=HYPERLINK(1)"
+    _db.session.commit()
+    _, line = export_csv("fields", 1, [field_first_year.year], guidelines=guidelines)
+    assert ";'=HYPERLINK(1);" in line
+    assert _cell(Decimal("-1.5"), ",") == "-1,50"
+
+
+def test_export_unknown(guidelines):
+    with pytest.raises(ValueError):
+        list(export_rows("soil", 1, [1000], guidelines=guidelines))
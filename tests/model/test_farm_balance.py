@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+import app.database.model as db
+from app.extensions import db as _db
+from app.model.compliance import check_compliance
+from app.model.farm_balance import get_farm_balances, nutrient_comparison
+from app.model.field import create_field
+
+
+def test_get_farm_balances(field_first_year: db.Field, user: db.User, guidelines, fill_db):
+    balances = get_farm_balances(user.id, [field_first_year.year, 999], guidelines=guidelines)
+    assert list(balances) == [field_first_year.year]
+    balance = balances[field_first_year.year]
+    assert balance.fields == 1
+    assert balance.area == field_first_year.area
+    assert balance.n == field_first_year.area
+    assert balance.n_per_ha == Decimal(1)
+    assert balance.p2o5_per_ha == Decimal(1)
+    # organic N after storage losses, like the compliance check
+    compliance = check_compliance(user.id, field_first_year.year, guidelines=guidelines)
+    assert balance.n_organic == compliance.n_organic.quantize(Decimal("0.01"))
+    assert balance.n_organic < field_first_year.area * 10
+    _db.session.commit()
+    assert _db.session.get(db.FarmBalance, (user.id, field_first_year.year)) is not None
+
+
+def test_get_farm_balances_recomputes_saldo(
+    field_second_year: db.Field, user: db.User, guidelines, fill_db
+):
+    field = create_field(field_second_year.id, guidelines=guidelines)
+    n = field.total_balance().n
+    balance = get_farm_balances(user.id, [field_second_year.year], guidelines=guidelines)[
+        field_second_year.year
+    ]
+    assert balance.n_per_ha == n.quantize(Decimal("0.01"))
+    assert _db.session.get(db.Saldo, field_second_year.id).dirty is False
+
+
+def test_farm_balance_invalidated(
+    field_first_year: db.Field,
+    field_second_year: db.Field,
+    organic_fertilization_second_year: db.Fertilization,
+    user: db.User,
+    guidelines,
+    fill_db,
+):
+    years = [field_first_year.year, field_second_year.year]
+    get_farm_balances(user.id, years, guidelines=guidelines)
+    _db.session.commit()
+    organic_fertilization_second_year.amount = Decimal(99)
+    _db.session.commit()
+    assert _db.session.get(db.FarmBalance, (user.id, field_first_year.year)) is not None
+    assert _db.session.get(db.FarmBalance, (user.id, field_second_year.year)) is None
+
+
+def test_nutrient_comparison(
+    field_first_year: db.Field, field_second_year: db.Field, user: db.User, guidelines, fill_db
+):
+    comparison = nutrient_comparison(user.id, field_second_year.year, guidelines=guidelines)
+    assert [balance.year for balance in comparison.balances] == [1000, 1001]
+    assert comparison.current.year == field_second_year.year
+    first, second = comparison.balances
+    assert comparison.n_average == (first.n_per_ha + second.n_per_ha) / 2
+    assert comparison.to_dict()["years"][0]["n"] == 1.0
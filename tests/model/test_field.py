@@ -12,10 +12,12 @@ from app.database.types import (
     HumusType,
     MeasureType,
 )
+from app.extensions import db as _db
 from app.model.balance import Balance
 from app.model.crop import Crop
 from app.model.cultivation import create_cultivation
-from app.model.field import Field, create_field
+from app.model.field import Field, FieldLoader, create_field, get_lime_balance
+from app.model.saldo import recompute_saldos
 
 
 def test_create_field(
@@ -45,6 +47,20 @@ def test__field_prev_year(test_field: Field, test_prev_field: Field):
     assert test_field.field_prev_year == test_prev_field
 
 
+def test_field_loader(test_field: Field, test_prev_field: Field, guidelines):
+    loader = FieldLoader(guidelines=guidelines)
+    fields = loader.load([test_field.id, 99, test_prev_field.id])
+    assert fields == [test_field, test_prev_field]
+    assert fields[0].field_prev_year == test_prev_field
+    assert fields[1].field_prev_year is None
+    for field, expected in zip(fields, (test_field, test_prev_field)):
+        assert field.total_balance() == expected.total_balance()
+    # crops are shared between the fields and their previous years
+    crops = [cultivation.crop for field in fields for cultivation in field.cultivations]
+    crops += [cultivation.crop for cultivation in fields[0].field_prev_year.cultivations]
+    assert len({id(crop) for crop in crops}) == len(loader._crops)
+
+
 def test_previous_crop(test_field: Field):
     (catch_crop, main_crop, second_crop) = test_field.cultivations
     test_field.field_prev_year.cultivations = [main_crop, second_crop]
@@ -82,7 +98,7 @@ def test_total_balance(test_field: Field):
     assert balance.k2o == Decimal("-283.6")
     assert balance.mgo == Decimal(-72)
     assert balance.s == Decimal(-14)
-    assert balance.cao == Decimal("-1207.9")
+    assert balance.cao == Decimal("-2335.4")
     assert balance.nh4 == Decimal(6)
 
 
@@ -116,7 +132,7 @@ def test_reductions(test_field: Field):
     assert reductions.k2o == -72 + 20
     assert reductions.mgo == -50 + 20
     assert reductions.s == 0 + 20
-    assert reductions.cao == -1125 - 83 + 1
+    assert reductions.cao == -1125 - 83 + Decimal("-1126.5")
     assert reductions.nh4 == 0
     reductions = test_field.reductions(test_field.second_crop)
     assert reductions.n == 2
@@ -207,16 +223,48 @@ def test_redelivery(test_field: Field):
     assert redelivery.k2o == Decimal(20)
     assert redelivery.mgo == Decimal(20)
     assert redelivery.s == Decimal(20)
-    assert redelivery.cao == Decimal(-82)
+    assert redelivery.cao == Decimal("-1209.5")
     assert redelivery.nh4 == Decimal(0)
 
 
 def test_cao_saldo(test_field: Field):
-    assert test_field.field_prev_year.saldo.cao == test_field.cao_saldo()
+    # soil reductions and fertilizations of the previous year since the soil sample
+    assert test_field.cao_saldo() == -1125 + Decimal("-1.5")
+    assert test_field.cao_saldo() == test_field.field_prev_year.lime_balance()
     test_field.field_prev_year = None
     assert test_field.cao_saldo() == 0
 
 
+def test_cao_saldo_new_soil_sample(test_field: Field):
+    test_field.soil_sample.year = test_field.year
+    assert test_field.cao_saldo() == 0
+
+
+def test_lime_balance(test_field: Field):
+    assert test_field.lime_balance() == (
+        test_field.cao_saldo()
+        + test_field.soil_reductions().cao
+        + test_field.sum_fertilizations().cao
+    )
+
+
+def test_get_lime_balance_cached(
+    test_field: Field, field_first_year: db.Field, organic_fertilization: db.Fertilization
+):
+    cao = get_lime_balance(field_first_year.id, guidelines=test_field._guidelines)
+    # reading doesn't write the cache, recomputing the balances does
+    assert not _db.session.new
+    recompute_saldos(
+        [(field_first_year.id, field_first_year.year)], guidelines=test_field._guidelines
+    )
+    assert _db.session.get(db.LimeBalance, field_first_year.id).cao == cao
+    assert get_lime_balance(field_first_year.id) == cao
+    # changes remove the cached balances of the field-year and the following years
+    organic_fertilization.amount += 10
+    _db.session.commit()
+    assert _db.session.get(db.LimeBalance, field_first_year.id) is None
+
+
 def test_fertilization_redelivery(test_field: Field):
     # only organic fertilization in fall for catch crop
     redelivery = test_field.fertilization_redelivery()
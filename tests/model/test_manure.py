@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+import pytest
+
+import app.database.model as db
+from app.model.manure import plan_manure_distribution
+
+
+def test_plan_manure_distribution(
+    field_second_year: db.Field,
+    organic_fertilizer_second_year: db.Fertilizer,
+    user: db.User,
+    guidelines,
+    fill_db,
+):
+    fertilizer_id = organic_fertilizer_second_year.id
+    plan = plan_manure_distribution(
+        user.id, field_second_year.year, {fertilizer_id: Decimal(1000)}, guidelines=guidelines
+    )
+    # 10 m³ with 10 kg N and 50% storage losses are applied, 24 m³ more reach 170 kg N/ha
+    assert [(a.field_id, a.amount) for a in plan.allocations] == [(field_second_year.id, 24)]
+    assert plan.allocations[0].volume == 24 * field_second_year.area
+    assert plan.remaining[fertilizer_id] == 1000 - 24 * field_second_year.area
+
+
+def test_plan_manure_distribution_volume(
+    field_second_year: db.Field,
+    organic_fertilizer_second_year: db.Fertilizer,
+    user: db.User,
+    guidelines,
+    fill_db,
+):
+    fertilizer_id = organic_fertilizer_second_year.id
+    plan = plan_manure_distribution(
+        user.id, field_second_year.year, {fertilizer_id: Decimal(100)}, guidelines=guidelines
+    )
+    assert plan.field_allocations(field_second_year.id)[0].amount == 9
+    assert 0 <= plan.remaining[fertilizer_id] < field_second_year.area
+
+
+def test_plan_manure_distribution_fertilizer(
+    field_second_year: db.Field,
+    organic_fertilizer: db.Fertilizer,
+    user: db.User,
+    guidelines,
+    fill_db,
+):
+    with pytest.raises(ValueError):
+        plan_manure_distribution(
+            user.id, field_second_year.year, {organic_fertilizer.id: 1}, guidelines=guidelines
+        )
@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+import pytest
+
+import app.database.model as db
+from app.database.types import CultivationType
+from app.extensions import db as _db
+from app.model.field import create_field
+from app.model.optimizer import propose_fertilization
+
+
+def test_propose_fertilization(field_second_year: db.Field, guidelines, fill_db):
+    field = create_field(field_second_year.id, guidelines=guidelines)
+    proposal = propose_fertilization(field, CultivationType.main_crop, guidelines=guidelines)
+    assert [amount.fertilizer_id for amount in proposal.amounts] == [3, 2]
+    assert proposal.needs.n < 0
+    # N need is covered without oversupply
+    assert proposal.remaining.n == 0
+    assert proposal.cost == sum(amount.cost for amount in proposal.amounts)
+
+
+def test_propose_fertilization_organic_limit(
+    field_second_year: db.Field,
+    organic_fertilization_second_year: db.Fertilization,
+    guidelines,
+    fill_db,
+):
+    # 34 m³ with 10 kg N and 50% storage losses reach 170 kg N/ha
+    organic_fertilization_second_year.amount = Decimal(34)
+    _db.session.commit()
+    field = create_field(field_second_year.id, guidelines=guidelines)
+    proposal = propose_fertilization(field, CultivationType.main_crop, guidelines=guidelines)
+    assert [amount.fertilizer_id for amount in proposal.amounts] == [2]
+
+
+def test_propose_fertilization_fertilizers(
+    field_second_year: db.Field, mineral_fertilizer: db.Fertilizer, guidelines, fill_db
+):
+    field = create_field(field_second_year.id, guidelines=guidelines)
+    mineral_fertilizer.price = None
+    proposal = propose_fertilization(
+        field, CultivationType.main_crop, [mineral_fertilizer], guidelines=guidelines
+    )
+    assert not proposal.amounts
+    assert proposal.remaining == proposal.needs
+    field.cultivations = [field.main_crop]
+    with pytest.raises(ValueError):
+        propose_fertilization(field, CultivationType.second_crop, guidelines=guidelines)
@@ -0,0 +1,75 @@
+import pytest
+
+import app.database.model as db
+from app.database.types import ChangeType, FertClass, FertType, SoilClass, UnitType
+from app.extensions import db as _db
+from app.model.rollover import roll_over
+
+
+def test_roll_over(fill_db, field_second_year: db.Field, guidelines):
+    report = roll_over(1, field_second_year.year, True, True, guidelines=guidelines)
+    _db.session.commit()
+    assert report.to_dict() == {
+        "year": 1002,
+        "fields": 1,
+        "cultivations": 3,
+        "fertilizations": 1,
+        "skipped": 0,
+    }
+    field = db.Field.query.filter_by(base_id=field_second_year.base_id, year=1002).one()
+    for column in ("partition", "area", "red_region", "field_type", "demand_p2o5"):
+        assert getattr(field, column) == getattr(field_second_year, column)
+    assert {(c.cultivation_type, c.crop_id) for c in field.cultivations} == {
+        (c.cultivation_type, c.crop_id) for c in field_second_year.cultivations
+    }
+    # the organic fertilizer of 1001 isn't available in 1002
+    (fertilization,) = field.fertilizations
+    assert fertilization.fertilizer.fert_class is FertClass.mineral
+    assert fertilization.cultivation.field_id == field.id
+    entries = _db.session.query(db.ChangeLog).filter(db.ChangeLog.row_id == field.id).all()
+    assert [(entry.table, entry.change) for entry in entries if entry.table == "field"] == [
+        ("field", ChangeType.created)
+    ]
+
+
+def test_roll_over_organic(
+    fill_db, field_second_year: db.Field, organic_fertilizer_second_year, guidelines
+):
+    _db.session.add(
+        db.Fertilizer(
+            user_id=1,
+            name=organic_fertilizer_second_year.name,
+            year=1002,
+            fert_class=FertClass.organic,
+            fert_type=FertType.org_digestate,
+            unit=UnitType.cbm,
+        )
+    )
+    _db.session.commit()
+    report = roll_over(1, field_second_year.year, True, True, guidelines=guidelines)
+    assert report.fertilizations == 2
+    field = db.Field.query.filter_by(base_id=field_second_year.base_id, year=1002).one()
+    assert {fertilization.fertilizer.year for fertilization in field.fertilizations} == {
+        None,
+        1002,
+    }
+
+
+def test_roll_over_soil_index(fill_db, field_second_year: db.Field, soil_sample, guidelines):
+    _db.session.add(
+        db.FieldSoil(field_id=field_second_year.id, sample_id=soil_sample.id, class_ph=SoilClass.C)
+    )
+    _db.session.commit()
+    roll_over(1, field_second_year.year, guidelines=guidelines)
+    field = db.Field.query.filter_by(base_id=field_second_year.base_id, year=1002).one()
+    assert field.soil.sample_id == soil_sample.id
+    assert field.soil.class_ph is SoilClass.C
+    assert not field.cultivations
+
+
+def test_roll_over_existing(fill_db, field_first_year: db.Field, guidelines):
+    report = roll_over(1, field_first_year.year, guidelines=guidelines)
+    assert (report.fields, report.skipped) == (0, 1)
+    assert roll_over(2, field_first_year.year, guidelines=guidelines).skipped == 0
+    with pytest.raises(ValueError):
+        roll_over(1, field_first_year.year, fertilizations=True, guidelines=guidelines)
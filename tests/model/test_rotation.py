@@ -0,0 +1,45 @@
+from itertools import product
+
+import app.database.model as db
+from app.database.types import DemandType
+from app.model.rotation import _RotationPlanner, plan_rotations
+
+
+def test_plan_rotations(field_second_year: db.Field, user: db.User, guidelines, fill_db):
+    year = field_second_year.year + 1
+    (plan,) = plan_rotations(user.id, year, guidelines=guidelines)
+    assert plan.field_id == field_second_year.id
+    assert [step.year for step in plan.steps] == [year, year + 1, year + 2]
+    # perennial field grass may follow itself and needs the least
+    assert {step.crop for step in plan.steps} == {"Ackergras 3 Schnitte"}
+    assert plan.score == sum(step.score for step in plan.steps)
+
+
+def test_plan_rotations_no_repetition(
+    field_second_year: db.Field, corn: db.Crop, user: db.User, guidelines, fill_db
+):
+    (plan,) = plan_rotations(
+        user.id, field_second_year.year + 1, crop_ids=[corn.id], guidelines=guidelines
+    )
+    assert [step.crop_id for step in plan.steps] == [corn.id]
+
+
+def test_rotation_planner_exhaustive(
+    field_second_year: db.Field, corn: db.Crop, field_grass: db.Crop, guidelines, fill_db
+):
+    planner = _RotationPlanner([corn, field_grass], guidelines)
+    options = (DemandType.demand, DemandType.removal, DemandType.demand)
+    previous = planner.previous_state(field_second_year)
+    score, states = planner.best(options, 3, previous)
+
+    def sequence_score(sequence):
+        total, before = 0, previous
+        for state in sequence:
+            total += sum(planner.needs(options, before, state))
+            before = state
+        return total
+
+    assert score == sequence_score(states)
+    assert score == min(
+        sequence_score(sequence) for sequence in product(planner.candidates, repeat=3)
+    )
@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+import app.database.model as db
+from app.extensions import db as _db
+from app.model.field import create_field
+from app.model.saldo import get_saldo_field_ids, recompute_saldos
+
+
+def test_get_saldo_field_ids(
+    field_first_year: db.Field, field_second_year: db.Field, user: db.User, fill_db
+):
+    # first year has a clean saldo, second year has none
+    assert get_saldo_field_ids() == [(field_second_year.id, field_second_year.year)]
+    assert get_saldo_field_ids(year=field_first_year.year) == []
+    assert len(get_saldo_field_ids(user_id=user.id, only_dirty=False)) == 2
+
+
+def test_recompute_saldos(field_second_year: db.Field, guidelines, fill_db):
+    balance = create_field(field_second_year.id, guidelines=guidelines).total_balance()
+    report = recompute_saldos(get_saldo_field_ids(), guidelines=guidelines)
+    assert report.fields == 1
+    assert report.failed == []
+    saldo = _db.session.get(db.Saldo, field_second_year.id)
+    assert saldo.cao == balance.cao
+    assert saldo.n == balance.n
+    assert saldo.dirty is False
+    assert get_saldo_field_ids() == []
+
+
+def test_saldo_marked_dirty(
+    field_first_year: db.Field,
+    field_second_year: db.Field,
+    organic_fertilization: db.Fertilization,
+    guidelines,
+    fill_db,
+):
+    recompute_saldos(get_saldo_field_ids(), guidelines=guidelines)
+    organic_fertilization.amount = Decimal(99)
+    _db.session.commit()
+    # changes carry over to the following years
+    assert get_saldo_field_ids() == [
+        (field_first_year.id, field_first_year.year),
+        (field_second_year.id, field_second_year.year),
+    ]
+
+
+def test_saldo_marked_dirty_by_fertilizer(
+    field_second_year: db.Field, organic_fertilizer_second_year: db.Fertilizer, guidelines, fill_db
+):
+    recompute_saldos(get_saldo_field_ids(), guidelines=guidelines)
+    organic_fertilizer_second_year.n = Decimal(1)
+    _db.session.commit()
+    assert get_saldo_field_ids() == [(field_second_year.id, field_second_year.year)]
@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+import pytest
+
+import app.database.model as db
+from app.database.types import CultivationType, MeasureType
+from app.extensions import db as _db
+from app.model.field import create_field
+from app.model.scenario import Scenario
+
+
+@pytest.fixture
+def scenario(field_second_year, guidelines, fill_db) -> Scenario:
+    return Scenario(
+        create_field(field_second_year.id, guidelines=guidelines), guidelines=guidelines
+    )
+
+
+def test_scenario_unchanged(scenario: Scenario):
+    assert not scenario.changed
+    assert scenario.total_balance() == scenario.base.total_balance()
+    assert scenario.difference().is_empty
+
+
+def test_scenario_add_fertilization(scenario: Scenario, organic_fertilizer: db.Fertilizer):
+    base_fertilizations = scenario.base.fertilizations
+    scenario.lines()
+    scenario.add_fertilization(
+        organic_fertilizer.id, Decimal(20), MeasureType.org_spring, CultivationType.main_crop
+    )
+    assert scenario.base.fertilizations is base_fertilizations
+    assert len(scenario.field.fertilizations) == len(base_fertilizations) + 1
+    # only the lines depending on the main crop fertilizations are recomputed
+    assert CultivationType.main_crop.name not in scenario._lines
+    assert "fertilizations" not in scenario._lines
+    assert "modifiers" in scenario._lines
+    assert scenario.total_balance() == scenario.field.total_balance()
+    assert scenario.difference().n > 0
+    assert not _db.session.new and not _db.session.dirty
+
+
+def test_scenario_modify_fertilization(scenario: Scenario):
+    amount = scenario.base.fertilizations[0].amount
+    scenario.modify_fertilization(0, amount=amount * 2)
+    assert scenario.base.fertilizations[0].amount == amount
+    assert scenario.total_balance() == scenario.field.total_balance()
+    scenario.remove_fertilization(0)
+    assert len(scenario.field.fertilizations) == len(scenario.base.fertilizations) - 1
+
+
+def test_scenario_cultivation(scenario: Scenario, user: db.User):
+    cultivation_type = scenario.field.cultivations[0].cultivation_type
+    crop_yield = scenario.base.cultivations[0].crop_yield
+    scenario.modify_cultivation(cultivation_type, crop_yield=crop_yield * 2)
+    assert scenario.base.cultivations[0].crop_yield == crop_yield
+    assert scenario.total_balance() == scenario.field.total_balance()
+    with pytest.raises(ValueError):
+        scenario.modify_cultivation(cultivation_type, area=1)
+    with pytest.raises(ValueError):
+        scenario.add_fertilization(0, Decimal(1), MeasureType.org_spring, cultivation_type)
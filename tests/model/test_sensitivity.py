@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+import pytest
+
+import app.database.model as db
+from app.database.types import CultivationType, DemandType, ResidueType
+from app.model.crop import Crop
+from app.model.cultivation import create_cultivation
+from app.model.field import create_field
+from app.model.sensitivity import demand_grid, field_demand_grids, grid_range
+
+
+@pytest.mark.parametrize(
+    "options, residues",
+    [
+        (None, ResidueType.none),
+        ((DemandType.demand, DemandType.removal, DemandType.demand), ResidueType.main_stayed),
+        ((DemandType.removal,) * 3, ResidueType.main_removed),
+    ],
+    ids=["crop", "demand", "removal"],
+)
+def test_demand_grid(corn: db.Crop, guidelines, fill_db, options, residues):
+    crop = Crop(corn, guidelines)
+    yields = grid_range(Decimal(crop.target_yield), Decimal(crop.target_yield) / 2, 5)
+    proteins = [Decimal(7), Decimal(9)]
+    grid = demand_grid(crop, yields, proteins, options, residues)
+    for i, crop_yield in enumerate(yields):
+        for j, crop_protein in enumerate(proteins):
+            cultivation = create_cultivation(
+                db.Cultivation(
+                    cultivation_type=CultivationType.main_crop,
+                    crop_yield=crop_yield,
+                    crop_protein=crop_protein,
+                    residues=residues,
+                ),
+                crop,
+                guidelines=guidelines,
+            )
+            if options is None:
+                demand = crop.demand_crop(crop_yield, crop_protein)
+            else:
+                demand = cultivation.demand(*options, negative_output=False)
+            assert grid.n[i][j] == demand.n
+            assert grid.p2o5[i] == demand.p2o5
+            assert grid.k2o[i] == demand.k2o
+            assert grid.mgo[i] == demand.mgo
+
+
+def test_field_demand_grids(field_second_year: db.Field, guidelines, fill_db):
+    field = create_field(field_second_year.id, guidelines=guidelines)
+    grids = field_demand_grids(field, points=3)
+    assert CultivationType.catch_crop.name not in grids
+    main_crop = field.main_crop
+    grid = grids[CultivationType.main_crop.name]
+    assert grid.yields[1] == main_crop.crop_yield
+    assert (
+        grid.n[1][0]
+        == main_crop.demand(
+            field.option_p2o5, field.option_k2o, field.option_mgo, negative_output=False
+        ).n
+    )
+
+
+def test_grid_range():
+    assert grid_range(Decimal(10), Decimal(5), 3) == [5, 10, 15]
+    with pytest.raises(ValueError):
+        grid_range(Decimal(10), Decimal(5), 0)
+    for center, spread in ((Decimal(10), Decimal("NaN")), (Decimal("Infinity"), Decimal(5))):
+        with pytest.raises(ValueError):
+            grid_range(center, spread, 3)
+    with pytest.raises(ValueError):
+        grid_range(Decimal(10), Decimal(-5), 3)
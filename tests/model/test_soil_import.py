@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+import pytest
+
+import app.database.model as db
+from app.database.types import FieldType, HumusType, SoilClass, SoilType
+from app.model.soil_import import SoilImportError, import_soil_samples
+from app.model.soil_index import get_soil_index
+
+HEADER = "prefix;suffix;year;soil_type;humus;ph;p2o5;k2o;mg\n"
+
+
+def test_import_soil_samples(
+    base_field: db.BaseField, field_second_year: db.Field, guidelines, fill_db
+):
+    lines = [
+        HEADER,
+        "1;0;1001;sand;< 4%;6,5;1;1;1\n",
+        "9;9;1001;sand;less_4;6,5;1;1;1\n",
+        "1;0;1000;sand;less_4;6,5;1;1;1\n",
+        "1;0;1002;Lehm;less_4;6,5;1;1;1\n",
+        "1;0;1003;sand;less_4;x;1;1;1\n",
+        "1;0;1004;sand;less_4;NaN;1;1;1\n",
+        "1;0;1005;sand;less_4;6,5;inf;1;1\n",
+    ]
+    report = import_soil_samples(lines, base_field.user_id, guidelines=guidelines)
+    assert report.imported == 1
+    assert report.base_ids == {base_field.id}
+    assert [line for line, _ in report.errors] == [3, 4, 5, 6, 7, 8]
+    assert report.rows == 7
+
+    sample = db.SoilSample.query.filter_by(base_id=base_field.id, year=1001).one()
+    assert sample.soil_type is SoilType.sand
+    assert sample.humus is HumusType.less_4
+    assert sample.ph == Decimal("6.5")
+    assert sample.get_classification(FieldType.cropland).class_p2o5 is SoilClass.A
+    assert get_soil_index([field_second_year.id])[field_second_year.id].sample_id == sample.id
+
+
+def test_import_soil_samples_duplicate_rows(base_field: db.BaseField, guidelines, fill_db):
+    lines = [HEADER, "1;0;1005;sand;less_4;;;;\n", "1;0;1005;sand;less_4;;;;\n"]
+    report = import_soil_samples(lines, base_field.user_id, guidelines=guidelines)
+    assert report.imported == 1
+    assert report.to_dict()["errors"] == [
+        {"line": 3, "error": "Soil sample for 1005 already exists."}
+    ]
+
+
+def test_import_soil_samples_missing_columns(base_field: db.BaseField, guidelines, fill_db):
+    with pytest.raises(SoilImportError):
+        import_soil_samples(["prefix;suffix;year\n"], base_field.user_id, guidelines=guidelines)
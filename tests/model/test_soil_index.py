@@ -0,0 +1,158 @@
+from decimal import Decimal
+
+import app.database.model as db
+from app.database.types import FieldType, HumusType, SoilClass, SoilType
+from app.extensions import db as _db
+from app.model.field import create_field
+from app.model.soil_index import (
+    classify_soil_samples,
+    get_fields_by_soil_class,
+    get_soil_index,
+    soil_classes,
+    update_soil_index,
+)
+
+
+def test_update_soil_index(
+    field_first_year: db.Field,
+    field_second_year: db.Field,
+    soil_sample: db.SoilSample,
+    guidelines,
+    fill_db,
+):
+    assert update_soil_index(guidelines=guidelines) == 2
+    index = get_soil_index([field_first_year.id, field_second_year.id])
+    assert index[field_first_year.id].sample_id == soil_sample.id
+    assert index[field_second_year.id].sample_id == soil_sample.id
+    assert index[field_first_year.id].class_p2o5 is SoilClass.D
+    assert index[field_first_year.id].classes["ph"] is SoilClass.A
+
+
+def test_update_soil_index_newer_sample(
+    base_field: db.BaseField,
+    field_first_year: db.Field,
+    field_second_year: db.Field,
+    soil_sample: db.SoilSample,
+    guidelines,
+    fill_db,
+):
+    update_soil_index(guidelines=guidelines)
+    new_sample = db.SoilSample(
+        base_id=base_field.id,
+        year=field_second_year.year,
+        ph=Decimal(6),
+        p2o5=Decimal(1),
+        k2o=Decimal(1),
+        mg=Decimal(1),
+        soil_type=SoilType.sand,
+        humus=HumusType.less_4,
+    )
+    _db.session.add(new_sample)
+    _db.session.commit()
+    update_soil_index([base_field.id], guidelines=guidelines)
+    index = get_soil_index([field_first_year.id, field_second_year.id])
+    assert index[field_first_year.id].sample_id == soil_sample.id
+    assert index[field_second_year.id].sample_id == new_sample.id
+    assert index[field_second_year.id].class_p2o5 is SoilClass.A
+
+
+def test_update_soil_index_edited_sample(
+    base_field: db.BaseField,
+    field_first_year: db.Field,
+    soil_sample: db.SoilSample,
+    guidelines,
+    fill_db,
+):
+    update_soil_index(guidelines=guidelines)
+    soil_sample.p2o5 = Decimal(1)
+    _db.session.commit()
+    index = get_soil_index([field_first_year.id])[field_first_year.id]
+    classes = soil_classes(soil_sample, FieldType.cropland, index, guidelines=guidelines)
+    assert classes["p2o5"] is SoilClass.A
+
+    update_soil_index([base_field.id], guidelines=guidelines)
+    index = get_soil_index([field_first_year.id])[field_first_year.id]
+    assert index.class_p2o5 is SoilClass.A
+    assert soil_sample.get_classification(FieldType.cropland).class_p2o5 is SoilClass.A
+
+
+def test_update_soil_index_removed_sample(
+    field_first_year: db.Field, soil_sample: db.SoilSample, guidelines, fill_db
+):
+    update_soil_index(guidelines=guidelines)
+    _db.session.delete(soil_sample)
+    _db.session.commit()
+    assert get_soil_index([field_first_year.id]) == {}
+    assert update_soil_index(guidelines=guidelines) == 0
+
+
+def test_create_field_uses_soil_index(
+    field_second_year: db.Field, soil_sample: db.SoilSample, guidelines, fill_db
+):
+    update_soil_index(guidelines=guidelines)
+    _db.session.commit()
+    field = create_field(field_second_year.id, guidelines=guidelines)
+    assert field.soil_sample.year == soil_sample.year
+    assert field.soil_sample.p2o5 == soil_sample.p2o5
+
+
+def test_classify_soil_samples(
+    base_field: db.BaseField, soil_sample: db.SoilSample, guidelines, fill_db
+):
+    assert classify_soil_samples(guidelines=guidelines) == {base_field.id}
+    classification = soil_sample.get_classification(FieldType.cropland)
+    assert classification.version == "test"
+    assert classification.class_p2o5 is SoilClass.D
+    assert soil_sample.get_classification(FieldType.grassland) is not None
+    assert soil_sample.get_classification(FieldType.exchanged_land) is None
+    # up to date classifications are skipped
+    assert classify_soil_samples(guidelines=guidelines) == set()
+
+
+def test_classify_soil_samples_outdated(
+    base_field: db.BaseField, soil_sample: db.SoilSample, guidelines, fill_db
+):
+    classify_soil_samples(guidelines=guidelines)
+    classification = soil_sample.get_classification(FieldType.cropland)
+    classification.version = "outdated"
+    classification.class_p2o5 = SoilClass.A
+    assert classify_soil_samples(guidelines=guidelines) == {base_field.id}
+    assert classification.version == "test"
+    assert classification.class_p2o5 is SoilClass.D
+
+
+def test_soil_classes(soil_sample: db.SoilSample, guidelines, fill_db):
+    computed = soil_classes(soil_sample, FieldType.cropland, guidelines=guidelines)
+    classify_soil_samples(guidelines=guidelines)
+    assert soil_classes(soil_sample, FieldType.cropland, guidelines=guidelines) == computed
+
+
+def test_soil_classes_index_version(
+    field_first_year: db.Field, soil_sample: db.SoilSample, guidelines, fill_db
+):
+    update_soil_index(guidelines=guidelines)
+    index = field_first_year.soil
+    assert index.version == "test"
+    computed = soil_classes(soil_sample, FieldType.cropland, index, guidelines=guidelines)
+    assert computed["p2o5"] is SoilClass.D
+    # up to date classes are read from the index
+    index.class_p2o5 = SoilClass.A
+    assert (
+        soil_classes(soil_sample, FieldType.cropland, index, guidelines=guidelines)["p2o5"]
+        is SoilClass.A
+    )
+    # classes indexed with other guidelines aren't used
+    index.version = "outdated"
+    assert soil_classes(soil_sample, FieldType.cropland, index, guidelines=guidelines) == computed
+
+
+def test_get_fields_by_soil_class(
+    user: db.User, field_first_year: db.Field, soil_sample: db.SoilSample, guidelines, fill_db
+):
+    update_soil_index(guidelines=guidelines)
+    year = field_first_year.year
+    fields = get_fields_by_soil_class(user.id, year, "p2o5", SoilClass.D, guidelines=guidelines)
+    assert fields == [field_first_year]
+    assert (
+        get_fields_by_soil_class(user.id, year, "p2o5", SoilClass.A, guidelines=guidelines) == []
+    )
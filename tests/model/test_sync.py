@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+import app.database.model as db
+from app.database import delete_database_entry
+from app.database.types import ChangeType
+from app.extensions import db as _db
+from app.model.sync import compact_changes, get_changes
+
+
+def test_change_log(fill_db, field_first_year: db.Field):
+    entries = _db.session.query(db.ChangeLog).filter_by(table="field").all()
+    assert {(entry.row_id, entry.change) for entry in entries} == {
+        (1, ChangeType.created),
+        (2, ChangeType.created),
+    }
+    assert {entry.user_id for entry in entries} == {1}
+    # caches aren't logged
+    assert not _db.session.query(db.ChangeLog).filter_by(table="saldo").all()
+
+
+def test_change_log_deleted_parent(fill_db, field_first_year: db.Field):
+    version = get_changes(1).version
+    delete_database_entry(field_first_year.id, "field")
+    _db.session.commit()
+    entries = _db.session.query(db.ChangeLog).filter(db.ChangeLog.id > version).all()
+    assert {"field", "cultivation", "fertilization"} <= {entry.table for entry in entries}
+    # children whose key to the deleted field is blanked still belong to its owner
+    assert {entry.user_id for entry in entries} == {1}
+
+
+def test_get_changes(fill_db, field_first_year: db.Field, organic_fertilization):
+    changes = get_changes(1)
+    assert not changes.more
+    fields = changes.tables["field"]
+    assert [row[fields.columns.index("id")] for row in fields.rows] == [1, 2]
+    assert get_changes(2).tables == {}
+
+    version = changes.version
+    field_first_year.area = Decimal("2.5")
+    _db.session.delete(organic_fertilization)
+    _db.session.commit()
+    changes = get_changes(1, since=version)
+    assert set(changes.tables) == {"field", "fertilization"}
+    fields = changes.tables["field"]
+    assert len(fields.rows) == 1
+    assert fields.rows[0][fields.columns.index("area")] == 2.5
+    assert changes.tables["fertilization"].deleted == [organic_fertilization.id]
+    assert changes.tables["fertilization"].rows == []
+    assert get_changes(1, since=changes.version).tables == {}
+
+
+def test_get_changes_batches(fill_db):
+    first = get_changes(1, limit=3)
+    assert first.more
+    assert sum(len(changes.rows) for changes in first.tables.values()) == 3
+    rest = get_changes(1, since=first.version)
+    assert not rest.more
+    assert rest.version == _db.session.query(_db.func.max(db.ChangeLog.id)).scalar()
+
+
+def test_compact_changes(fill_db, field_first_year: db.Field):
+    field_first_year.area = Decimal("2.5")
+    _db.session.commit()
+    field_first_year.area = Decimal(3)
+    _db.session.commit()
+    changes = get_changes(1, since=0)
+    entries = _db.session.query(db.ChangeLog).count()
+
+    assert compact_changes(2) == 0
+    assert compact_changes(1) == 2
+    _db.session.commit()
+    assert _db.session.query(db.ChangeLog).count() == entries - 2
+    assert get_changes(1, since=0) == changes
+    assert compact_changes() == 0